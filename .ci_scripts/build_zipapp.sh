@@ -0,0 +1,24 @@
+#!/bin/bash
+
+# Build the single-file zipapp dist/mud-translator.pyz,
+# containing the translator's modules and their bytecode precompiled in the legacy layout
+# (module.pyc next to module.py), which the zip importer loads without compiling the sources.
+
+ROOT=${GITHUB_WORKSPACE:-$(dirname $(dirname $(realpath $0)))}
+BUILD=$(mktemp -d)
+trap "rm -rf $BUILD" EXIT
+
+# Translator's modules only (no benchmarks, examples or CI scripts)
+cp $ROOT/mud_translator.py $BUILD/
+cp -r $ROOT/parsers $ROOT/passes $ROOT/translator $ROOT/writers $BUILD/
+find $BUILD -name __pycache__ -prune -exec rm -rf {} \;
+cat > $BUILD/__main__.py <<'MAIN'
+import sys
+from mud_translator import main
+sys.exit(main())
+MAIN
+
+python3 -m compileall -q -b $BUILD || exit 1
+mkdir -p $ROOT/dist
+python3 -m zipapp $BUILD -p "/usr/bin/env python3" -o $ROOT/dist/mud-translator.pyz || exit 1
+echo "Built $ROOT/dist/mud-translator.pyz"
@@ -0,0 +1,41 @@
+#!/bin/bash
+
+# Check that translating the example MUD files gives byte-for-byte the golden YAML profiles,
+# with the default (libyaml) emitter, the pure-Python emitter, and in streaming mode,
+# the golden compact JSON and binary profiles,
+# and the golden nftables rulesets, checking their syntax.
+
+GOLDEN=$GITHUB_WORKSPACE/examples/golden
+OUTPUT=$(mktemp -d)
+STATUS=0
+
+for MUD_FILE in $GITHUB_WORKSPACE/examples/json/*.json $GITHUB_WORKSPACE/examples/xml/TPLink-*.xml
+do
+    NAME=$(basename ${MUD_FILE%.*})
+    for MODE in default pure stream json bin nft
+    do
+        EXT=yaml
+        case $MODE in
+            default) python3 $GITHUB_WORKSPACE/mud_translator.py --no-cache $MUD_FILE -o $OUTPUT/$NAME.yaml ;;
+            pure)    MUD_TRANSLATOR_PURE_YAML=1 python3 $GITHUB_WORKSPACE/mud_translator.py --no-cache $MUD_FILE -o $OUTPUT/$NAME.yaml ;;
+            stream)  python3 $GITHUB_WORKSPACE/mud_translator.py --no-cache --stream-policies $MUD_FILE -o $OUTPUT/$NAME.yaml ;;
+            json)    EXT=profile.json
+                     python3 $GITHUB_WORKSPACE/mud_translator.py --no-cache -f json $MUD_FILE -o $OUTPUT/$NAME.$EXT ;;
+            bin)     EXT=bin
+                     python3 $GITHUB_WORKSPACE/mud_translator.py --no-cache -f bin $MUD_FILE -o $OUTPUT/$NAME.$EXT ;;
+            nft)     EXT=nft
+                     python3 $GITHUB_WORKSPACE/mud_translator.py --no-cache -f nft --check -m 00:11:22:33:44:55 $MUD_FILE -o $OUTPUT/$NAME.nft 2> /dev/null ;;
+        esac
+        if cmp -s $OUTPUT/$NAME.$EXT $GOLDEN/$NAME.$EXT
+        then
+            echo "OK: $MUD_FILE ($MODE)"
+        else
+            echo "FAILED: $MUD_FILE ($MODE) differs from golden profile"
+            diff $OUTPUT/$NAME.$EXT $GOLDEN/$NAME.$EXT
+            STATUS=1
+        fi
+    done
+done
+
+rm -rf $OUTPUT
+exit $STATUS
@@ -0,0 +1,270 @@
+#!/bin/bash
+
+# Check fixed regressions, each with an inline Python check, over the example MUD files:
+#   - the library API returns plain profiles, serializable with json and yaml, and registers no YAML representer globally.
+#   - aggregation keeps the policies without protocol matches, which are not duplicates of each other.
+#   - aggregation never merges policies of different directions, which keep their nftables rules.
+#   - nftables interval sets never hold overlapping concatenated elements, and the checker rejects them.
+#   - translation cache keys change with the translator's sources, without a version bump.
+#   - the change set does not report policies interned into a policy library as modified.
+#   - MUD URLs are fetched and translated, not fetched again within their cache-validity,
+#     and refreshed with a conditional request (304 Not Modified) once expired.
+#   - DNS pre-resolution against a stub DNS server: resolved addresses, reports of non-existent domain names
+#     and of timeouts, and a single query per repeated domain name.
+#   - fleet mode writes the inventory's IP addresses normalized, like the device options.
+#   - invalid (unhashable) network and domain name matches are reported as invalid (ValueError), not TypeError.
+
+STATUS=0
+
+check() {
+    # Run the inline Python check given on the standard input, and report it under the given name
+    if PYTHONPATH=$GITHUB_WORKSPACE python3 - "$@"
+    then
+        echo "OK: $1"
+    else
+        echo "FAILED: $1"
+        STATUS=1
+    fi
+}
+
+check "library API returns plain profiles" $GITHUB_WORKSPACE/examples/json/TPLink-Plug-UNSW-MUD.json << 'CHECK'
+import sys
+import json
+import yaml
+from mud_translator import translate, serialize
+with open(sys.argv[2], "rb") as mud_file:
+    profile = translate(mud_file.read(), mac="00:11:22:33:44:55")
+from parsers.ir.Record import Record
+dumpers = [yaml.Dumper, getattr(yaml, "CDumper", yaml.Dumper)]
+sys.exit(not (json.loads(json.dumps(profile)) == profile and yaml.safe_load(yaml.safe_dump(profile)) == profile
+              and yaml.safe_load(serialize(profile)) == profile
+              and all(Record not in dumper.yaml_multi_representers for dumper in dumpers)))
+CHECK
+
+check "aggregation keeps policies without protocol matches" $GITHUB_WORKSPACE/examples/json/TPLink-Plug-UNSW-MUD.json << 'CHECK'
+import sys
+from mud_translator import translate
+from passes.PolicyAggregator import PolicyAggregator
+with open(sys.argv[2], "rb") as mud_file:
+    policies = translate(mud_file.read())["single-policies"]
+aggregator = PolicyAggregator()
+aggregated = aggregator.aggregate(policies)
+unsupported = ["from-ethernet-tplinkplug-0", "from-ethernet-tplinkplug-1"]
+sys.exit(not (all(name in aggregated for name in unsupported) and aggregator.duplicates == 0))
+CHECK
+
+check "aggregation keeps policies of both directions" $GITHUB_WORKSPACE/examples/json/TPLink-Plug-UNSW-MUD.json << 'CHECK'
+import os
+import sys
+import json
+import tempfile
+import contextlib
+from mud_translator import main
+with open(sys.argv[2]) as mud_file:
+    mud = json.load(mud_file)
+acls = {acl["name"]: acl for acl in mud["ietf-access-control-list:access-lists"]["acl"]}
+# Same matches (udp dst-port 67) from and to the device
+from_ace = acls["from-ipv4-tplinkplug"]["aces"]["ace"][1]
+to_ace = acls["to-ipv4-tplinkplug"]["aces"]["ace"][0]
+to_ace["matches"] = json.loads(json.dumps(from_ace["matches"]))
+with tempfile.TemporaryDirectory() as directory:
+    mud_path = os.path.join(directory, "mud.json")
+    with open(mud_path, "w") as mud_file:
+        json.dump(mud, mud_file)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        status = main(["--no-cache", "--aggregate", "-f", "nft", mud_path, "-o", os.path.join(directory, "mud.nft")])
+    with open(os.path.join(directory, "mud.nft")) as nft_file:
+        ruleset = nft_file.read()
+chains = {block.split("{")[0].split()[-1]: block for block in ruleset.split("\tchain ")[1:]}
+sys.exit(not (status == 0 and all("udp dport @" in chains[chain] for chain in ("mud_from_udp", "mud_to_udp"))))
+CHECK
+
+check "nftables interval sets are disjoint" << 'CHECK'
+import sys
+from writers.NftablesWriter import NftablesWriter
+from writers.NftablesChecker import NftablesChecker
+profile = {"device-info": {"name": "overlaps"}, "single-policies": {
+    "from-0": {"protocols": {"ipv4": {"dst": "192.168.0.0/16"}, "tcp": {"dst-port": 80}}},
+    "from-1": {"protocols": {"ipv4": {"dst": "192.168.1.0/24"}, "tcp": {"dst-port": "70-90"}}},
+    "from-2": {"protocols": {"ipv4": {"dst": "192.168.2.0/24"}, "tcp": {"dst-port": 80}}}
+}}
+ruleset = NftablesWriter().compile(profile)
+# Overlapping elements in separate sets, contained elements removed
+split = "@from_ip_tcp_daddr_dport_2" in ruleset and "192.168.2.0/24" not in ruleset
+overlapping = ruleset.replace("192.168.0.0/16 . 80 }", "192.168.0.0/16 . 80, 192.168.1.0/24 . 70-90 }", 1)
+sys.exit(not (split and NftablesChecker(ruleset).parse() == [] and NftablesChecker(overlapping).parse()))
+CHECK
+
+check "cache keys follow the translator's sources" << 'CHECK'
+import os
+import sys
+import shutil
+import tempfile
+from translator.TranslationCache import TranslationCache
+digest = TranslationCache.sources_digest()
+with tempfile.TemporaryDirectory() as directory:
+    for source in TranslationCache.sources:
+        copy = shutil.copy if source.endswith(".py") else shutil.copytree
+        copy(os.path.join(TranslationCache.root, source), os.path.join(directory, source))
+    TranslationCache.root, TranslationCache._sources_digest = directory, None
+    same = TranslationCache.sources_digest() == digest
+    with open(os.path.join(directory, "writers", "YamlWriter.py"), "a") as source_file:
+        source_file.write("# Output-changing edit\n")
+    TranslationCache._sources_digest = None
+    changed = TranslationCache.sources_digest() != digest
+sys.exit(not (same and changed))
+CHECK
+
+check "library references are not modifications" $GITHUB_WORKSPACE/examples/golden/TPLink-Plug-Mudgee.yaml << 'CHECK'
+import sys
+from passes.ProfileDiff import ProfileDiff
+from passes.PolicyLibrary import PolicyLibrary
+profile = ProfileDiff.load(sys.argv[2])
+library = PolicyLibrary()
+library.add_profile(profile)
+library.add_profile(profile)
+interned = library.intern(profile)
+changes = ProfileDiff(profile).diff(interned)
+sys.exit(not (library.replaced > 0 and changes["summary"]["modified"] == 0
+              and changes["hashes"] == ProfileDiff(interned).diff(profile)["hashes"]))
+CHECK
+
+check "MUD URLs are fetched, cached and revalidated" $GITHUB_WORKSPACE/examples/json << 'CHECK'
+import os
+import sys
+import glob
+import json
+import tempfile
+import subprocess
+with tempfile.TemporaryDirectory() as directory:
+    log_path = os.path.join(directory, "access.log")
+    with open(log_path, "w") as log:
+        server = subprocess.Popen([sys.executable, "-u", "-m", "http.server", "0", "--bind", "127.0.0.1", "--directory", sys.argv[2]],
+                                  stdout=subprocess.PIPE, stderr=log, text=True)
+    try:
+        # "Serving HTTP on 127.0.0.1 port PORT (...)"
+        port = server.stdout.readline().split(" port ")[1].split()[0]
+        url = f"http://127.0.0.1:{port}/TPLink-Plug-Mudgee.json"
+        output = os.path.join(directory, "out", f"127.0.0.1_{port}", "TPLink-Plug-Mudgee.yaml")
+        cache_dir = os.path.join(directory, "cache")
+        translate = [sys.executable, os.path.join(os.environ["PYTHONPATH"], "mud_translator.py"), url,
+                     "-o", os.path.join(directory, "out"), "--cache-dir", cache_dir]
+
+        def statuses() -> list:
+            subprocess.run(translate, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            with open(log_path) as log:
+                return [line.split('"')[2].split()[0] for line in log if '"GET /TPLink-Plug-Mudgee.json' in line]
+
+        fetched = statuses() == ["200"] and os.path.getsize(output) > 0
+        cached = statuses() == ["200"]
+        # Expire the cached MUD file
+        meta_path, = glob.glob(os.path.join(cache_dir, "profiles", "*.meta"))
+        with open(meta_path) as meta_file:
+            metadata = json.load(meta_file)
+        metadata["fetched"] -= metadata["cache-validity"] * 3600 + 1
+        with open(meta_path, "w") as meta_file:
+            json.dump(metadata, meta_file)
+        revalidated = statuses() == ["200", "304"]
+    finally:
+        server.terminate()
+        server.wait()
+sys.exit(not (fetched and cached and revalidated))
+CHECK
+
+check "DNS pre-resolution against a stub DNS server" $GITHUB_WORKSPACE/examples/json/TPLink-Plug-Mudgee.json << 'CHECK'
+import io
+import os
+import sys
+import yaml
+import socket
+import struct
+import tempfile
+import threading
+import contextlib
+from mud_translator import main
+from passes.DnsResolver import DnsResolver
+
+# Stub DNS server: addresses for use1-api.tplinkra.com, NXDOMAIN for other names, or no response at all
+queries = []
+def serve(server: socket.socket, answer: bool) -> None:
+    while True:
+        try:
+            query, client = server.recvfrom(512)
+        except OSError:
+            return
+        query_id, = struct.unpack_from("!H", query)
+        labels, offset = [], 12
+        while query[offset]:
+            labels.append(query[offset + 1:offset + 1 + query[offset]].decode())
+            offset += 1 + query[offset]
+        name, record_type = ".".join(labels), struct.unpack_from("!H", query, offset + 1)[0]
+        queries.append((name, record_type))
+        if not answer:
+            continue
+        question = query[12:offset + 5]
+        if name == "use1-api.tplinkra.com" and record_type == 1:
+            record = b"\xc0\x0c" + struct.pack("!HHIH", 1, 1, 60, 4) + socket.inet_aton("192.0.2.10")
+            server.sendto(struct.pack("!HHHHHH", query_id, 0x8180, 1, 1, 0, 0) + question + record, client)
+        else:
+            server.sendto(struct.pack("!HHHHHH", query_id, 0x8183, 1, 0, 0, 0) + question, client)
+
+def translate(answer: bool) -> tuple:
+    queries.clear()
+    DnsResolver.memory.clear()
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as server, tempfile.TemporaryDirectory() as directory:
+        server.bind(("127.0.0.1", 0))
+        threading.Thread(target=serve, args=(server, answer), daemon=True).start()
+        output, errors = os.path.join(directory, "profile.yaml"), io.StringIO()
+        with contextlib.redirect_stderr(errors):
+            main(["--no-cache", "--resolve-dns", "--dns-server", f"127.0.0.1:{server.getsockname()[1]}", sys.argv[2], "-o", output])
+        with open(output) as profile_file:
+            return yaml.safe_load(profile_file)["single-policies"], errors.getvalue()
+
+DnsResolver.timeout = 0.2
+policies, errors = translate(True)
+resolved = {str(protocols["ipv4"][field]): protocols["ipv4"].get(f"{field}-resolved", None)
+            for protocols in (policy["protocols"] for policy in policies.values()) for field in ("src", "dst")
+            if field in protocols.get("ipv4", {}) and protocols["ipv4"][field] != "local"}
+answered = (resolved == {"use1-api.tplinkra.com": ["192.0.2.10"], "uk.pool.ntp.org": None}
+            and "could not resolve uk.pool.ntp.org: no such domain name (NXDOMAIN)" in errors
+            and sorted(queries) == [("uk.pool.ntp.org", 1), ("use1-api.tplinkra.com", 1)])
+policies, errors = translate(False)
+timed_out = (all("could not resolve " + name + ": TimeoutError" in errors for name in ("uk.pool.ntp.org", "use1-api.tplinkra.com"))
+             and len(queries) == 2 * DnsResolver.attempts)
+sys.exit(not (answered and timed_out))
+CHECK
+
+OUTPUT=$(mktemp -d)
+printf "name,ipv4,ipv6\nplug,192.168.1.2,2001:DB8:0::1\n" > $OUTPUT/inventory.csv
+python3 $GITHUB_WORKSPACE/mud_translator.py --no-cache --inventory $OUTPUT/inventory.csv \
+    $GITHUB_WORKSPACE/examples/json/TPLink-Plug-UNSW-MUD.json -o $OUTPUT/fleet.yaml > /dev/null 2>&1
+python3 $GITHUB_WORKSPACE/mud_translator.py --no-cache --ipv4 192.168.1.2 --ipv6 2001:DB8:0::1 \
+    $GITHUB_WORKSPACE/examples/json/TPLink-Plug-UNSW-MUD.json -o $OUTPUT/device.yaml
+check "fleet mode normalizes IP addresses" $OUTPUT/fleet.yaml $OUTPUT/device.yaml << 'CHECK'
+import sys
+import yaml
+with open(sys.argv[2]) as fleet_file, open(sys.argv[3]) as device_file:
+    fleet_profiles = list(yaml.safe_load_all(fleet_file))
+    device_profile = yaml.safe_load(device_file)
+device_info = fleet_profiles[0]["device-info"]
+sys.exit(not (len(fleet_profiles) == 1 and device_info == device_profile["device-info"] and device_info["ipv6"] == "2001:db8::1"))
+CHECK
+rm -rf $OUTPUT
+
+check "unhashable network matches are invalid" $GITHUB_WORKSPACE/examples/json/TPLink-Plug-UNSW-MUD.json << 'CHECK'
+import sys
+import json
+from mud_translator import translate
+from parsers.protocols.Network import Network
+with open(sys.argv[2]) as mud_file:
+    mud = json.load(mud_file)
+ace = mud["ietf-access-control-list:access-lists"]["acl"][0]["aces"]["ace"][0]
+ace["matches"]["ipv4"] = {"protocol": 17, "destination-network": ["192.0.2.0/24"]}
+try:
+    translate(mud)
+except ValueError:
+    sys.exit(not (Network.is_valid_network({}) is False and Network.is_valid_domain([]) is False))
+sys.exit(1)
+CHECK
+
+exit $STATUS
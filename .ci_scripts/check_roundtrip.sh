@@ -0,0 +1,40 @@
+#!/bin/bash
+
+# Check that the compact JSON and binary profiles are equivalent to the YAML profile,
+# over the example MUD files and a synthetic MUD profile:
+# all three load as the same translated profile,
+# and looking single policies up by name in the memory-mapped binary profile gives the YAML profile's.
+
+OUTPUT=$(mktemp -d)
+STATUS=0
+mkdir $OUTPUT/profiles
+python3 $GITHUB_WORKSPACE/benchmark.py --generate $OUTPUT/synthetic.json --sizes 1000 > /dev/null
+
+for MUD_FILE in $GITHUB_WORKSPACE/examples/json/*.json $GITHUB_WORKSPACE/examples/xml/TPLink-*.xml $OUTPUT/synthetic.json
+do
+    NAME=$(basename ${MUD_FILE%.*})
+    for FORMAT in yaml json bin
+    do
+        python3 $GITHUB_WORKSPACE/mud_translator.py --no-cache -f $FORMAT $MUD_FILE -o $OUTPUT/profiles/$NAME.$FORMAT
+    done
+    if PYTHONPATH=$GITHUB_WORKSPACE python3 - $OUTPUT/profiles/$NAME.yaml $OUTPUT/profiles/$NAME.json $OUTPUT/profiles/$NAME.bin << 'CHECK'
+import sys
+from passes.ProfileDiff import ProfileDiff
+from writers.BinaryProfile import BinaryProfile
+yaml_profile, json_profile, binary_profile = (ProfileDiff.load(path) for path in sys.argv[1:])
+policies = yaml_profile["single-policies"]
+with BinaryProfile.open(sys.argv[3]) as mapped_profile:
+    lookups = list(mapped_profile) == list(policies) and all(mapped_profile[name] == policy for name, policy in policies.items())
+    lookups = lookups and mapped_profile.device_info() == yaml_profile["device-info"] and "not-a-policy" not in mapped_profile
+sys.exit(not (yaml_profile == json_profile == binary_profile and lookups))
+CHECK
+    then
+        echo "OK: $MUD_FILE"
+    else
+        echo "FAILED: $MUD_FILE compact JSON or binary profile differs from YAML profile"
+        STATUS=1
+    fi
+done
+
+rm -rf $OUTPUT
+exit $STATUS
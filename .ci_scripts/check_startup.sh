@@ -0,0 +1,25 @@
+#!/bin/bash
+
+# Check the startup time of the translator's entry points (script and zipapp) against a baseline checkout,
+# by default the commit before the pushed commits (STARTUP_BASELINE_REF, or else the previous commit),
+# benchmarked in the same run, on the same runner, such that the check does not depend on the runner's speed,
+# and against an absolute budget (STARTUP_TARGET_MS) over a bare interpreter on the same runner,
+# such that small regressions within the tolerance cannot pile up over pushes,
+# and write the machine-readable report to startup.json.
+
+STARTUP_TARGET_MS=${STARTUP_TARGET_MS:-200}
+
+BASELINE_REF=${STARTUP_BASELINE_REF:-HEAD~1}
+if ! git -C $GITHUB_WORKSPACE rev-parse -q --verify "$BASELINE_REF^{commit}" > /dev/null
+then
+    # e.g. first push of a branch
+    BASELINE_REF=HEAD~1
+fi
+BASELINE=$(mktemp -d)/baseline
+trap "git -C $GITHUB_WORKSPACE worktree remove --force $BASELINE" EXIT
+git -C $GITHUB_WORKSPACE worktree add -q --detach $BASELINE $BASELINE_REF || exit 1
+# Both checkouts start with compiled bytecode, as the zipapp does
+python3 -m compileall -q $GITHUB_WORKSPACE $BASELINE > /dev/null
+
+python3 $GITHUB_WORKSPACE/benchmark.py --startup --zipapp $GITHUB_WORKSPACE/dist/mud-translator.pyz \
+    --startup-target $STARTUP_TARGET_MS --startup-baseline $BASELINE --startup-tolerance 10 -o $GITHUB_WORKSPACE/startup.json
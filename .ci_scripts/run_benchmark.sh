@@ -0,0 +1,6 @@
+#!/bin/bash
+
+# Benchmark MUD translator over synthetic MUD profiles,
+# and write the machine-readable report to benchmark.json.
+
+python3 $GITHUB_WORKSPACE/benchmark.py --sizes 100,1000,10000 --repeat 3 -o $GITHUB_WORKSPACE/benchmark.json
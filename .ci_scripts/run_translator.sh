@@ -7,5 +7,5 @@ python3 $GITHUB_WORKSPACE/mud_translator.py $GITHUB_WORKSPACE/examples/json/TPLi
 python3 $GITHUB_WORKSPACE/mud_translator.py $GITHUB_WORKSPACE/examples/json/TPLink-Plug-UNSW-MUD.json
 
 # XML MUD files
-# TODO: XML MUD file
-#python3 $GITHUB_WORKSPACE/mud_translator.py $GITHUB_WORKSPACE/examples/xml/
+python3 $GITHUB_WORKSPACE/mud_translator.py $GITHUB_WORKSPACE/examples/xml/TPLink-Plug-Mudgee.xml
+python3 $GITHUB_WORKSPACE/mud_translator.py $GITHUB_WORKSPACE/examples/xml/TPLink-Plug-UNSW-MUD.xml
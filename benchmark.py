@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+
+"""
+Benchmark the MUD translator over synthetic MUD profiles,
+benchmark its startup time, or generate a synthetic MUD profile.
+"""
+
+# Libraries
+import sys
+import json
+import argparse
+# Custom modules
+from benchmarks.ProfileGenerator import ProfileGenerator
+from benchmarks.TranslationBenchmark import TranslationBenchmark
+from benchmarks.StartupBenchmark import StartupBenchmark
+
+
+def int_list_type(value: str) -> list:
+    """
+    Parse a comma-separated list of positive integers.
+
+    :param value: given argument
+    :return: list of integers
+    :raises argparse.ArgumentTypeError: invalid list of integers
+    """
+    try:
+        integers = [int(item) for item in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid list of integers: {value}")
+    if any(integer <= 0 for integer in integers):
+        raise argparse.ArgumentTypeError(f"Invalid list of integers: {value}")
+    return integers
+
+
+def mix_type(value: str) -> dict:
+    """
+    Parse a transport protocol mix, e.g. "tcp=5,udp=4,icmp=1".
+
+    :param value: given argument
+    :return: mapping between transport protocols and relative weights
+    :raises argparse.ArgumentTypeError: invalid transport protocol mix
+    """
+    mix = {}
+    for item in value.split(","):
+        protocol, _, weight = item.partition("=")
+        if protocol not in ProfileGenerator.default_mix:
+            raise argparse.ArgumentTypeError(f"Invalid transport protocol: {protocol}")
+        try:
+            mix[protocol] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid weight for {protocol}: {weight}")
+    return mix
+
+
+##### MAIN #####
+if __name__ == "__main__":
+
+    ## Parse command line arguments
+    arg_parser = argparse.ArgumentParser(description="Benchmark the MUD translator over synthetic MUD profiles.")
+    # Benchmark arguments
+    arg_parser.add_argument("--sizes", type=int_list_type, default=[100, 1000, 10000], help="Comma-separated profile sizes, in number of ACEs (default: 100,1000,10000)")
+    arg_parser.add_argument("--formats", type=str, default="json,xml", help="Comma-separated MUD file formats (default: json,xml)")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per profile, the best one is kept (default: 3)")
+    arg_parser.add_argument("--no-memory", action="store_true", help="Do not measure the peak memory of each stage")
+    arg_parser.add_argument("-o", "--output", type=str, help="Output JSON report file (default: standard output)")
+    # Startup benchmark arguments
+    arg_parser.add_argument("--startup", action="store_true", help="Only benchmark the startup time of the translator's command line entry points")
+    arg_parser.add_argument("--zipapp", type=str, metavar="PATH", help="Zipapp to include in the startup benchmark")
+    arg_parser.add_argument("--startup-target", type=float, metavar="MS", help="Maximum startup overhead over a bare interpreter, in milliseconds: exit with an error if exceeded")
+    arg_parser.add_argument("--startup-baseline", type=str, metavar="DIR", help="Baseline checkout of the translator (e.g. the previous commit), benchmarked too: exit with an error if the startup overhead exceeds the baseline's by more than the tolerance, in the cases the baseline supports")
+    arg_parser.add_argument("--startup-tolerance", type=float, default=10.0, metavar="PERCENT", help="Maximum startup overhead over the baseline's, in percent (default: 10)")
+    # Profile generation arguments
+    arg_parser.add_argument("--generate", type=str, metavar="PATH", help="Only generate a synthetic MUD profile (JSON or XML, from the extension), of the first given size")
+    arg_parser.add_argument("--acls", type=int, default=2, help="Number of referenced ACLs (default: 2)")
+    arg_parser.add_argument("--unreferenced-acls", type=int, default=0, help="Number of additional ACLs not referenced in the MUD container (default: 0)")
+    arg_parser.add_argument("--ipv6-ratio", type=float, default=0.2, help="Ratio of ACEs matching IPv6 (default: 0.2)")
+    arg_parser.add_argument("--dns-ratio", type=float, default=0.5, help="Ratio of remote networks given as domain names (default: 0.5)")
+    arg_parser.add_argument("--local-ratio", type=float, default=0.1, help="Ratio of ACEs matching the local networks (default: 0.1)")
+    arg_parser.add_argument("--mix", type=mix_type, help="Relative weights of the transport protocols (default: tcp=5,udp=4,icmp=1)")
+    arg_parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    # Parse arguments
+    args = arg_parser.parse_args()
+
+    generator_options = {
+        "acls": args.acls,
+        "unreferenced_acls": args.unreferenced_acls,
+        "ipv6_ratio": args.ipv6_ratio,
+        "dns_ratio": args.dns_ratio,
+        "local_ratio": args.local_ratio,
+        "mix": args.mix,
+        "seed": args.seed
+    }
+
+    # Profile generation only
+    if args.generate is not None:
+        ProfileGenerator(aces=args.sizes[0], **generator_options).write(args.generate)
+        sys.exit(0)
+
+    # Startup benchmark only
+    if args.startup:
+        # Process startup times are noisy: at least 10 runs per case
+        report = StartupBenchmark(args.zipapp, repeat=max(args.repeat, 10), target_ms=args.startup_target,
+                                  baseline=args.startup_baseline, tolerance=args.startup_tolerance).run()
+    else:
+        # Benchmark
+        formats = args.formats.split(",")
+        for format in formats:
+            if format not in TranslationBenchmark.extensions:
+                arg_parser.error(f"invalid MUD file format: {format}")
+        benchmark = TranslationBenchmark(args.sizes, formats, args.repeat, not args.no_memory, **generator_options)
+        report = benchmark.run()
+
+    if args.output is not None:
+        with open(args.output, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    sys.exit(0 if report.get("passed", True) else 1)
@@ -0,0 +1,253 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import json
+import random
+from xml.sax.saxutils import escape
+from parsers.Direction import Direction
+from parsers.mud.MudParser import MudParser
+from parsers.protocols.icmp import icmp
+
+
+class ProfileGenerator:
+    """
+    Synthetic MUD profile generator.
+    Generates valid MUD profiles (RFC 8520) of configurable size and match mix,
+    as JSON (RFC 7951) or XML documents, to benchmark the translation pipeline.
+    Profiles are reproducible, given the same parameters and random seed.
+    """
+
+    # XML namespaces of the YANG modules
+    NAMESPACE = "urn:ietf:params:xml:ns:yang:"
+    modules = ["ietf-mud", "ietf-access-control-list", "ietf-acldns"]
+
+    # IP protocol numbers
+    protocol_numbers = {
+        ("ipv4", "tcp"): 6,
+        ("ipv4", "udp"): 17,
+        ("ipv4", "icmp"): 1,
+        ("ipv6", "tcp"): 6,
+        ("ipv6", "udp"): 17,
+        ("ipv6", "icmp"): 58
+    }
+
+    # Port numbers of common services
+    ports = [22, 53, 80, 123, 443, 1883, 5353, 8080, 8883]
+
+    # Default mix of transport protocols, as relative weights
+    default_mix = {"tcp": 5, "udp": 4, "icmp": 1}
+
+
+    def __init__(self, acls: int = 2, aces: int = 100, ipv6_ratio: float = 0.2, dns_ratio: float = 0.5,
+                 local_ratio: float = 0.1, mix: dict = None, unreferenced_acls: int = 0, seed: int = 0) -> None:
+        """
+        Constructor for the ProfileGenerator class.
+
+        :param acls: number of ACLs referenced in the MUD container, alternating between from- and to-device
+        :param aces: total number of ACEs in the referenced ACLs
+        :param ipv6_ratio: ratio of ACEs matching IPv6 instead of IPv4
+        :param dns_ratio: ratio of remote network matches given as domain names instead of CIDRs
+        :param local_ratio: ratio of ACEs matching the local networks instead of a remote network
+        :param mix: relative weights of the transport protocols ("tcp", "udp", "icmp")
+        :param unreferenced_acls: number of additional ACLs not referenced in the MUD container
+        :param seed: random seed
+        """
+        self.acls = max(1, acls)
+        self.aces = aces
+        self.ipv6_ratio = ipv6_ratio
+        self.dns_ratio = dns_ratio
+        self.local_ratio = local_ratio
+        self.mix = mix if mix is not None else self.default_mix
+        self.unreferenced_acls = unreferenced_acls
+        self.seed = seed
+
+
+    def network(self, rng: random.Random, version: str) -> str:
+        """
+        Generate a remote network, in CIDR notation.
+        Networks are drawn from a pool, such that they repeat across ACEs, as in real profiles.
+
+        :param rng: random number generator
+        :param version: network protocol ("ipv4" or "ipv6")
+        :return: network, in CIDR notation
+        """
+        index = rng.randrange(max(1, self.aces // 10))
+        if version == "ipv4":
+            prefix_length = rng.choice([8, 16, 24, 32])
+            address = (10 << 24) | (index % (1 << 24))
+            address &= ~((1 << (32 - prefix_length)) - 1) & 0xFFFFFFFF
+            return f"{address >> 24}.{(address >> 16) & 0xFF}.{(address >> 8) & 0xFF}.{address & 0xFF}/{prefix_length}"
+        return f"2001:db8:{index & 0xFFFF:x}::/48"
+
+
+    def domain_name(self, rng: random.Random) -> str:
+        """
+        Generate a remote domain name.
+        Domain names are drawn from a pool, such that they repeat across ACEs, as in real profiles.
+
+        :param rng: random number generator
+        :return: domain name
+        """
+        index = rng.randrange(max(1, self.aces // 10))
+        return f"host{index}.service{index % 7}.example.com"
+
+
+    def ace(self, rng: random.Random, name: str, direction: Direction) -> dict:
+        """
+        Generate an ACE.
+
+        :param rng: random number generator
+        :param name: ACE name
+        :param direction: direction of the ACL (FROM or TO device)
+        :return: ACE dictionary, JSON-encoded
+        """
+        version = "ipv6" if rng.random() < self.ipv6_ratio else "ipv4"
+        transport = rng.choices(list(self.mix.keys()), list(self.mix.values()))[0]
+        matches = {}
+
+        # Network layer: remote network is the destination of from-device traffic, and the source of to-device traffic
+        network_match = {"protocol": self.protocol_numbers[(version, transport)]}
+        remote = "dst" if direction == Direction.FROM else "src"
+        if rng.random() < self.local_ratio:
+            matches["ietf-mud:mud"] = {"local-networks": [None]}
+        elif rng.random() < self.dns_ratio:
+            network_match[f"ietf-acldns:{remote}-dnsname"] = self.domain_name(rng)
+        else:
+            network_match["destination-network" if remote == "dst" else "source-network"] = self.network(rng, version)
+        matches[version] = network_match
+
+        # Transport layer
+        if transport == "icmp":
+            matches["icmp"] = {"type": rng.choice(list(icmp.icmp_codes.keys())), "code": 0}
+        else:
+            port_field = "destination-port" if remote == "dst" else "source-port"
+            transport_match = {port_field: {"operator": "eq", "port": rng.choice(self.ports)}}
+            if transport == "tcp" and rng.random() < 0.5:
+                transport_match["ietf-mud:direction-initiated"] = direction.value
+            matches[transport] = transport_match
+
+        return {
+            "name": name,
+            "matches": matches,
+            "actions": {"forwarding": "accept"}
+        }
+
+
+    def generate(self) -> dict:
+        """
+        Generate a MUD profile.
+
+        :return: MUD profile dictionary, JSON-encoded
+        """
+        rng = random.Random(self.seed)
+        acl_type = "ipv4-acl-type" if self.ipv6_ratio <= 0 else "ipv6-acl-type" if self.ipv6_ratio >= 1 else "mixed-eth-ipv4-ipv6-acl-type"
+
+        # ACLs, alternating between from- and to-device, with ACEs spread evenly
+        acls = []
+        policies = {Direction.FROM: [], Direction.TO: []}
+        for i in range(self.acls + self.unreferenced_acls):
+            direction = Direction.FROM if i % 2 == 0 else Direction.TO
+            acl_name = f"{direction.value}-acl-{i}"
+            if i < self.acls:
+                policies[direction].append({"name": acl_name})
+                ace_count = self.aces // self.acls + (1 if i < self.aces % self.acls else 0)
+            else:
+                acl_name = f"unreferenced-{acl_name}"
+                ace_count = self.aces // self.acls
+            aces = [self.ace(rng, f"{acl_name}-{j}", direction) for j in range(ace_count)]
+            acls.append({"name": acl_name, "type": acl_type, "aces": {"ace": aces}})
+
+        return {
+            MudParser.MUD: {
+                "mud-version": 1,
+                "mud-url": f"https://example.com/synthetic-{self.aces}",
+                "last-update": "2024-01-01T00:00:00+00:00",
+                "cache-validity": 48,
+                "is-supported": True,
+                "systeminfo": f"Synthetic device ({self.aces} ACEs)",
+                MudParser.FROM: {"access-lists": {"access-list": policies[Direction.FROM]}},
+                MudParser.TO: {"access-lists": {"access-list": policies[Direction.TO]}}
+            },
+            MudParser.ACL: {"acl": acls}
+        }
+
+
+    @classmethod
+    def write_json(c, mud: dict, stream: object) -> None:
+        """
+        Write a MUD profile as a JSON document.
+
+        :param mud: MUD profile dictionary, JSON-encoded
+        :param stream: text stream to write to
+        """
+        json.dump(mud, stream, indent=2)
+
+
+    @classmethod
+    def write_xml_element(c, stream: object, name: str, value: object, module: str, depth: int) -> None:
+        """
+        Write a JSON-encoded value as XML element(s), recursively.
+
+        :param stream: text stream to write to
+        :param name: JSON member name, prefixed with its YANG module name if it differs from its parent's
+        :param value: JSON value
+        :param module: YANG module name of the parent
+        :param depth: nesting depth, for indentation
+        """
+        if ":" in name:
+            module, name = name.split(":", 1)
+        tag = f"{module}:{name}"
+        indent = "  " * depth
+
+        # YANG lists: one element per entry
+        if isinstance(value, list) and value != [None]:
+            for entry in value:
+                c.write_xml_element(stream, tag, entry, module, depth)
+            return
+
+        if isinstance(value, dict):
+            stream.write(f"{indent}<{tag}>\n")
+            for child_name, child_value in value.items():
+                c.write_xml_element(stream, child_name, child_value, module, depth + 1)
+            stream.write(f"{indent}</{tag}>\n")
+        elif value == [None] or value is None:
+            # YANG leaf of type "empty"
+            stream.write(f"{indent}<{tag}/>\n")
+        elif isinstance(value, bool):
+            stream.write(f"{indent}<{tag}>{'true' if value else 'false'}</{tag}>\n")
+        else:
+            stream.write(f"{indent}<{tag}>{escape(str(value))}</{tag}>\n")
+
+
+    @classmethod
+    def write_xml(c, mud: dict, stream: object) -> None:
+        """
+        Write a MUD profile as an XML document, one prefix per YANG module.
+
+        :param mud: MUD profile dictionary, JSON-encoded
+        :param stream: text stream to write to
+        """
+        namespaces = " ".join(f'xmlns:{module}="{c.NAMESPACE}{module}"' for module in c.modules)
+        stream.write("<?xml version='1.0' encoding='UTF-8'?>\n")
+        stream.write(f"<data {namespaces}>\n")
+        for name, value in mud.items():
+            c.write_xml_element(stream, name, value, None, 1)
+        stream.write("</data>\n")
+
+
+    def write(self, path: str) -> None:
+        """
+        Generate a MUD profile, and write it to a file,
+        as JSON or XML depending on the file extension.
+
+        :param path: output file path (".json" or ".xml")
+        :raises ValueError: unrecognized MUD file format
+        """
+        if path.endswith(".json"):
+            write = self.write_json
+        elif path.endswith(".xml"):
+            write = self.write_xml
+        else:
+            raise ValueError("Unrecognized MUD file format")
+        with open(path, "w") as mud_file:
+            write(self.generate(), mud_file)
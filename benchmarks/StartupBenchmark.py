@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import os
+import sys
+import time
+import tempfile
+import platform
+import statistics
+import subprocess
+
+
+class StartupBenchmark:
+    """
+    Cold start benchmark of the translator's command line entry points.
+    Each entry point (the mud_translator.py script, and optionally the zipapp)
+    translates a small MUD file in a new interpreter process, in two cases:
+        - translate: translation cache disabled, i.e. full translation,
+        - cache-hit: translated profile restored from a warm translation cache.
+    Timings are the median of several runs. The startup overhead of an entry point
+    is its time minus the time of a bare interpreter, which is less machine-dependent,
+    and is checked against two targets: an absolute one, such that small regressions cannot pile up,
+    and one relative to the startup overhead of a baseline checkout of the translator (e.g. the previous commit),
+    benchmarked in the same run, on the same machine, for the cases whose arguments the baseline supports.
+    """
+
+    # Benchmarked cases, and their additional command line arguments
+    cases = {
+        "translate": ["--no-cache"],
+        "cache-hit": []
+    }
+
+    # Default input MUD file, relative to the repository root
+    default_input = os.path.join("examples", "json", "TPLink-Plug-Mudgee.json")
+
+    # Repository root
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+    def __init__(self, zipapp: str = None, input: str = None, repeat: int = 20, target_ms: float = None,
+                 baseline: str = None, tolerance: float = 10.0) -> None:
+        """
+        Constructor for the StartupBenchmark class.
+
+        :param zipapp: path of the zipapp to benchmark, in addition to the script (default: script only)
+        :param input: input MUD file (default: example TP-Link plug MUD file)
+        :param repeat: number of timed runs per entry point and case, the median is kept
+        :param target_ms: maximum startup overhead, in milliseconds (default: no target)
+        :param baseline: root directory of a baseline checkout of the translator, whose script is benchmarked too,
+                         in the cases whose arguments it supports (default: no baseline)
+        :param tolerance: maximum startup overhead over the baseline's, in percent of the baseline's, for each case
+        """
+        self.entry_points = {"script": os.path.join(self.root, "mud_translator.py")}
+        if zipapp is not None:
+            self.entry_points["zipapp"] = zipapp
+        if baseline is not None:
+            self.entry_points["baseline"] = os.path.join(baseline, "mud_translator.py")
+        self.input = input if input is not None else os.path.join(self.root, self.default_input)
+        self.repeat = max(1, repeat)
+        self.target_ms = target_ms
+        self.baseline = baseline
+        self.tolerance = tolerance
+
+
+    def supported_cases(self, path: str, env: dict) -> dict:
+        """
+        Select the benchmarked cases whose command line options an entry point supports,
+        according to its help, e.g. a baseline checkout predating an option.
+
+        :param path: entry point path
+        :param env: environment variables of the entry point
+        :return: mapping between supported cases and their additional command line arguments
+        :raises subprocess.CalledProcessError: the entry point failed to print its help
+        """
+        help = subprocess.run([sys.executable, path, "--help"], env=env, check=True,
+                              stdout=subprocess.PIPE, text=True).stdout
+        return {case: arguments for case, arguments in self.cases.items()
+                if all(argument in help for argument in arguments if argument.startswith("--"))}
+
+
+    def time_commands(self, commands: dict, env: dict) -> dict:
+        """
+        Time commands, as the median of several runs.
+        The runs of the commands are interleaved, such that a slowdown of the machine during the benchmark
+        affects all commands alike.
+
+        :param commands: mapping between command names and command lines
+        :param env: environment variables of the commands
+        :return: mapping between command names and their median elapsed time, in milliseconds
+        :raises subprocess.CalledProcessError: a command failed
+        """
+        timings = {name: [] for name in commands}
+        for _ in range(self.repeat):
+            for name, command in commands.items():
+                start = time.perf_counter()
+                subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+                timings[name].append((time.perf_counter() - start) * 1000)
+        return {name: statistics.median(command_timings) for name, command_timings in timings.items()}
+
+
+    def run(self) -> dict:
+        """
+        Run the startup benchmark.
+        A human-readable summary is printed on the standard error.
+
+        :return: machine-readable benchmark report, with a "passed" flag if a target or a baseline is given
+        """
+        report = {
+            "python": platform.python_version(),
+            "repeat": self.repeat,
+            "input": self.input,
+            "target-ms": self.target_ms,
+            "baseline": self.baseline,
+            "tolerance": self.tolerance if self.baseline is not None else None,
+            "results": {}
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, XDG_CACHE_HOME=os.path.join(directory, "cache"))
+            output = os.path.join(directory, "output.yaml")
+            commands = {("python", None): [sys.executable, "-c", "pass"]}
+            for entry_point, path in self.entry_points.items():
+                cases = self.supported_cases(path, env) if entry_point == "baseline" else self.cases
+                for case in self.cases.keys() - cases.keys():
+                    print(f"{entry_point} does not support the {case} case, skipped", file=sys.stderr)
+                for case, arguments in cases.items():
+                    command = [sys.executable, path, *arguments, self.input, "-o", output]
+                    if case == "cache-hit":
+                        # Warm the translation cache
+                        subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+                    commands[(entry_point, case)] = command
+            timings = self.time_commands(commands, env)
+
+            baseline = report["python-ms"] = timings.pop(("python", None))
+            print(f"{'python':>8}: {baseline:.1f} ms", file=sys.stderr)
+            for (entry_point, case), milliseconds in timings.items():
+                report["results"].setdefault(entry_point, {})[case] = {"ms": milliseconds, "overhead-ms": milliseconds - baseline}
+            for entry_point, results in report["results"].items():
+                print(f"{entry_point:>8}: " + ", ".join(
+                    f"{case} {result['ms']:.1f} ms (+{result['overhead-ms']:.1f} ms)" for case, result in results.items()
+                ), file=sys.stderr)
+
+        if self.target_ms is not None or self.baseline is not None:
+            report["passed"] = True
+        for entry_point, results in report["results"].items():
+            if entry_point == "baseline":
+                continue
+            for case, result in results.items():
+                if self.target_ms is not None and result["overhead-ms"] > self.target_ms:
+                    report["passed"] = False
+                    print(f"Startup overhead of {entry_point} ({case}) {result['overhead-ms']:.1f} ms exceeds "
+                          f"the target of {self.target_ms:.1f} ms", file=sys.stderr)
+                # Each case against the same case of the baseline, if the baseline supports it
+                if self.baseline is not None and case in report["results"]["baseline"]:
+                    target = report["results"]["baseline"][case]["overhead-ms"] * (1 + self.tolerance / 100)
+                    if result["overhead-ms"] > target:
+                        report["passed"] = False
+                        print(f"Startup overhead of {entry_point} ({case}) {result['overhead-ms']:.1f} ms exceeds "
+                              f"the baseline's by more than {self.tolerance:g}% ({target:.1f} ms)", file=sys.stderr)
+        return report
@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import os
+import gc
+import sys
+import time
+import platform
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from argparse import Namespace
+from parsers.mud.MudParser import MudParser
+from writers.YamlWriter import YamlWriter
+from benchmarks.ProfileGenerator import ProfileGenerator
+
+
+class TranslationBenchmark:
+    """
+    Benchmark suite for the translation pipeline.
+    For each MUD file format and profile size, a synthetic profile is generated,
+    and the following stages are timed separately:
+        - read: reading the input MUD file (read_input),
+        - translate: translating the ACEs into single policies,
+        - write: writing the output YAML file (write_output),
+        - total: end-to-end translation of the input MUD file (parse), as run by the translator.
+    Timings are the best of several runs, and peak memory is measured in a separate traced run,
+    as tracing slows down allocations.
+    """
+
+    # Benchmarked stages
+    stages = ["read", "translate", "write", "total"]
+
+    # File extensions, per MUD file format
+    extensions = {
+        "json": ".json",
+        "xml": ".xml"
+    }
+
+
+    def __init__(self, sizes: list, formats: list = ["json", "xml"], repeat: int = 3, memory: bool = True,
+                 directory: str = None, **generator_options) -> None:
+        """
+        Constructor for the TranslationBenchmark class.
+
+        :param sizes: profile sizes, in number of ACEs
+        :param formats: MUD file formats ("json" and/or "xml")
+        :param repeat: number of timed runs per profile, the best one is kept
+        :param memory: whether to measure the peak memory of each stage
+        :param directory: directory for the generated profiles and translated outputs (default: temporary directory)
+        :param generator_options: additional options for the profile generator (see ProfileGenerator)
+        """
+        self.sizes = sizes
+        self.formats = formats
+        self.repeat = max(1, repeat)
+        self.memory = memory
+        self.directory = directory
+        self.generator_options = generator_options
+
+
+    @contextmanager
+    def stage(self, results: dict, name: str, trace: bool) -> None:
+        """
+        Measure a stage: elapsed time, or peak memory if tracing.
+
+        :param results: mapping between stage names and measures, updated with the stage's measure
+        :param name: stage name
+        :param trace: measure the peak memory allocated by the stage, instead of its elapsed time
+        """
+        gc.collect()
+        if trace:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            yield
+            results[name] = tracemalloc.get_traced_memory()[1] - baseline
+        else:
+            start = time.perf_counter()
+            yield
+            results[name] = time.perf_counter() - start
+
+
+    def run_once(self, input: str, output: str, trace: bool = False) -> dict:
+        """
+        Run all stages once over a MUD file.
+
+        :param input: input MUD file
+        :param output: output YAML file
+        :param trace: measure peak memory instead of elapsed time
+        :return: mapping between stage names and measures (seconds, or bytes if tracing)
+        """
+        results = {}
+        args = Namespace(input=input, output=output, mac=None, ipv4=None, ipv6=None, network=None)
+
+        with self.stage(results, "read", trace):
+            data = MudParser.init_parser(Namespace(**vars(args))).read_input()
+
+        with self.stage(results, "translate", trace):
+            mud_parser = MudParser.init_memory_parser(data)
+            yaml_data = mud_parser.translate()
+
+        mud_parser.output = output
+        with self.stage(results, "write", trace):
+            mud_parser.write_output(yaml_data)
+        del data, yaml_data, mud_parser
+
+        with self.stage(results, "total", trace):
+            MudParser.init_parser(Namespace(**vars(args))).parse()
+
+        return results
+
+
+    def run_profile(self, format: str, size: int, directory: str) -> dict:
+        """
+        Benchmark the translation of a synthetic profile.
+
+        :param format: MUD file format ("json" or "xml")
+        :param size: profile size, in number of ACEs
+        :param directory: directory for the generated profile and translated output
+        :return: dict containing the profile characteristics and the measures of each stage
+        """
+        input = os.path.join(directory, f"synthetic-{size}{self.extensions[format]}")
+        output = os.path.join(directory, f"synthetic-{size}-{format}.yaml")
+        ProfileGenerator(aces=size, **self.generator_options).write(input)
+
+        # Timings: best of several runs
+        timings = {}
+        for _ in range(self.repeat):
+            for stage, seconds in self.run_once(input, output).items():
+                timings[stage] = min(seconds, timings.get(stage, seconds))
+
+        # Peak memory: separate traced run
+        peaks = {}
+        if self.memory:
+            tracemalloc.start()
+            try:
+                peaks = self.run_once(input, output, trace=True)
+            finally:
+                tracemalloc.stop()
+
+        input_bytes = os.path.getsize(input)
+        stages = {}
+        for stage in self.stages:
+            seconds = timings[stage]
+            stages[stage] = {
+                "seconds": seconds,
+                "aces-per-second": size / seconds if seconds > 0 else None,
+                "input-mb-per-second": input_bytes / seconds / 1e6 if seconds > 0 else None,
+                "peak-bytes": peaks.get(stage, None)
+            }
+
+        return {
+            "format": format,
+            "aces": size,
+            "input-bytes": input_bytes,
+            "output-bytes": os.path.getsize(output),
+            "stages": stages
+        }
+
+
+    def run(self) -> dict:
+        """
+        Run the benchmark suite over all formats and sizes.
+        A human-readable summary is printed on the standard error.
+
+        :return: machine-readable benchmark report
+        """
+        report = {
+            "translator-version": MudParser.VERSION,
+            "python": platform.python_version(),
+            "yaml-dumper": YamlWriter.Dumper.__name__,
+            "repeat": self.repeat,
+            "generator": self.generator_options,
+            "results": []
+        }
+        with tempfile.TemporaryDirectory(dir=self.directory) as directory:
+            for format in self.formats:
+                for size in self.sizes:
+                    result = self.run_profile(format, size, directory)
+                    report["results"].append(result)
+                    self.print_result(result)
+        return report
+
+
+    def print_result(self, result: dict) -> None:
+        """
+        Print a human-readable summary of a profile benchmark on the standard error.
+
+        :param result: profile benchmark result
+        """
+        measures = []
+        for stage, measure in result["stages"].items():
+            summary = f"{stage} {measure['seconds'] * 1000:.1f} ms"
+            if measure["peak-bytes"] is not None:
+                summary += f" / {measure['peak-bytes'] / (1024 * 1024):.1f} MiB"
+            measures.append(summary)
+        print(f"{result['format']:>4} {result['aces']:>8} ACEs: {', '.join(measures)}", file=sys.stderr)
@@ -5,10 +5,12 @@ Translate a MUD profile (JSON/XML) into a YAML extended profile.
 """
 
 # Libraries
+from __future__ import annotations
+import os
+import sys
 import argparse
-import re
-import ipaddress
 # Custom modules
+# (modules only needed by some code paths are imported when needed, to keep startup fast)
 from parsers.mud.MudParser import MudParser
 
 
@@ -20,34 +22,220 @@ def mac_address_type(mac_address: str) -> str:
     :return: MAC address if valid
     :raises argparse.ArgumentTypeError: invalid MAC address
     """
-    # Define a regular expression pattern for a MAC address
-    mac_pattern = re.compile(r'^([0-9A-Fa-f]{2}[:-]){5}([0-9A-Fa-f]{2})$')
     # Check if given argument matches the MAC pattern
-    if not mac_pattern.match(mac_address):
+    if not MudParser.mac_regex.match(mac_address):
         raise argparse.ArgumentTypeError(f"Invalid MAC address: {mac_address}")
     return mac_address
 
 
-##### MAIN #####
-if __name__ == "__main__":
-    
+def ip_address_type(ip_address: str) -> object:
+    """
+    Check if the given argument is a valid IP address.
+
+    :param ip_address: given IP address
+    :return: IP address object if valid
+    :raises argparse.ArgumentTypeError: invalid IP address
+    """
+    import ipaddress
+    try:
+        return ipaddress.ip_address(ip_address)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid IP address: {ip_address}")
+
+
+def translate(mud: dict | bytes | str, *, mac: str = None, ipv4: str = None, ipv6: str = None, network: str = None) -> dict:
+    """
+    Translate a MUD profile into a YAML extended profile, entirely in memory.
+
+    :param mud: MUD profile, either already decoded as a dict, or as a JSON or XML document
+    :param mac: device MAC address
+    :param ipv4: device IPv4 address
+    :param ipv6: device IPv6 address
+    :param network: device network interface ("wired" or "wireless")
+    :return: dictionary containing the translated profile, as plain dicts and lists
+    :raises ValueError: unrecognized MUD profile format, invalid device option, or invalid MUD profile
+    """
+    mud_parser = MudParser.init_memory_parser(mud, mac, ipv4, ipv6, network)
+    profile = mud_parser.translate()
+    mud_parser.finish_stats()
+    # IR records are converted, such that the profile can be used like any loaded profile
+    from parsers.ir.Record import Record
+    return Record.plain(profile)
+
+
+def serialize(profile: dict, stream: object = None) -> str:
+    """
+    Serialize a translated profile to YAML.
+
+    :param profile: dictionary containing the translated profile, as returned by translate
+    :param stream: stream to write the YAML document to, if any
+    :return: YAML document if no stream was given, None otherwise
+    """
+    return MudParser.dump(profile, stream)
+
+
+def main(argv: list = None) -> int:
+    """
+    Command line entry point.
+
+    :param argv: command line arguments (default: sys.argv[1:])
+    :return: exit status
+    """
+
     ## Parse command line arguments
     arg_parser = argparse.ArgumentParser(description="Translate a MUD profile (JSON/XML) into a YAML extended profile.")
-    # Positional (mandatory) argument: Input file
-    arg_parser.add_argument("input", type=str, help="Input MUD file (JSON or XML)")
+    # Positional (mandatory) argument: Input file(s)
+    arg_parser.add_argument("input", type=str, nargs="*", help="Input MUD file(s) (JSON or XML), directories, glob patterns or MUD URLs, or - to translate a stream of MUD documents (JSON lines, or concatenated XML documents) from the standard input")
     # Optional argument #1: Output file
-    arg_parser.add_argument("-o", "--output", type=str, help="Output YAML file")
+    arg_parser.add_argument("-o", "--output", type=str, help="Output YAML file (output directory in batch mode; - or default for the standard output when reading from the standard input)")
     # Optional argument #2: device MAC address
     arg_parser.add_argument("-m", "--mac", type=mac_address_type, help="Device MAC address")
     # Optional argument #3: device IPv4 address
-    arg_parser.add_argument("-4", "--ipv4", type=ipaddress.ip_address, help="Device IPv4 address")
+    arg_parser.add_argument("-4", "--ipv4", type=ip_address_type, help="Device IPv4 address")
     # Optional argument #4: device IPv6 address
-    arg_parser.add_argument("-6", "--ipv6", type=ipaddress.ip_address, help="Device IPv6 address")
+    arg_parser.add_argument("-6", "--ipv6", type=ip_address_type, help="Device IPv6 address")
     # Optional argument #5: network interface
-    arg_parser.add_argument("-n", "--network", type=str, choices=["wired", "wireless"], help="Network interface")
+    arg_parser.add_argument("-n", "--network", type=str, choices=MudParser.networks, help="Network interface")
+    # Optional argument #6: number of worker processes in batch mode
+    arg_parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes in batch mode (default: number of CPUs)")
+    # Output format arguments
+    arg_parser.add_argument("-f", "--format", type=str, choices=list(MudParser.output_formats), default="yaml", help="Output format: YAML extended profile, compact JSON profile, memory-mappable binary profile, or nftables ruleset (default: yaml)")
+    arg_parser.add_argument("--check", action="store_true", help="Check the syntax of the nftables ruleset, with nft --check if available, or offline")
+    # Optional argument #7: stream single policies to the output file
+    arg_parser.add_argument("--stream-policies", action="store_true", help="Stream single policies to the output file as they are produced, instead of holding the whole profile in memory")
+    # Optional argument #8: aggregate single policies
+    arg_parser.add_argument("--aggregate", action="store_true", help="Merge duplicate single policies, coalesce port matches into ranges, and remove shadowed policies")
+    # Optional argument #9: report overlapping network matches
+    arg_parser.add_argument("--report-overlaps", action="store_true", help="Report single policies whose IP network match is contained in another policy's")
+    # Fleet arguments
+    arg_parser.add_argument("--inventory", type=str, metavar="PATH", help="Translate the MUD file once for all devices of a CSV or JSON lines (.jsonl) inventory, with fields name, mac, ipv4, ipv6 and network; the output is a multi-document YAML file if it ends with .yaml, otherwise a directory with one profile per device")
+    # Differential output arguments
+    arg_parser.add_argument("--diff", type=str, metavar="PREV.yaml", help="Also write the change set (added, removed and modified single policies, device information changes, and policy hashes) from a previous translated profile")
+    arg_parser.add_argument("--diff-output", type=str, metavar="PATH", help="Change set output file (default: output YAML file with the .diff.yaml extension)")
+    # Traffic matching arguments
+    arg_parser.add_argument("--match-flows", type=str, metavar="CAPTURE", help="Match the flows of captured traffic (pcap, or CSV with columns src, dst, proto, sport, dport, type, src-mac, dst-mac, packets) against the translated profile, and write the hits of each single policy and the unmatched flows (requires NumPy)")
+    arg_parser.add_argument("--match-output", type=str, metavar="PATH", help="Matching result output file (default: output YAML file with the .coverage.yaml extension)")
+    # DNS pre-resolution arguments
+    arg_parser.add_argument("--resolve-dns", action="store_true", help="Resolve the domain names of the single policies, and add the resolved addresses next to them")
+    arg_parser.add_argument("--dns-server", type=str, metavar="HOST[:PORT]", help="DNS server used by --resolve-dns (default: system's DNS server)")
+    # Instrumentation arguments
+    arg_parser.add_argument("--stats", action="store_true", help="Print the time spent in each translation stage, and translation counters, on the standard error")
+    arg_parser.add_argument("--profile", action="store_true", help="Same as --stats, with the peak memory allocated by each stage (slower)")
+    arg_parser.add_argument("--stats-json", type=str, metavar="PATH", help="Append the translation statistics to the given JSON lines file, one line per translated MUD file")
+    # Policy library arguments
+    arg_parser.add_argument("--library", type=str, metavar="PATH", help="Batch mode: intern the single policies shared by several translated profiles into this policy library file, and reference them by ID in the profiles (yaml, json or bin format)")
+    # Watch mode arguments
+    arg_parser.add_argument("--watch", action="store_true", help="Translate the MUD files of the input directories (or input MUD files), then retranslate them when they change, until interrupted; the output is a directory, as in batch mode")
+    arg_parser.add_argument("--debounce", type=float, metavar="SECONDS", help="Watch mode: translate a changed MUD file once it has not changed for this delay (default: 0.5)")
+    arg_parser.add_argument("--poll-interval", type=float, metavar="SECONDS", help="Watch mode: poll the MUD files at this interval, instead of using inotify (e.g. on network file systems); polling is used anyway if inotify is unavailable (default: 1)")
+    # Translation server arguments
+    arg_parser.add_argument("--serve", type=str, metavar="ADDRESS", help="Run a translation server on the given address: unix:PATH or [HOST:]PORT")
+    arg_parser.add_argument("--max-pending", type=int, help="Maximum number of pending requests of the translation server (default: 64)")
+    # Translation cache arguments
+    arg_parser.add_argument("--no-cache", action="store_true", help="Do not use the translation cache")
+    arg_parser.add_argument("--cache-dir", type=str, help="Translation cache directory (default: mud-translator in $XDG_CACHE_HOME, or in ~/.cache)")
+    arg_parser.add_argument("--cache-max-size", type=float, help="Maximum translation cache size, in MiB (default: 256)")
+    arg_parser.add_argument("--cache-max-age", type=float, help="Maximum time since last use of a translation cache entry, in days (default: 30)")
     # Parse arguments
-    args = arg_parser.parse_args()
+    args = arg_parser.parse_args(argv)
+
+    # Server mode
+    if args.serve is not None:
+        from translator.TranslationServer import TranslationServer
+        try:
+            TranslationServer(args).run()
+        except OSError as e:
+            arg_parser.error(f"--serve: {e}")
+        return 0
+    if not args.input:
+        arg_parser.error("the following arguments are required: input")
+
+    # Translation cache
+    args.cache = None
+    if not args.no_cache:
+        from translator.TranslationCache import TranslationCache
+        args.cache = TranslationCache(
+            args.cache_dir,
+            None if args.cache_max_size is None else int(args.cache_max_size * 1024 * 1024),
+            None if args.cache_max_age is None else args.cache_max_age * 24 * 3600
+        )
+
+    if args.diff is not None and args.inventory is not None:
+        arg_parser.error("--diff cannot be combined with --inventory")
+    if args.format == "nft" and args.diff is not None:
+        arg_parser.error("--diff requires a translated profile format: yaml, json or bin")
+    if args.format != "yaml" and args.inventory is not None:
+        arg_parser.error("--inventory requires the yaml format")
+    if args.match_flows is not None:
+        import importlib.util
+        if importlib.util.find_spec("numpy") is None:
+            arg_parser.error("--match-flows requires NumPy")
+        if args.format == "nft" or args.inventory is not None:
+            arg_parser.error("--match-flows requires a translated profile format: yaml, json or bin, and cannot be combined with --inventory")
+
+    if args.library is not None:
+        if args.format == "nft":
+            arg_parser.error("--library requires a translated profile format: yaml, json or bin")
+        if args.inventory is not None or args.watch or "-" in args.input:
+            arg_parser.error("--library cannot be combined with --inventory, --watch or the standard input")
+
+    # Fleet mode: one MUD file, many devices
+    if args.inventory is not None:
+        if len(args.input) != 1:
+            arg_parser.error("--inventory requires a single input MUD file")
+        if any(option is not None for option in (args.mac, args.ipv4, args.ipv6, args.network)):
+            arg_parser.error("--inventory cannot be combined with device options")
+        if args.watch or args.input[0] == "-":
+            arg_parser.error("--inventory cannot be combined with --watch or the standard input")
+        from translator.FleetTranslator import FleetTranslator
+        args.input = args.input[0]
+        FleetTranslator(args).run()
+        return 0
+
+    # Pipeline mode: stream of MUD documents on the standard input
+    if "-" in args.input:
+        from translator.StreamTranslator import StreamTranslator
+        if len(args.input) != 1:
+            arg_parser.error("the standard input (-) must be the only input")
+        if args.format not in StreamTranslator.output_formats:
+            arg_parser.error("reading from the standard input requires the yaml or json format")
+        if args.diff is not None or args.match_flows is not None or args.watch:
+            arg_parser.error("--diff, --match-flows and --watch cannot be combined with the standard input")
+        _, failures = StreamTranslator(args).run()
+        return 1 if failures else 0
+
+    # Watch mode: batch mode, then retranslation of the changed MUD files
+    if args.watch:
+        if args.diff is not None or args.match_flows is not None:
+            arg_parser.error("--diff and --match-flows cannot be combined with --watch")
+        if any(not os.path.exists(input) for input in args.input):
+            arg_parser.error("--watch requires existing MUD files or directories (no glob patterns or URLs)")
+        from translator.WatchTranslator import WatchTranslator
+        results = WatchTranslator(args).run()
+        return 1 if any(error is not None for _, _, error, _ in results) else 0
+    # Batch mode: multiple files, directories, glob patterns or URLs
+    # (a single existing MUD file is translated directly, without loading the batch mode)
+    if len(args.input) != 1 or not os.path.isfile(args.input[0]):
+        from translator.BatchTranslator import BatchTranslator
+        is_batch = BatchTranslator.is_batch(args.input)
+    else:
+        is_batch = False
+    if is_batch:
+        if args.diff is not None or args.match_flows is not None:
+            arg_parser.error("--diff and --match-flows require a single input MUD file")
+        results = BatchTranslator(args).run()
+        return 1 if any(error is not None for _, _, error, _ in results) else 0
+
+    if args.library is not None:
+        arg_parser.error("--library requires multiple input MUD files (batch mode)")
 
     # Parse input file
+    args.input = args.input[0]
     mud_parser = MudParser.init_parser(args)
     mud_parser.parse()
+    return 0
+
+
+##### MAIN #####
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+from parsers.ir.Record import Record
+
+
+class DeviceInfo(Record):
+    """
+    Device information of a translated profile:
+    MUD file's system information, and device options.
+    """
+
+    __slots__ = ("name", "mac", "ipv4", "ipv6", "network")
+
+    # Mapping between YAML profile fields and slot names
+    fields = {
+        "name": "name",
+        "mac": "mac",
+        "ipv4": "ipv4",
+        "ipv6": "ipv6",
+        "network": "network"
+    }
+
+
+    def __init__(self, name: str = None, mac: str = None, ipv4: str = None, ipv6: str = None, network: str = None) -> None:
+        """
+        Constructor for the DeviceInfo class.
+
+        :param name: MUD file's system information
+        :param mac: device MAC address
+        :param ipv4: device IPv4 address
+        :param ipv6: device IPv6 address
+        :param network: device network interface ("wired" or "wireless")
+        """
+        self.name = name
+        self.mac = mac
+        self.ipv4 = ipv4
+        self.ipv6 = ipv6
+        self.network = network
@@ -0,0 +1,26 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+from parsers.ir.Record import Record
+
+
+class IcmpMatch(Record):
+    """
+    ICMP match of a single policy: ICMP type name.
+    """
+
+    __slots__ = ("type",)
+
+    # Mapping between YAML profile fields and slot names
+    fields = {
+        "type": "type"
+    }
+
+
+    def __init__(self, type: str = None) -> None:
+        """
+        Constructor for the IcmpMatch class.
+
+        :param type: ICMP type name
+        """
+        self.type = type if type is None else self.intern(type)
@@ -0,0 +1,37 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+from parsers.ir.Record import Record
+
+
+class NetworkMatch(Record):
+    """
+    Network layer (IPv4 or v6) match of a single policy:
+    source and destination networks (CIDR, domain name, or "local"),
+    and the addresses resolved from domain names, if pre-resolved (see DnsResolver).
+    """
+
+    __slots__ = ("src", "dst", "src_resolved", "dst_resolved")
+
+    # Mapping between YAML profile fields and slot names
+    fields = {
+        "src": "src",
+        "dst": "dst",
+        "src-resolved": "src_resolved",
+        "dst-resolved": "dst_resolved"
+    }
+
+
+    def __init__(self, src: str = None, dst: str = None, src_resolved: list = None, dst_resolved: list = None) -> None:
+        """
+        Constructor for the NetworkMatch class.
+
+        :param src: source network
+        :param dst: destination network
+        :param src_resolved: addresses resolved from the source domain name
+        :param dst_resolved: addresses resolved from the destination domain name
+        """
+        self.src = src if src is None else self.intern(src)
+        self.dst = dst if dst is None else self.intern(dst)
+        self.src_resolved = src_resolved
+        self.dst_resolved = dst_resolved
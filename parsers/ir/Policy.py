@@ -0,0 +1,36 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+from parsers.ir.Record import Record
+
+
+class Policy(Record):
+    """
+    Single policy, translated from an ACE:
+    protocol matches, by protocol name
+    (NetworkMatch, PortMatch, IcmpMatch, or dict for third-party protocol parsers),
+    and metadata of bidirectional policies.
+    """
+
+    __slots__ = ("protocols", "bidirectional", "stats")
+
+    # Mapping between YAML profile fields and slot names
+    # (in the order of the translated profile's JSON serialization)
+    fields = {
+        "protocols": "protocols",
+        "bidirectional": "bidirectional",
+        "stats": "stats"
+    }
+
+
+    def __init__(self, protocols: dict = None, bidirectional: bool = None, stats: dict = None) -> None:
+        """
+        Constructor for the Policy class.
+
+        :param protocols: mapping between protocol names and protocol matches (default: empty)
+        :param bidirectional: True if the policy also allows the reply traffic
+        :param stats: policy statistics
+        """
+        self.protocols = {} if protocols is None else protocols
+        self.bidirectional = bidirectional
+        self.stats = stats
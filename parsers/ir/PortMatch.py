@@ -0,0 +1,31 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+from parsers.ir.Record import Record
+
+
+class PortMatch(Record):
+    """
+    Transport layer (TCP or UDP) match of a single policy:
+    source and destination port matches
+    (port number, "<= port", ">= port", "!= port", "low-high", or list of those).
+    """
+
+    __slots__ = ("src_port", "dst_port")
+
+    # Mapping between YAML profile fields and slot names
+    fields = {
+        "src-port": "src_port",
+        "dst-port": "dst_port"
+    }
+
+
+    def __init__(self, src_port: int | str | list = None, dst_port: int | str | list = None) -> None:
+        """
+        Constructor for the PortMatch class.
+
+        :param src_port: source port match
+        :param dst_port: destination port match
+        """
+        self.src_port = src_port if src_port is None else self.intern(src_port)
+        self.dst_port = dst_port if dst_port is None else self.intern(dst_port)
@@ -0,0 +1,188 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import sys
+from operator import attrgetter
+from collections.abc import Iterator, MutableMapping
+
+
+class Record(MutableMapping):
+    """
+    Base class of the typed intermediate representation (IR) of translated profiles.
+    Records store their fields in slots, instead of per-object dicts,
+    with string values interned, as the same values repeat across policies.
+    Fields are accessed as typed attributes (e.g. match.src_port),
+    and records also behave as mappings of the YAML profile fields (e.g. match["src-port"]),
+    unset fields (None) being absent,
+    such that passes and backends handle IR records and profiles read back from YAML files alike.
+    """
+
+    __slots__ = ()
+
+    # Mapping between YAML profile fields and slot names, defined by concrete records
+    fields = {}
+
+    # Getter of all slot values, and slot values of an empty record, set for each concrete record
+    values = None
+    empty = None
+
+
+    def __init_subclass__(c, **kwargs) -> None:
+        """
+        Set the slot values getter of a concrete record,
+        such that checking whether a record is empty is a single comparison.
+        """
+        super().__init_subclass__(**kwargs)
+        c.values = attrgetter(*c.__slots__)
+        c.empty = (None,) * len(c.__slots__) if len(c.__slots__) > 1 else None
+
+
+    @staticmethod
+    def intern(value: object) -> object:
+        """
+        Intern a string value.
+
+        :param value: field value
+        :return: interned string, or the value itself if not a string
+        """
+        return sys.intern(value) if type(value) is str else value
+
+
+    @staticmethod
+    def plain(value: object) -> object:
+        """
+        Convert a (nested) field value to plain Python types.
+
+        :param value: field value, record, or container of records
+        :return: value with records converted to dicts
+        """
+        if isinstance(value, Record):
+            return value.to_dict()
+        if isinstance(value, dict):
+            return {key: Record.plain(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [Record.plain(item) for item in value]
+        return value
+
+
+    @staticmethod
+    def json_default(value: object) -> object:
+        """
+        Serialize records with the json module (as json.dumps's default argument).
+
+        :param value: value not serializable by the json module
+        :return: dict if the value is a record, string otherwise
+        """
+        if isinstance(value, Record):
+            return value.to_dict()
+        return str(value)
+
+
+    def to_dict(self) -> dict:
+        """
+        Convert the record to a plain dict, as in the YAML profile.
+
+        :return: dict of the set fields
+        """
+        return {key: self.plain(getattr(self, slot)) for key, slot in self.fields.items() if getattr(self, slot) is not None}
+
+
+    def __getitem__(self, key: str) -> object:
+        """
+        Get the value of a set field.
+
+        :param key: YAML profile field
+        :return: field value
+        :raises KeyError: if the field is unknown or unset
+        """
+        slot = self.fields.get(key, None)
+        value = None if slot is None else getattr(self, slot)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+
+    def get(self, key: str, default: object = None) -> object:
+        """
+        Get the value of a field, with a default value if unknown or unset.
+
+        :param key: YAML profile field
+        :param default: default value
+        :return: field value, or default value
+        """
+        slot = self.fields.get(key, None)
+        value = None if slot is None else getattr(self, slot)
+        return default if value is None else value
+
+
+    def __contains__(self, key: object) -> bool:
+        """
+        Check whether a field is set.
+
+        :param key: YAML profile field
+        :return: True if the field is set
+        """
+        slot = self.fields.get(key, None)
+        return slot is not None and getattr(self, slot) is not None
+
+
+    def __setitem__(self, key: str, value: object) -> None:
+        """
+        Set the value of a field, interning strings.
+
+        :param key: YAML profile field
+        :param value: field value
+        :raises KeyError: if the record has no such field
+        """
+        slot = self.fields.get(key, None)
+        if slot is None:
+            raise KeyError(f"{type(self).__name__} has no field {key}")
+        setattr(self, slot, self.intern(value))
+
+
+    def __delitem__(self, key: str) -> None:
+        """
+        Unset a field.
+
+        :param key: YAML profile field
+        :raises KeyError: if the field is unknown or unset
+        """
+        if key not in self:
+            raise KeyError(key)
+        setattr(self, self.fields[key], None)
+
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Iterate over the set fields, in YAML profile order.
+
+        :return: iterator over YAML profile fields
+        """
+        return (key for key, slot in self.fields.items() if getattr(self, slot) is not None)
+
+
+    def __len__(self) -> int:
+        """
+        Count the set fields.
+
+        :return: number of set fields
+        """
+        return sum(1 for slot in self.fields.values() if getattr(self, slot) is not None)
+
+
+    def __bool__(self) -> bool:
+        """
+        Check whether any field is set, with a single comparison of all slot values.
+
+        :return: True if the record is not empty
+        """
+        return self.values(self) != self.empty
+
+
+    def __repr__(self) -> str:
+        """
+        Represent the record with its set fields.
+
+        :return: record representation
+        """
+        return f"{type(self).__name__}({self.to_dict()!r})"
@@ -1,5 +1,10 @@
 #!/usr/bin/python3
 
+from __future__ import annotations
+from collections.abc import Iterator
+import io
+import os
+import re
 import json
 from parsers.mud.MudParser import MudParser
 
@@ -7,8 +12,211 @@ from parsers.mud.MudParser import MudParser
 class JsonParser(MudParser):
     """
     JSON-format MUD file parser.
+    MUD files larger than a threshold are streamed,
+    such that only the MUD container and the ACE currently being translated are kept in memory.
+    Smaller MUD files are read at once, which is faster.
     """
 
+    # Size of the MUD files from which they are streamed, in bytes
+    stream_threshold = 16 * 1024 * 1024
+
+
+    class Reader:
+        """
+        Incremental JSON reader, over a text stream read in chunks.
+        The document is navigated one container at a time:
+        members and elements are either decoded, skipped without being built, or entered.
+        """
+
+        # Size of the chunks read from the text stream, in characters
+        chunk_size = 1024 * 1024
+
+        # Whitespace between tokens
+        whitespace = re.compile(r"[ \t\n\r]*")
+
+        decoder = json.JSONDecoder()
+
+
+        def __init__(self, stream: object) -> None:
+            """
+            Constructor for the Reader class.
+
+            :param stream: text stream to read the JSON document from
+            """
+            self.stream = stream
+            self.buffer = ""
+            self.pos = 0
+            self.eof = False
+
+
+        def fill(self, size: int = None) -> bool:
+            """
+            Read the next chunk of the text stream,
+            discarding the consumed part of the buffer.
+
+            :param size: number of characters to read (default: chunk size)
+            :return: True if characters were read, False at the end of the stream
+            """
+            chunk = self.stream.read(size or self.chunk_size)
+            self.buffer = self.buffer[self.pos:] + chunk
+            self.pos = 0
+            if not chunk:
+                self.eof = True
+            return bool(chunk)
+
+
+        def peek(self) -> str:
+            """
+            Skip whitespace, and get the next character, without consuming it.
+
+            :return: next character, or "" at the end of the stream
+            """
+            while True:
+                self.pos = self.whitespace.match(self.buffer, self.pos).end()
+                if self.pos < len(self.buffer):
+                    return self.buffer[self.pos]
+                if not self.fill():
+                    return ""
+
+
+        def expect(self, characters: str) -> str:
+            """
+            Skip whitespace, and consume the next character.
+
+            :param characters: allowed characters
+            :return: consumed character
+            :raises ValueError: unexpected character
+            """
+            character = self.peek()
+            if not character or character not in characters:
+                raise ValueError(f"Invalid JSON document: expected one of '{characters}', got '{character}'")
+            self.pos += 1
+            return character
+
+
+        def decode(self) -> object:
+            """
+            Decode the next value.
+            More chunks are read until the buffer contains the whole value,
+            doubling the buffer each time, such that large values are decoded in linear time.
+
+            :return: decoded value
+            :raises ValueError: invalid JSON value
+            """
+            self.peek()
+            while True:
+                try:
+                    value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                    # Numbers and literals may continue in the next chunk
+                    if end < len(self.buffer) or self.eof:
+                        self.pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if self.eof:
+                        raise
+                self.fill(max(self.chunk_size, len(self.buffer) - self.pos))
+
+
+        def skip(self) -> None:
+            """
+            Skip the next value.
+            Values contained in the buffer are skipped by the (fast) decoder,
+            larger containers are entered, and their members or elements skipped one by one,
+            such that they are never built entirely.
+
+            :raises ValueError: invalid JSON value
+            """
+            character = self.peek()
+            if character not in "[{":
+                self.decode()
+                return
+            try:
+                self.pos = self.decoder.raw_decode(self.buffer, self.pos)[1]
+                return
+            except json.JSONDecodeError:
+                # Container continues after the buffer
+                pass
+            for _ in self.members() if character == "{" else self.elements():
+                self.skip()
+
+
+        def members(self) -> Iterator[str]:
+            """
+            Enter the next value, which must be an object, and iterate over its member names.
+            The caller must consume each member's value (decode, skip or enter it) before resuming.
+
+            :return: iterator over member names
+            :raises ValueError: invalid JSON object
+            """
+            self.expect("{")
+            if self.peek() == "}":
+                self.pos += 1
+                return
+            while True:
+                name = self.decode()
+                self.expect(":")
+                yield name
+                if self.expect(",}") == "}":
+                    return
+
+
+        def elements(self) -> Iterator[int]:
+            """
+            Enter the next value, which must be an array, and iterate over its elements.
+            The caller must consume each element (decode, skip or enter it) before resuming.
+
+            :return: iterator over element indices
+            :raises ValueError: invalid JSON array
+            """
+            self.expect("[")
+            if self.peek() == "]":
+                self.pos += 1
+                return
+            index = 0
+            while True:
+                yield index
+                index += 1
+                if self.expect(",]") == "]":
+                    return
+
+
+    def is_streamed(self) -> bool:
+        """
+        Check if the input MUD file is large enough to be streamed.
+
+        :return: True if the input MUD file is streamed, False if it is read at once
+        """
+        if hasattr(self.input, "getbuffer"):
+            # In-memory MUD file
+            return self.input.getbuffer().nbytes >= self.stream_threshold
+        return isinstance(self.input, str) and os.path.getsize(self.input) >= self.stream_threshold
+
+
+    def open_reader(self) -> JsonParser.Reader:
+        """
+        Open the input MUD file for streaming, from its start.
+
+        :return: incremental JSON reader over the input MUD file
+        """
+        if hasattr(self.input, "read"):
+            # In-memory MUD file
+            self.input.seek(0)
+            return self.Reader(io.TextIOWrapper(self.input, encoding="utf-8-sig"))
+        return self.Reader(open(self.input, "r", encoding="utf-8-sig"))
+
+
+    def close_reader(self, reader: JsonParser.Reader) -> None:
+        """
+        Close a reader opened by open_reader, leaving in-memory MUD files open.
+
+        :param reader: incremental JSON reader over the input MUD file
+        """
+        if hasattr(self.input, "read"):
+            reader.stream.detach()
+        else:
+            reader.stream.close()
+
+
     def read_input(self) -> dict:
         """
         Read the input MUD file as a dictionary.
@@ -16,6 +224,101 @@ class JsonParser(MudParser):
         :return: dictionary containing data read from the input MUD file
         """
         data = None
-        with open(self.input, "r") as json_file:
-            data = json.load(json_file)
+        if hasattr(self.input, "read"):
+            # In-memory MUD file
+            data = json.load(self.input)
+        else:
+            with open(self.input, "r") as json_file:
+                data = json.load(json_file)
         return data
+
+
+    def read_mud(self) -> dict:
+        """
+        Read the MUD container from the input MUD file.
+        Large MUD files are streamed, stopping as soon as the MUD container is complete,
+        and skipping the ACLs if they come first.
+
+        :return: dict containing the MUD container
+        :raises KeyError: the input MUD file does not contain a MUD container
+        """
+        if not self.is_streamed():
+            return super().read_mud()
+        reader = self.open_reader()
+        try:
+            for name in reader.members():
+                if name == self.MUD:
+                    return reader.decode()
+                reader.skip()
+        finally:
+            self.close_reader(reader)
+        raise KeyError(self.MUD)
+
+
+    def iter_aces(self, acls: dict) -> Iterator[tuple]:
+        """
+        Iterate over the ACEs of the ACLs referenced in the MUD container.
+        Large MUD files are streamed, one ACE at a time,
+        and the ACLs not referenced in the MUD container are skipped without being built.
+
+        :param acls: mapping between the names of the referenced ACLs and their direction
+        :return: iterator over tuples (direction, ACE dict)
+        """
+        if not self.is_streamed():
+            yield from super().iter_aces(acls)
+            return
+        reader = self.open_reader()
+        try:
+            for name in reader.members():
+                if name != self.ACL:
+                    reader.skip()
+                    continue
+                for name in reader.members():
+                    if name != "acl":
+                        reader.skip()
+                        continue
+                    for _ in reader.elements():
+                        yield from self.stream_acl(reader, acls)
+        finally:
+            self.close_reader(reader)
+
+
+    def stream_acl(self, reader: JsonParser.Reader, acls: dict) -> Iterator[tuple]:
+        """
+        Stream the ACEs of the next ACL, if it is referenced in the MUD container.
+        The ACL name, i.e. the list key, normally precedes the ACEs;
+        otherwise, the ACEs are built until the ACL name is known.
+
+        :param reader: incremental JSON reader, positioned at an ACL
+        :param acls: mapping between the names of the referenced ACLs and their direction
+        :return: iterator over tuples (direction, ACE dict)
+        """
+        acl_name = None
+        direction = None
+        aces = None  # ACEs read before the ACL name
+        for name in reader.members():
+            if name == "name":
+                acl_name = reader.decode()
+                direction = acls.get(acl_name, None)
+            elif name != "aces":
+                reader.skip()
+            elif acl_name is None:
+                aces = reader.decode().get("ace", [])
+            elif direction is None:
+                reader.skip()
+            else:
+                for name in reader.members():
+                    if name != "ace":
+                        reader.skip()
+                        continue
+                    for _ in reader.elements():
+                        yield direction, reader.decode()
+
+        # ACL not referenced in MUD container
+        if direction is None:
+            if self.stats is not None:
+                self.stats.count("skipped-acls")
+            return
+        if aces is not None:
+            for ace in aces:
+                yield direction, ace
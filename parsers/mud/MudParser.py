@@ -1,12 +1,21 @@
 #!/usr/bin/python3
 
 from __future__ import annotations
+from collections.abc import Iterator
+import io
+import os
+import sys
+import time
+import re
 import importlib
 from argparse import Namespace
+from contextlib import nullcontext
 from enum import Enum
-import yaml
 from parsers.Direction import Direction
 from parsers.protocols.Protocol import Protocol
+from parsers.ir.Policy import Policy
+from parsers.ir.DeviceInfo import DeviceInfo
+from translator.TranslationStats import TranslationStats
 
 
 class MudParser:
@@ -15,18 +24,26 @@ class MudParser:
     """
 
     # Global variables
+    VERSION = "1.1.0"  # Translator version
     MUD  = "ietf-mud:mud"
     ACL  = "ietf-access-control-list:access-lists"
     FROM = "from-device-policy"
     TO   = "to-device-policy"
     DIRECTION_INIT = "ietf-mud:direction-initiated"
-    supported_protocols = [
-        "ipv4",
-        "ipv6",
-        "tcp",
-        "udp",
-        "icmp"
-    ]
+
+    # Regex for device MAC address validation
+    mac_regex = re.compile(r'^([0-9A-Fa-f]{2}[:-]){5}([0-9A-Fa-f]{2})$')
+
+    # Supported device network interfaces
+    networks = ["wired", "wireless"]
+
+    # Supported output formats, and their file extensions
+    output_formats = {
+        "yaml": ".yaml",
+        "json": ".profile.json",
+        "bin": ".bin",
+        "nft": ".nft"
+    }
 
     class Format(Enum):
         """
@@ -37,31 +54,120 @@ class MudParser:
 
 
     @classmethod
-    def init_parser(c, args: Namespace) -> MudParser:
+    def init_parser(c, args: Namespace, format: Format = None) -> MudParser:
         """
         Initialize the parser.
 
         :param args: command line arguments
+        :param format: MUD file format, determined from the input file extension if not given
         :return: parser object
         :raises ValueError: unrecognized MUD file format
         """
-        parser = None
-        if args.input.endswith(".json"):
-            parser = "JsonParser"
-            # Set output file if not specified
-            if args.output is None:
-                args.output = args.input.replace(".json", ".yaml")
-        elif args.input.endswith(".xml"):
-            parser = "XmlParser"
+        if format is None:
+            # Determine format from the input file extension
+            if args.input.endswith(".json"):
+                format = c.Format.JSON
+            elif args.input.endswith(".xml"):
+                format = c.Format.XML
+            else:
+                raise ValueError("Unrecognized MUD file format")
+
             # Set output file if not specified
             if args.output is None:
-                args.output = args.input.replace(".xml", ".yaml")
-        else:
-            raise ValueError("Unrecognized MUD file format")
-        
+                args.output = c.default_output(args.input, getattr(args, "format", None) or "yaml")
+
+        parser = "JsonParser" if format == c.Format.JSON else "XmlParser"
         module = importlib.import_module(f"parsers.mud.{parser}")
         cls = getattr(module, parser)
         return cls(args)
+
+
+    @classmethod
+    def init_memory_parser(c, mud: dict | bytes | str, mac: str = None, ipv4: str = None, ipv6: str = None, network: str = None) -> MudParser:
+        """
+        Initialize a parser for an in-memory MUD profile.
+
+        :param mud: MUD profile, either already decoded as a dict, or as a JSON or XML document
+        :param mac: device MAC address
+        :param ipv4: device IPv4 address
+        :param ipv6: device IPv6 address
+        :param network: device network interface
+        :return: parser object
+        :raises ValueError: unrecognized MUD profile format, or invalid device option
+        """
+        c.check_device(mac, ipv4, ipv6, network)
+        args = Namespace(input=None, output=None, mac=mac, ipv4=ipv4, ipv6=ipv6, network=network)
+
+        # Already decoded MUD profile: no input to read
+        if isinstance(mud, dict):
+            parser = c(args)
+            parser.data = mud
+            return parser
+
+        # JSON or XML document
+        if isinstance(mud, str):
+            mud = mud.encode()
+        args.input = io.BytesIO(mud)
+        return c.init_parser(args, c.sniff_format(mud))
+
+
+    @classmethod
+    def check_device(c, mac: str, ipv4: str, ipv6: str, network: str) -> None:
+        """
+        Check the validity of the device options.
+
+        :param mac: device MAC address
+        :param ipv4: device IPv4 address
+        :param ipv6: device IPv6 address
+        :param network: device network interface
+        :raises ValueError: invalid device option
+        """
+        import ipaddress
+        if mac is not None and not c.mac_regex.match(mac):
+            raise ValueError(f"Invalid MAC address: {mac}")
+        if ipv4 is not None and ipaddress.ip_address(ipv4).version != 4:
+            raise ValueError(f"Invalid IPv4 address: {ipv4}")
+        if ipv6 is not None and ipaddress.ip_address(ipv6).version != 6:
+            raise ValueError(f"Invalid IPv6 address: {ipv6}")
+        if network is not None and network not in c.networks:
+            raise ValueError(f"Invalid network interface: {network}")
+
+
+    @classmethod
+    def sniff_format(c, document: bytes) -> Format:
+        """
+        Determine the format of a MUD document from its first character.
+
+        :param document: MUD document
+        :return: MUD document format
+        :raises ValueError: unrecognized MUD document format
+        """
+        start = document[:64].lstrip(b"\xef\xbb\xbf \t\r\n")
+        if start.startswith(b"{"):
+            return c.Format.JSON
+        elif start.startswith(b"<"):
+            return c.Format.XML
+        else:
+            raise ValueError("Unrecognized MUD file format")
+    
+
+    @classmethod
+    def default_output(c, input: str, format: str = "yaml") -> str:
+        """
+        Compute the default output file path for a given input MUD file,
+        i.e. the input file path with its extension replaced by the output format's (".yaml" by default).
+
+        :param input: input MUD file path
+        :param format: output format
+        :return: default output file path
+        :raises ValueError: unrecognized MUD file format
+        """
+        if input.endswith(".json"):
+            return input.replace(".json", c.output_formats[format])
+        elif input.endswith(".xml"):
+            return input.replace(".xml", c.output_formats[format])
+        else:
+            raise ValueError("Unrecognized MUD file format")
     
 
     def __init__(self, args: Namespace) -> None:
@@ -76,6 +182,43 @@ class MudParser:
         self.ipv4 = args.ipv4
         self.ipv6 = args.ipv6
         self.network = args.network
+        self.cache = getattr(args, "cache", None)
+        self.stream_policies = getattr(args, "stream_policies", False)
+        # Output format, and whether to check the output's syntax
+        self.format = getattr(args, "format", None) or "yaml"
+        self.check_output = getattr(args, "check", False)
+        # Optional stages, imported only if enabled
+        self.aggregator = None
+        if getattr(args, "aggregate", False):
+            from passes.PolicyAggregator import PolicyAggregator
+            self.aggregator = PolicyAggregator()
+        self.report_overlaps = getattr(args, "report_overlaps", False)
+        # Network index of the single policies, built during translation if overlaps are reported
+        # (the aggregator indexes the remaining policies after removing duplicates)
+        self.network_index = None
+        if self.report_overlaps:
+            from passes.NetworkIndex import NetworkIndex
+            self.network_index = NetworkIndex()
+        # DNS pre-resolution stage, caching resolutions next to the translation cache, if any
+        self.resolver = None
+        if getattr(args, "resolve_dns", False):
+            from passes.DnsResolver import DnsResolver
+            directory = None if self.cache is None else os.path.join(self.cache.directory, "dns")
+            self.resolver = DnsResolver(getattr(args, "dns_server", None), directory)
+        # Change set against a previous translation, if requested
+        self.differ = None
+        self.diff_previous = getattr(args, "diff", None)
+        self.diff_output = getattr(args, "diff_output", None)
+        # Captured traffic to match against the translated profile, if requested
+        self.match_flows = getattr(args, "match_flows", None)
+        self.match_output = getattr(args, "match_output", None)
+        # Instrumentation, only if statistics are requested, or subscribed to
+        self.print_stats = getattr(args, "stats", False) or getattr(args, "profile", False)
+        self.stats_json = getattr(args, "stats_json", None)
+        self.stats = None
+        if self.print_stats or self.stats_json is not None or TranslationStats.subscribers:
+            self.stats = TranslationStats(self.input, trace_memory=getattr(args, "profile", False))
+        self.data = None
     
 
     def read_input(self) -> dict:
@@ -89,44 +232,139 @@ class MudParser:
         raise NotImplementedError("Concrete parser subclass must implement the read_input method")
 
 
+    def read_mud(self) -> dict:
+        """
+        Read the MUD container from the input MUD file.
+        By default, the whole input MUD file is read,
+        and kept for the subsequent iteration over the ACEs.
+        Concrete parser subclasses can override this method to stream the input MUD file.
+
+        :return: dictionary containing the MUD container
+        """
+        if self.data is None:
+            self.data = self.read_input()
+        return self.data[self.MUD]
+
+
+    def iter_aces(self, acls: dict) -> Iterator[tuple]:
+        """
+        Iterate over the ACEs of the ACLs referenced in the MUD container.
+        Concrete parser subclasses can override this method to stream the input MUD file.
+
+        :param acls: mapping between the names of the referenced ACLs and their direction
+        :return: iterator over tuples (direction, ACE dictionary)
+        """
+        for acl in self.data[self.ACL]["acl"]:
+
+            # ACLs not referenced in MUD container: skip
+            if acl["name"] not in acls.keys():
+                if self.stats is not None:
+                    self.stats.count("skipped-acls")
+                continue
+
+            # ACLs referenced in MUD container
+            direction = acls[acl["name"]]
+            for ace in acl["aces"]["ace"]:
+                yield direction, ace
+
+
+    def stage(self, name: str) -> object:
+        """
+        Get a context manager measuring a translation stage, if instrumented.
+
+        :param name: stage name
+        :return: context manager
+        """
+        if self.stats is None:
+            return nullcontext()
+        return self.stats.stage(name)
+
+
+    def compile_plan(self) -> dict:
+        """
+        Compile the ACE translation plan,
+        i.e. the mapping between the supported MUD protocols
+        (including registered third-party protocols)
+        and their protocol parser objects.
+
+        :return: mapping between protocol names and protocol parser objects
+        """
+        return {protocol_name: Protocol.init_protocol(protocol_name) for protocol_name in Protocol.protocols}
+
+
+    @staticmethod
+    def dump(yaml_data: dict, stream: object = None) -> str:
+        """
+        Serialize a translated profile to YAML.
+
+        :param yaml_data: dictionary containing the translated profile
+        :param stream: stream to write the YAML document to, if any
+        :return: YAML document if no stream was given, None otherwise
+        """
+        # Imported on first use, as the YAML library is slow to import
+        from writers.YamlWriter import YamlWriter
+        return YamlWriter.dump(yaml_data, stream)
+
+
     def write_output(self, yaml_data: dict) -> None:
         """
-        Write the output YAML file.
+        Write the output file, in the output format:
+        YAML extended profile, compact JSON profile, binary profile, or nftables ruleset.
 
-        :param yaml_data: dictionary containing data to be written in the output YAML file
+        :param yaml_data: dictionary containing the translated profile
+        :raises ValueError: the nftables ruleset is invalid, if checked
         """
+        if self.format == "nft":
+            from writers.NftablesWriter import NftablesWriter
+            writer = NftablesWriter()
+            ruleset = writer.compile(yaml_data, self.policy_directions())
+            if writer.skipped:
+                print(f"{self.input}: {writer.report()}", file=sys.stderr)
+            if self.check_output:
+                from writers.NftablesChecker import NftablesChecker
+                errors = NftablesChecker.check(ruleset)
+                if errors:
+                    raise ValueError("Invalid nftables ruleset: " + "; ".join(errors))
+            with open(self.output, "w") as nft_file:
+                nft_file.write(ruleset)
+            return
+        if self.format == "json":
+            from writers.JsonWriter import JsonWriter
+            with open(self.output, "wb") as json_file:
+                JsonWriter.dump(yaml_data, json_file)
+            return
+        if self.format == "bin":
+            from writers.BinaryWriter import BinaryWriter
+            with open(self.output, "wb") as binary_file:
+                BinaryWriter.dump(yaml_data, binary_file)
+            return
         with open(self.output, "w") as yaml_file:
-            yaml.dump(yaml_data, yaml_file, default_flow_style=False)
+            self.dump(yaml_data, yaml_file)
 
 
-    def parse(self) -> None:
+    def device_info(self, mud_data: dict) -> DeviceInfo:
         """
-        Parse the input MUD file,
-        translate it to the YAML format,
-        and write the output to the given output file.
+        Build the device information of the translated profile.
+
+        :param mud_data: dictionary containing the MUD container
+        :return: device information
         """
+        return DeviceInfo(
+            mud_data["systeminfo"],
+            self.mac,
+            None if self.ipv4 is None else str(self.ipv4),
+            None if self.ipv6 is None else str(self.ipv6),
+            self.network
+        )
 
-        # Read input MUD file into a dictionary
-        data = self.read_input()
-        mud_data = data[self.MUD]
-        acl_data = data[self.ACL]
 
-        # Initialize output dictionary
-        yaml_data = {}
+    def referenced_acls(self, mud_data: dict) -> dict:
+        """
+        Parse the names of the ACLs referenced in the MUD container.
 
-        # Metadata
-        yaml_data["device-info"] = {}
-        yaml_data["device-info"]["name"] = mud_data["systeminfo"]
-        if self.mac is not None:
-            yaml_data["device-info"]["mac"] = self.mac
-        if self.ipv4 is not None:
-            yaml_data["device-info"]["ipv4"] = self.ipv4
-        if self.ipv6 is not None:
-            yaml_data["device-info"]["ipv6"] = self.ipv6
-        if self.network is not None:
-            yaml_data["device-info"]["network"] = self.network
-
-        ## Parse ACL names from MUD container
+        :param mud_data: dictionary containing the MUD container
+        :return: mapping between the names of the referenced ACLs and their direction
+        """
         acls = {}
         # From device
         from_device_acls = mud_data[self.FROM]["access-lists"]["access-list"]
@@ -136,48 +374,303 @@ class MudParser:
         to_device_acls = mud_data[self.TO]["access-lists"]["access-list"]
         for i in range(len(to_device_acls)):
             acls[to_device_acls[i]["name"]] = Direction.TO
+        return acls
+
+
+    def policy_directions(self) -> dict:
+        """
+        Get the direction of each single policy, which is not part of the translated profile,
+        from the ACL containing its ACE in the input MUD file.
+
+        :return: mapping between policy names and their direction
+        """
+        mud_data = self.read_mud()
+        # The ACEs were already counted, if instrumented, when translated
+        stats, self.stats = self.stats, None
+        try:
+            return {ace["name"]: direction for direction, ace in self.iter_aces(self.referenced_acls(mud_data))}
+        finally:
+            self.stats = stats
+
+
+    def iter_policies(self, mud_data: dict) -> Iterator[tuple]:
+        """
+        Translate the ACEs of the ACLs referenced in the MUD container
+        into single policies, one at a time.
+
+        :param mud_data: dictionary containing the MUD container
+        :return: iterator over tuples (policy name, policy)
+        """
+        acls = self.referenced_acls(mud_data)
+
+        # Compile ACE translation plan
+        with self.stage("compile"):
+            plan = self.compile_plan()
+
+        # Time spent streaming the ACEs from the input MUD file, if instrumented
+        stats = self.stats
+        aces = self.iter_aces(acls)
+        if stats is not None:
+            aces = stats.timed_iter("read-aces", aces)
+
+        # Parse ACEs of the ACLs referenced in MUD container,
+        # and translate them into single policies
+        for direction, ace in aces:
+            matches = ace["matches"]
+            policy = Policy()  # Policy for the YAML profile, will be populated by parsing
+            protocols = policy.protocols
+
+            # Local network source or destination IP address
+            is_local_network = bool(matches.get(self.MUD, {}).get("local-networks", None))
+
+            # Direction initiated
+            direction_initiated = matches.get("tcp", {}).get(self.DIRECTION_INIT, None)
+            if direction_initiated is not None:
+                direction_initiated = Direction(direction_initiated)
+
+            # Parse protocols present in the ACE, if supported
+            for protocol_name, protocol_match in matches.items():
+                protocol = plan.get(protocol_name, None)
+                if protocol is not None:
+                    if stats is None:
+                        protocol_matches = protocol.parse(protocol_match, direction, is_local_network, direction_initiated)
+                    else:
+                        start = time.perf_counter()
+                        protocol_matches = protocol.parse(protocol_match, direction, is_local_network, direction_initiated)
+                        stats.add_time(f"protocol:{protocol_name}", time.perf_counter() - start)
+                    if protocol_matches:
+                        protocols[protocol.name] = protocol_matches
+            
+            # Policy metadata
+            if direction_initiated is not None:
+                policy.bidirectional = True
+                policy.stats = {"rate": 0}
 
-        # Initialize YAML single policies field
+            # Index network matches
+            if self.network_index is not None:
+                self.network_index.add_policy(ace["name"], policy)
+
+            # Count ACE
+            if stats is not None:
+                stats.count_ace(policy)
+
+            # Add policy to YAML data
+            yield ace["name"], policy
+
+
+    def translate(self) -> dict:
+        """
+        Read the input MUD profile,
+        and translate it to the YAML extended profile format, in memory.
+
+        :return: dictionary containing the translated profile
+        """
+        # Read MUD container from input MUD file
+        with self.stage("read"):
+            mud_data = self.read_mud()
+
+        # Initialize output dictionary
+        yaml_data = {}
+
+        # Metadata
+        yaml_data["device-info"] = self.device_info(mud_data)
+
+        # Single policies
         yaml_data["single-policies"] = {}
+        with self.stage("translate"):
+            for name, policy in self.iter_policies(mud_data):
+                yaml_data["single-policies"][name] = policy
 
-        # Parse ACLs from ACL container
-        for acl in acl_data["acl"]:
+        # Aggregate single policies, if requested
+        if self.aggregator is not None:
+            with self.stage("aggregate"):
+                yaml_data["single-policies"] = self.aggregator.aggregate(yaml_data["single-policies"],
+                                                                         directions=self.policy_directions())
 
-            # ACLs not referenced in MUD container: skip
-            if acl["name"] not in acls.keys():
-                continue
+        # Resolve domain names, if requested
+        if self.resolver is not None:
+            with self.stage("resolve-dns"):
+                self.resolver.annotate(yaml_data["single-policies"])
 
-            # ACLs referenced in MUD container:
-            # Parse and add entries to YAML data
-            for ace in acl["aces"]["ace"]:
-                direction = acls[acl["name"]]
-                matches = ace["matches"]
-                policy = {"protocols": {}}  # Policy for the YAML profile, will be populated by parsing
-                protocols = policy["protocols"]
-
-                # Local network source or destination IP address
-                is_local_network = bool(matches.get(self.MUD, {}).get("local-networks", None))
-
-                # Direction initiated
-                direction_initiated = matches.get("tcp", {}).get(self.DIRECTION_INIT, None)
-                if direction_initiated is not None:
-                    direction_initiated = Direction(direction_initiated)
-
-                # Parse protocol if supported
-                for protocol_name in self.supported_protocols:
-                    if protocol_name in matches:
-                        protocol = Protocol.init_protocol(protocol_name)
-                        protocol_matches = protocol.parse(matches[protocol_name], direction, is_local_network, direction_initiated)
-                        if protocol_matches:
-                            protocols[protocol.name] = protocol_matches
-                
-                # Policy metadata
-                if direction_initiated is not None:
-                    policy["bidirectional"] = True
-                    policy["stats"] = {"rate": 0}
-
-                # Add policy to YAML data
-                yaml_data["single-policies"][ace["name"]] = policy
-
-        # Write output YAML file
-        self.write_output(yaml_data)
+        if self.stats is not None:
+            self.stats.count("policies", len(yaml_data["single-policies"]))
+        return yaml_data
+
+
+    def stream_output(self) -> None:
+        """
+        Translate the input MUD profile,
+        streaming single policies to the output YAML file as they are produced.
+        If instrumented, the translate stage includes writing the single policies.
+        """
+        with self.stage("read"):
+            mud_data = self.read_mud()
+        from writers.YamlWriter import YamlWriter
+        writer = YamlWriter(self.output)
+        policies = self.iter_policies(mud_data)
+        if self.aggregator is not None or self.resolver is not None:
+            # Aggregation and DNS resolution need all single policies
+            with self.stage("translate"):
+                policies = dict(policies)
+            if self.aggregator is not None:
+                with self.stage("aggregate"):
+                    policies = self.aggregator.aggregate(policies, directions=self.policy_directions())
+            if self.resolver is not None:
+                with self.stage("resolve-dns"):
+                    self.resolver.annotate(policies)
+            policies = policies.items()
+        count = 0
+        with self.stage("translate"):
+            for name, policy in policies:
+                writer.write_policy(name, policy)
+                count += 1
+        with self.stage("write"):
+            writer.close(self.device_info(mud_data))
+        if self.stats is not None:
+            self.stats.count("policies", count)
+
+
+    def print_overlaps(self) -> None:
+        """
+        Print the single policies whose IP network match is contained in another policy's,
+        as found by the network index built during translation.
+        """
+        for narrow, broad in self.network_index.containments():
+            name, protocol, field, value = narrow
+            broad_name, _, _, broad_value = broad
+            print(f"{self.input}: policy '{name}' {protocol} {field} {value} "
+                  f"is contained in policy '{broad_name}' {protocol} {field} {broad_value}", file=sys.stderr)
+
+
+    def write_diff(self, yaml_data: dict = None) -> None:
+        """
+        Write the change set from the previous translation to the current one, if requested,
+        to the change set output file (default: output YAML file with the ".diff.yaml" extension).
+
+        :param yaml_data: dictionary containing the translated profile,
+                          or None to read it back from the output YAML file
+        """
+        if self.diff_previous is None:
+            return
+        from passes.ProfileDiff import ProfileDiff
+        with self.stage("diff"):
+            if self.differ is None:
+                self.differ = ProfileDiff(ProfileDiff.load(self.diff_previous))
+            if yaml_data is None:
+                yaml_data = ProfileDiff.load(self.output)
+            changes = self.differ.diff(yaml_data)
+            if self.diff_output is None:
+                self.diff_output = re.sub(r"(\.yaml)?$", ".diff.yaml", self.output, count=1)
+            with open(self.diff_output, "w") as diff_file:
+                self.dump(changes, diff_file)
+        print(f"{self.input}: {self.differ.report()}", file=sys.stderr)
+
+
+    def write_coverage(self, yaml_data: dict = None) -> None:
+        """
+        Match the captured traffic against the translated profile, if requested,
+        and write the matching result to the coverage output file
+        (default: output YAML file with the ".coverage.yaml" extension).
+
+        :param yaml_data: dictionary containing the translated profile,
+                          or None to read it back from the output YAML file
+        :raises ValueError: invalid or unsupported capture file
+        """
+        if self.match_flows is None:
+            return
+        # Imported on first use, as NumPy is an optional dependency
+        from passes.PolicyMatcher import PolicyMatcher
+        with self.stage("match"):
+            if yaml_data is None:
+                from passes.ProfileDiff import ProfileDiff
+                yaml_data = ProfileDiff.load(self.output)
+            matcher = PolicyMatcher(yaml_data, self.policy_directions())
+            result = matcher.match_capture(self.match_flows)
+            if self.match_output is None:
+                self.match_output = re.sub(r"(\.yaml)?$", ".coverage.yaml", self.output, count=1)
+            with open(self.match_output, "w") as coverage_file:
+                self.dump(result, coverage_file)
+        print(f"{self.input}: {matcher.report()}", file=sys.stderr)
+
+
+    def finish_stats(self) -> None:
+        """
+        End the instrumentation of the translation, if any:
+        publish the statistics to the subscribers,
+        print the statistics report if requested,
+        and append the statistics to the JSON lines file if requested.
+        """
+        if self.stats is None:
+            return
+        stats = self.stats.finish()
+        if self.print_stats:
+            print(self.stats.report(), file=sys.stderr)
+        if self.stats_json is not None:
+            import json
+            with open(self.stats_json, "a") as stats_file:
+                stats_file.write(json.dumps(stats) + "\n")
+
+
+    def parse(self) -> None:
+        """
+        Parse the input MUD file,
+        translate it to the YAML format,
+        and write the output to the given output file.
+        If a translation cache is set, and already contains the translated profile,
+        the latter is restored from the cache, without parsing.
+        Profiles with resolved domain names are not cached,
+        as resolutions expire independently of the input MUD file.
+        If a previous translation is given, the change set is written in all cases,
+        and so is the matching result, if captured traffic is given.
+        """
+
+        # Restore translated profile from cache, if present
+        cache_key = None
+        if self.cache is not None and self.resolver is None:
+            with self.stage("cache"):
+                cache_key = self.cache.key(self, self.VERSION)
+                # Overlaps are reported during translation: translate anyway
+                cache_hit = not self.report_overlaps and self.cache.get(cache_key, self.output)
+            if cache_hit:
+                if self.stats is not None:
+                    self.stats.count("cache-hits")
+                self.write_diff()
+                self.write_coverage()
+                self.finish_stats()
+                return
+
+        yaml_data = None
+        if self.stream_policies and self.format == "yaml":
+            # Stream translated single policies to output YAML file
+            self.stream_output()
+        else:
+            # Translate input MUD file, and write output file
+            yaml_data = self.translate()
+            with self.stage("write"):
+                self.write_output(yaml_data)
+
+        # Report aggregation
+        if self.aggregator is not None:
+            print(f"{self.input}: {self.aggregator.report()}", file=sys.stderr)
+
+        # Report unresolved domain names
+        if self.resolver is not None:
+            for domain_name, error in self.resolver.failures:
+                print(f"{self.input}: could not resolve {domain_name}: {error}", file=sys.stderr)
+
+        # Report overlapping network matches
+        if self.report_overlaps:
+            self.print_overlaps()
+
+        # Store translated profile in cache
+        if cache_key is not None:
+            with self.stage("cache"):
+                self.cache.put(cache_key, self.output)
+
+        # Write change set against the previous translation
+        self.write_diff(yaml_data)
+
+        # Match captured traffic against the translated profile
+        self.write_coverage(yaml_data)
+
+        self.finish_stats()
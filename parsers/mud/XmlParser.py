@@ -1,5 +1,7 @@
 #!/usr/bin/python3
 
+from __future__ import annotations
+from collections.abc import Iterator
 import xml.etree.ElementTree as ET
 from parsers.mud.MudParser import MudParser
 
@@ -7,30 +9,183 @@ from parsers.mud.MudParser import MudParser
 class XmlParser(MudParser):
     """
     XML-format MUD file parser.
+    The input MUD file is streamed,
+    such that only the elements currently being translated are kept in memory.
+    Element names are converted to their JSON encoding (RFC 7951),
+    i.e. prefixed with their YANG module name if their namespace differs from their parent's.
     """
 
+    # YANG lists, always converted to lists, even with a single entry
+    lists = {
+        "access-list",
+        "acl",
+        "ace"
+    }
 
-    def element_to_dict(self, element: ET.Element) -> dict:
+    # Integer YANG leaves
+    integer_leaves = {
+        "mud-version",
+        "cache-validity",
+        "protocol",
+        "port",
+        "lower-port",
+        "upper-port",
+        "type",
+        "code",
+        "dscp",
+        "ecn",
+        "length",
+        "ttl",
+        "flow-label"
+    }
+
+    # Boolean YANG leaves
+    boolean_leaves = {
+        "is-supported"
+    }
+
+    # YANG leaves of type "empty", encoded as [null] in JSON
+    empty_leaves = {
+        "local-networks",
+        "same-manufacturer",
+        "my-controller"
+    }
+
+
+    @staticmethod
+    def split_tag(tag: str) -> tuple:
+        """
+        Split an XML element tag into its namespace and its local name.
+
+        :param tag: XML element tag, of the form "{namespace}name" or "name"
+        :return: tuple (namespace, local name), namespace is empty if the element has none
         """
-        Recursively convert XML elements to a dict.
+        if tag.startswith("{"):
+            namespace, _, local_name = tag[1:].partition("}")
+            return namespace, local_name
+        return "", tag
+
+
+    @staticmethod
+    def module_name(namespace: str) -> str:
+        """
+        Get the YANG module name corresponding to an XML namespace,
+        e.g. "ietf-mud" for "urn:ietf:params:xml:ns:yang:ietf-mud".
+
+        :param namespace: XML namespace
+        :return: YANG module name
+        """
+        return namespace.rstrip("/").replace("/", ":").rsplit(":", 1)[-1]
+
+
+    def leaf_value(self, local_name: str, text: str) -> object:
+        """
+        Convert the text of an XML leaf element to its JSON value.
+
+        :param local_name: local name of the leaf element
+        :param text: text of the leaf element
+        :return: value of the leaf element
+        """
+        if local_name in self.empty_leaves:
+            return [None]
+        if text is None:
+            return None
+        text = text.strip()
+        if local_name in self.integer_leaves:
+            try:
+                return int(text)
+            except ValueError:
+                return text
+        if local_name in self.boolean_leaves:
+            return text == "true"
+        return text
+
+
+    def add_child(self, parent: dict, local_name: str, name: str, value: object) -> None:
+        """
+        Add a child element value to its parent dict.
+
+        :param parent: dict of the parent element
+        :param local_name: local name of the child element
+        :param name: qualified name of the child element
+        :param value: value of the child element
+        """
+        if local_name in self.lists:
+            parent.setdefault(name, []).append(value)
+        elif name in parent:
+            if isinstance(parent[name], list):
+                parent[name].append(value)
+            else:
+                parent[name] = [parent[name], value]
+        else:
+            parent[name] = value
+
 
-        :param element: XML tree element to start recursive parsing
-        :return: dict containing the parsed XML elements
+    def stream(self, targets: set) -> Iterator[tuple]:
         """
-        result = {}
-        for child in element:
-            if child:
-                child_dict = self.element_to_dict(child)
-                if child.tag in result:
-                    if isinstance(result[child.tag], list):
-                        result[child.tag].append(child_dict)
+        Stream the input MUD file,
+        and yield the elements found at the given paths, as soon as they are complete.
+        All other elements are discarded once consumed.
+        The set of targets can be updated by the caller while iterating.
+
+        :param targets: set of element paths (tuples of qualified names, excluding the root element) to yield,
+                        or None to yield all top-level elements
+        :return: iterator over tuples (element path, element value)
+        """
+        elements = []    # Open XML elements, including the root element
+        namespaces = []  # Namespaces of the open XML elements
+        path = []        # Qualified names of the open XML elements, excluding the root element
+        frames = []      # Dicts being built for the open XML elements, inside a target element
+        names = {}       # Cache of split tags, as tags repeat throughout the document
+
+        # In-memory MUD file: stream from the start
+        if hasattr(self.input, "seek"):
+            self.input.seek(0)
+
+        for event, element in ET.iterparse(self.input, events=("start", "end")):
+            split_tag = names.get(element.tag, None)
+            if split_tag is None:
+                split_tag = self.split_tag(element.tag)
+                names[element.tag] = split_tag
+            namespace, local_name = split_tag
+
+            if event == "start":
+                if elements:
+                    # Prefix name with module name if namespace differs from parent's,
+                    # top-level elements are always prefixed
+                    if namespace and (len(elements) == 1 or namespace != namespaces[-1]):
+                        path.append(f"{self.module_name(namespace)}:{local_name}")
                     else:
-                        result[child.tag] = [result[child.tag], child_dict]
+                        path.append(local_name)
+                    # Start building element if it is, or is inside, a target element
+                    is_target = len(path) == 1 if targets is None else tuple(path) in targets
+                    if frames or is_target:
+                        frames.append({})
+                elements.append(element)
+                namespaces.append(namespace)
+                continue
+
+            # End of element
+            elements.pop()
+            namespaces.pop()
+            if not elements:
+                # End of root element
+                break
+
+            if frames:
+                frame = frames.pop()
+                value = frame if frame else self.leaf_value(local_name, element.text)
+                if frames:
+                    # Element is inside a target element
+                    self.add_child(frames[-1], local_name, path[-1], value)
                 else:
-                    result[child.tag] = child_dict
-            else:
-                result[child.tag] = child.text
-        return result
+                    # Element is a target element
+                    yield tuple(path), value
+
+            # Discard consumed element
+            path.pop()
+            element.clear()
+            elements[-1].remove(element)
 
 
     def read_input(self) -> dict:
@@ -39,6 +194,47 @@ class XmlParser(MudParser):
 
         :return: dict containing data read from the input MUD file
         """
-        tree = ET.parse(self.input)
-        root = tree.getroot()
-        return self.element_to_dict(root)
+        data = {}
+        for path, value in self.stream(None):
+            data[path[0]] = value
+        return data
+
+
+    def read_mud(self) -> dict:
+        """
+        Read the MUD container from the input MUD file,
+        stopping as soon as it is complete.
+
+        :return: dict containing the MUD container
+        :raises KeyError: the input MUD file does not contain a MUD container
+        """
+        for _, mud_data in self.stream({(self.MUD,)}):
+            return mud_data
+        raise KeyError(self.MUD)
+
+
+    def iter_aces(self, acls: dict) -> Iterator[tuple]:
+        """
+        Stream the ACEs of the ACLs referenced in the MUD container, one at a time.
+        ACEs of ACLs not referenced in the MUD container are skipped without being built.
+
+        :param acls: mapping between the names of the referenced ACLs and their direction
+        :return: iterator over tuples (direction, ACE dict)
+        """
+        acl_name_path = (self.ACL, "acl", "name")
+        ace_path = (self.ACL, "acl", "aces", "ace")
+        targets = {acl_name_path}
+
+        direction = None
+        for path, value in self.stream(targets):
+            if path == acl_name_path:
+                # ACL name is the list key, hence precedes the ACEs
+                direction = acls.get(value, None)
+                if direction is not None:
+                    targets.add(ace_path)
+                else:
+                    targets.discard(ace_path)
+                    if self.stats is not None:
+                        self.stats.count("skipped-acls")
+            else:
+                yield direction, value
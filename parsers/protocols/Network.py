@@ -1,9 +1,11 @@
 #!/usr/bin/python3
 
 import re
-import ipaddress
+import sys
+import functools
 from parsers.Direction import Direction
 from parsers.protocols.Protocol import Protocol
+from parsers.ir.NetworkMatch import NetworkMatch
 
 
 class Network(Protocol):
@@ -24,6 +26,66 @@ class Network(Protocol):
     dns_regex = re.compile(r"^[a-zA-Z0-9][a-zA-Z0-9\.\-]{1,253}[a-zA-Z0-9]$")
 
 
+    @staticmethod
+    def is_valid_domain(domain_name: str) -> bool:
+        """
+        Check if a domain name is valid.
+        Only strings can be domain names (other values, e.g. lists in a malformed MUD file, are not hashable).
+
+        :param domain_name: domain name
+        :return: True if the domain name is valid, False otherwise
+        """
+        return isinstance(domain_name, str) and Network.check_domain(domain_name)
+
+
+    @staticmethod
+    @functools.lru_cache(maxsize=65536)
+    def check_domain(domain_name: str) -> bool:
+        """
+        Check if a domain name string is valid.
+        Memoized, as the same domain names repeat across ACEs and profiles.
+
+        :param domain_name: domain name
+        :return: True if the domain name is valid, False otherwise
+        """
+        return Network.dns_regex.match(domain_name) is not None
+
+
+    @staticmethod
+    def is_valid_network(network: str) -> bool:
+        """
+        Check if an IP network is valid.
+        Strings are checked memoized; other values (e.g. lists in a malformed MUD file)
+        may not be hashable, and are checked without memoization.
+
+        :param network: IP network, in CIDR notation
+        :return: True if the IP network is valid, False otherwise
+        """
+        if isinstance(network, str):
+            return Network.check_network(network)
+        return Network.check_network.__wrapped__(network)
+
+
+    @staticmethod
+    @functools.lru_cache(maxsize=65536)
+    def check_network(network: str) -> bool:
+        """
+        Check if an IP network is valid.
+        Memoized, as the same networks repeat across ACEs and profiles:
+        use is_valid_network, which only memoizes hashable values.
+
+        :param network: IP network, in CIDR notation
+        :return: True if the IP network is valid, False otherwise
+        """
+        # Imported on first use, i.e. only if the MUD profile contains IP networks
+        import ipaddress
+        try:
+            ipaddress.ip_network(network)
+        except ValueError:
+            return False
+        return True
+
+
     def parse_network(self, mud_field: str, network_match: dict) -> str:
         """
         Parse a network match.
@@ -35,22 +97,20 @@ class Network(Protocol):
         """
         # If field is domain name, check if it is valid
         if "ietf-acldns" in mud_field:
-            if not self.dns_regex.match(network_match):
+            if not self.is_valid_domain(network_match):
                 raise ValueError(f"Invalid domain name '{network_match}'")
             # Domain name is valid
-            return network_match
+            return sys.intern(network_match)
         
         # Field is IP network, check if it is valid
-        try:
-            ipaddress.ip_network(network_match)
-        except ValueError:
+        if not self.is_valid_network(network_match):
             raise ValueError(f"Invalid network '{network_match}'")
         
         # Network is valid
-        return str(network_match)
+        return sys.intern(str(network_match))
 
 
-    def parse(self, matches: dict, direction: Direction, is_local_network: bool, direction_initiated: Direction) -> dict:
+    def parse(self, matches: dict, direction: Direction, is_local_network: bool, direction_initiated: Direction) -> NetworkMatch:
         """
         Parse the protocol matches.
 
@@ -58,36 +118,29 @@ class Network(Protocol):
         :param direction: direction of the traffic (FROM or TO)
         :param is_local_network: whether the traffic is within the local network
         :param direction_initiated: direction of initiation of the connection (FROM or TO)
-        :return: dict of protocol matches for the YAML profile
-        :raises NotImplementedError: concrete protocol subclass must implement the parse method
+        :return: network match for the YAML profile
         """
-        # Initialize result dict
-        proto_dict = {}
+        # Initialize result match
+        network_match = NetworkMatch()
 
         # Parse fields
         for mud_field, yaml_field in self.fields.items():
             net_match = matches.get(mud_field, None)
             if net_match is not None:
-                proto_dict[yaml_field] = self.parse_network(mud_field, net_match)
+                # (the YAML fields src and dst are also the network match's slots)
+                setattr(network_match, yaml_field, self.parse_network(mud_field, net_match))
         
         # If local network, add corresponding address, depending on direction
         if is_local_network:
             if direction == Direction.FROM:
-                proto_dict["dst"] = "local"
+                network_match.dst = "local"
             elif direction == Direction.TO:
-                proto_dict["src"] = "local"
+                network_match.src = "local"
 
         # If direction and direction initiated are different,
         # swap source and destination addresses
         if direction_initiated is not None and direction != direction_initiated:
-            src = proto_dict.get("src", None)
-            dst = proto_dict.get("dst", None)
-            if src is not None:
-                proto_dict["dst"] = src
-                del proto_dict["src"]
-            if dst is not None:
-                proto_dict["src"] = dst
-                del proto_dict["dst"]
-
-        return proto_dict
+            network_match.src, network_match.dst = network_match.dst, network_match.src
+
+        return network_match
 
@@ -12,6 +12,7 @@ class Protocol:
 
     # Mapping between supported MUD protocols
     # and corresponding protocol parsers
+    # (module name in parsers.protocols, or class for registered parsers)
     protocols = {
         "ipv4": "Network",
         "ipv6": "Network",
@@ -20,23 +21,47 @@ class Protocol:
         "icmp": "icmp"
     }
 
+    # Registry of protocol parser objects,
+    # each protocol parser is resolved and initialized only once
+    registry = {}
+
+
+    @classmethod
+    def register(c, protocol_name: str, cls: type) -> None:
+        """
+        Register a (third-party) protocol parser,
+        replacing the current parser for this protocol, if any.
+
+        :param protocol_name: name of the protocol, as found in the MUD ACE matches
+        :param cls: protocol parser class, subclass of Protocol
+        """
+        Protocol.protocols[protocol_name] = cls
+        Protocol.registry.pop(protocol_name, None)
+
 
     @classmethod
     def init_protocol(c, protocol_name: str) -> Protocol:
         """
         Initialize the protocol parser.
+        Protocol parsers are stateless, hence are shared through the registry.
 
         :param protocol_name: name of the protocol
         :return: protocol parser object
         :raises ValueError: unsupported protocol
         """
-        module_name = c.protocols.get(protocol_name, None)
-        if module_name is not None:
-            module = importlib.import_module(f"parsers.protocols.{module_name}")
-            cls = getattr(module, module_name)
-            return cls(protocol_name)
-        else:
+        protocol = Protocol.registry.get(protocol_name, None)
+        if protocol is not None:
+            return protocol
+
+        cls = Protocol.protocols.get(protocol_name, None)
+        if cls is None:
             raise ValueError(f"Unsupported protocol '{protocol_name}'")
+        if isinstance(cls, str):
+            module = importlib.import_module(f"parsers.protocols.{cls}")
+            cls = getattr(module, cls)
+        protocol = cls(protocol_name)
+        Protocol.registry[protocol_name] = protocol
+        return protocol
     
 
     def __init__(self, protocol_name: str) -> None:
@@ -56,7 +81,8 @@ class Protocol:
         :param direction: direction of the traffic (FROM or TO)
         :param is_local_network: whether the traffic is within the local network
         :param direction_initiated: direction of initiation of the connection (FROM or TO)
-        :return: dict of protocol matches for the YAML profile
+        :return: protocol matches for the YAML profile,
+                 as an IR record (see parsers.ir), or a dict of YAML profile fields
         :raises NotImplementedError: concrete protocol subclass must implement the parse method
         """
         raise NotImplementedError("Concrete protocol subclass must implement the parse method")
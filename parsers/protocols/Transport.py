@@ -1,7 +1,9 @@
 #!/usr/bin/python3
 
+import sys
 from parsers.Direction import Direction
 from parsers.protocols.Protocol import Protocol
+from parsers.ir.PortMatch import PortMatch
 
 
 class Transport(Protocol):
@@ -46,10 +48,10 @@ class Transport(Protocol):
         if op == "eq":
             return port
         else:
-            return f"{self.operators[op]} {port}"
+            return sys.intern(f"{self.operators[op]} {port}")
 
 
-    def parse(self, matches: dict, direction: Direction, is_local_network: bool, direction_initiated: Direction) -> dict:
+    def parse(self, matches: dict, direction: Direction, is_local_network: bool, direction_initiated: Direction) -> PortMatch:
         """
         Parse the protocol matches.
 
@@ -57,23 +59,22 @@ class Transport(Protocol):
         :param direction: direction of the traffic (FROM or TO)
         :param is_local_network: whether the traffic is within the local network
         :param direction_initiated: direction of initiation of the connection (FROM or TO)
-        :return: dict of protocol matches for the YAML profile
-        :raises NotImplementedError: concrete protocol subclass must implement the parse method
+        :return: port match for the YAML profile
         """
-        # Initialize result dict
-        proto_dict = {}
+        # Initialize result match
+        port_match = PortMatch()
 
         # Parse source port
         src_port_match = matches.get("source-port", None)
         if src_port_match is not None:
-            proto_dict["src-port"] = self.parse_port(src_port_match)
+            port_match.src_port = self.parse_port(src_port_match)
 
         # Parse destination port
         dst_port_match = matches.get("destination-port", None)
         if dst_port_match is not None:
-            proto_dict["dst-port"] = self.parse_port(dst_port_match)
+            port_match.dst_port = self.parse_port(dst_port_match)
 
         # TODO: direction-initiated
         
-        return proto_dict
+        return port_match
 
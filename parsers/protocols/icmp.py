@@ -2,6 +2,7 @@
 
 from parsers.protocols.Protocol import Protocol
 from parsers.Direction import Direction
+from parsers.ir.IcmpMatch import IcmpMatch
 
 
 class icmp(Protocol):
@@ -51,7 +52,7 @@ class icmp(Protocol):
         return icmp_type
 
 
-    def parse(self, matches: dict, direction: Direction, is_local_network: bool, direction_initiated: Direction) -> dict:
+    def parse(self, matches: dict, direction: Direction, is_local_network: bool, direction_initiated: Direction) -> IcmpMatch:
         """
         Parse the protocol matches.
 
@@ -59,16 +60,15 @@ class icmp(Protocol):
         :param direction: direction of the traffic (FROM or TO)
         :param is_local_network: whether the traffic is within the local network
         :param direction_initiated: direction of initiation of the connection (FROM or TO)
-        :return: dict of protocol matches for the YAML profile
-        :raises NotImplementedError: concrete protocol subclass must implement the parse method
+        :return: ICMP match for the YAML profile
         """
-        # Initialize result dict
-        proto_dict = {}
+        # Initialize result match
+        icmp_match = IcmpMatch()
 
         # Parse fields
         for mud_field in self.fields:
             type_match = matches.get(mud_field, None)
             if type_match is not None:
-                proto_dict["type"] = self.parse_type(type_match)
+                icmp_match.type = self.parse_type(type_match)
 
-        return proto_dict
+        return icmp_match
@@ -0,0 +1,408 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import os
+import json
+import time
+import random
+import struct
+import asyncio
+import hashlib
+import threading
+from passes.NetworkIndex import NetworkIndex
+
+
+class DnsResolver:
+    """
+    DNS pre-resolution stage.
+    Resolves the domain names of the translated single policies concurrently,
+    with a minimal asynchronous DNS client over UDP,
+    and adds the resolved addresses next to the domain names
+    ("src-resolved" and "dst-resolved" fields).
+    Resolutions are cached according to their TTL, in memory (shared by all profiles of a process),
+    and on disk if a cache directory is given (shared by all processes).
+    """
+
+    # DNS record types to query, per network protocol
+    record_types = {
+        "ipv4": 1,   # A
+        "ipv6": 28   # AAAA
+    }
+
+    # Network fields, and corresponding resolved addresses fields
+    fields = {
+        "src": "src-resolved",
+        "dst": "dst-resolved"
+    }
+
+    # Default DNS server port
+    default_port = 53
+
+    # Query timeout, in seconds, and number of attempts per query
+    timeout = 2
+    attempts = 3
+
+    # Maximum number of concurrent queries
+    max_concurrent = 64
+
+    # Cache duration of non-existent domain names, or domain names without addresses, in seconds
+    negative_ttl = 300
+
+    # DNS response codes
+    NOERROR = 0
+    NXDOMAIN = 3
+
+    # Resolutions cache, shared by all resolvers of the process:
+    # mapping between (domain name, record type) and tuples (expiration time, list of addresses)
+    memory = {}
+    memory_lock = threading.Lock()
+
+
+    class DnsProtocol(asyncio.DatagramProtocol):
+        """
+        UDP DNS client protocol, dispatching the responses to the pending queries by query ID.
+        """
+
+        def __init__(self) -> None:
+            """
+            Constructor for the DnsProtocol class.
+            """
+            self.transport = None
+            self.pending = {}  # Mapping between query IDs and response futures
+
+
+        def connection_made(self, transport: asyncio.DatagramTransport) -> None:
+            """
+            Keep the transport, to send queries.
+
+            :param transport: datagram transport
+            """
+            self.transport = transport
+
+
+        def datagram_received(self, data: bytes, addr: tuple) -> None:
+            """
+            Dispatch a DNS response to the corresponding pending query.
+
+            :param data: DNS response
+            :param addr: address of the DNS server
+            """
+            if len(data) < 12:
+                return
+            query_id = struct.unpack_from("!H", data)[0]
+            future = self.pending.pop(query_id, None)
+            if future is not None and not future.done():
+                future.set_result(data)
+
+
+        def error_received(self, exc: Exception) -> None:
+            """
+            Fail all pending queries on a transport error (e.g. ICMP port unreachable).
+
+            :param exc: transport error
+            """
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(exc)
+            self.pending = {}
+
+
+    @staticmethod
+    def default_server() -> str:
+        """
+        Get the system's DNS server, from /etc/resolv.conf.
+
+        :return: address of the first configured DNS server, or localhost if none
+        """
+        try:
+            with open("/etc/resolv.conf", "r") as resolv_file:
+                for line in resolv_file:
+                    fields = line.split()
+                    if len(fields) >= 2 and fields[0] == "nameserver":
+                        return fields[1]
+        except OSError:
+            pass
+        return "127.0.0.1"
+
+
+    @classmethod
+    def parse_server(c, address: str) -> tuple:
+        """
+        Parse a DNS server address: "HOST", "HOST:PORT", "IPV6" or "[IPV6]:PORT".
+
+        :param address: DNS server address
+        :return: tuple (host, port)
+        """
+        port = ""
+        if address.startswith("["):
+            host, _, rest = address[1:].partition("]")
+            port = rest[1:]
+        elif address.count(":") == 1:
+            host, port = address.split(":")
+        else:
+            host = address
+        return host, int(port) if port else c.default_port
+
+
+    @staticmethod
+    def build_query(query_id: int, domain_name: str, record_type: int) -> bytes:
+        """
+        Build a recursive DNS query.
+
+        :param query_id: query ID
+        :param domain_name: domain name to resolve
+        :param record_type: DNS record type
+        :return: DNS query message
+        :raises UnicodeError: invalid domain name
+        """
+        # Header: ID, flags (recursion desired), 1 question
+        message = struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 0)
+        # Question: domain name labels, record type, class IN
+        qname = b"".join(bytes([len(label)]) + label for label in domain_name.rstrip(".").encode("idna").split(b"."))
+        return message + qname + b"\x00" + struct.pack("!HH", record_type, 1)
+
+
+    @staticmethod
+    def skip_name(message: bytes, offset: int) -> int:
+        """
+        Skip a (possibly compressed) domain name in a DNS message.
+
+        :param message: DNS message
+        :param offset: offset of the domain name
+        :return: offset following the domain name
+        """
+        while True:
+            length = message[offset]
+            if length & 0xC0 == 0xC0:
+                # Compression pointer: end of name
+                return offset + 2
+            offset += 1
+            if length == 0:
+                return offset
+            offset += length
+
+
+    @classmethod
+    def parse_response(c, message: bytes, record_type: int) -> tuple:
+        """
+        Parse a DNS response.
+
+        :param message: DNS response message
+        :param record_type: queried DNS record type
+        :return: tuple (response code, sorted list of addresses, TTL in seconds)
+        :raises struct.error: malformed DNS response
+        """
+        _, flags, qdcount, ancount, _, _ = struct.unpack_from("!HHHHHH", message)
+        rcode = flags & 0x000F
+        offset = 12
+
+        # Skip questions
+        for _ in range(qdcount):
+            offset = c.skip_name(message, offset) + 4
+
+        # Answers: addresses of the queried type, possibly following CNAME records
+        addresses = []
+        ttl = None
+        for _ in range(ancount):
+            offset = c.skip_name(message, offset)
+            rtype, rclass, rttl, rdlength = struct.unpack_from("!HHIH", message, offset)
+            offset += 10
+            rdata = message[offset:offset + rdlength]
+            offset += rdlength
+            ttl = rttl if ttl is None else min(ttl, rttl)
+            if rtype == record_type and rclass == 1:
+                addresses.append(str(NetworkIndex.ip_network(rdata).network_address))
+
+        return rcode, sorted(set(addresses)), ttl
+
+
+    def __init__(self, server: str = None, directory: str = None) -> None:
+        """
+        Constructor for the DnsResolver class.
+
+        :param server: DNS server address, "HOST[:PORT]" (default: system's DNS server)
+        :param directory: directory of the on-disk resolutions cache, if any
+        """
+        self.server = self.parse_server(server if server is not None else self.default_server())
+        self.directory = directory
+        self.failures = []  # List of tuples (domain name, error message)
+
+
+    def cache_path(self, query: tuple) -> str:
+        """
+        Get the path of the on-disk cache file of a resolution.
+
+        :param query: tuple (domain name, record type)
+        :return: path of the cache file
+        """
+        domain_name, record_type = query
+        key = hashlib.sha256(f"{domain_name.lower()}/{record_type}".encode()).hexdigest()
+        return os.path.join(self.directory, f"{key}.json")
+
+
+    def lookup(self, query: tuple, now: float) -> list:
+        """
+        Look up a resolution in the cache, in memory first, then on disk.
+
+        :param query: tuple (domain name, record type)
+        :param now: current time
+        :return: list of addresses, or None if not cached or expired
+        """
+        entry = self.memory.get(query, None)
+        if entry is None and self.directory is not None:
+            try:
+                with open(self.cache_path(query), "r") as cache_file:
+                    cached = json.load(cache_file)
+                entry = (cached["expires"], cached["addresses"])
+                with self.memory_lock:
+                    self.memory[query] = entry
+            except (OSError, ValueError, KeyError):
+                return None
+        if entry is None or entry[0] <= now:
+            return None
+        return entry[1]
+
+
+    def store(self, query: tuple, addresses: list, ttl: int, now: float) -> None:
+        """
+        Store a resolution in the cache, in memory, and on disk if a cache directory is set.
+
+        :param query: tuple (domain name, record type)
+        :param addresses: list of addresses
+        :param ttl: time to live of the resolution, in seconds
+        :param now: current time
+        """
+        expires = now + ttl
+        with self.memory_lock:
+            self.memory[query] = (expires, addresses)
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.cache_path(query)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as cache_file:
+            json.dump({"name": query[0], "type": query[1], "addresses": addresses, "expires": expires}, cache_file)
+        os.replace(tmp_path, path)
+
+
+    async def query(self, protocol: DnsResolver.DnsProtocol, domain_name: str, record_type: int) -> tuple:
+        """
+        Send a DNS query, retrying on timeout.
+
+        :param protocol: UDP DNS client protocol
+        :param domain_name: domain name to resolve
+        :param record_type: DNS record type
+        :return: tuple (response code, sorted list of addresses, TTL in seconds)
+        :raises TimeoutError: no response from the DNS server
+        """
+        loop = asyncio.get_running_loop()
+        for _ in range(self.attempts):
+            query_id = random.randrange(0x10000)
+            while query_id in protocol.pending:
+                query_id = random.randrange(0x10000)
+            future = loop.create_future()
+            protocol.pending[query_id] = future
+            protocol.transport.sendto(self.build_query(query_id, domain_name, record_type))
+            try:
+                response = await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                protocol.pending.pop(query_id, None)
+                continue
+            return self.parse_response(response, record_type)
+        raise TimeoutError(f"no response from DNS server {self.server[0]}:{self.server[1]}")
+
+
+    async def resolve_queries(self, queries: list) -> list:
+        """
+        Resolve DNS queries concurrently.
+        Errors are caught, such that a failed query does not interrupt the others.
+
+        :param queries: list of tuples (domain name, record type)
+        :return: list of tuples (query, (response code, addresses, TTL) or exception)
+        """
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(self.DnsProtocol, remote_addr=self.server)
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        async def resolve_query(query: tuple) -> tuple:
+            async with semaphore:
+                try:
+                    return query, await self.query(protocol, *query)
+                except Exception as e:
+                    return query, e
+
+        try:
+            return await asyncio.gather(*(resolve_query(query) for query in queries))
+        finally:
+            transport.close()
+
+
+    def resolve(self, queries: set) -> dict:
+        """
+        Resolve DNS queries, using the cache when possible.
+
+        :param queries: set of tuples (domain name, record type)
+        :return: mapping between queries and sorted lists of addresses (empty for a negative response,
+                 None if the resolution failed), failures and negative responses being added to the failures
+        """
+        now = time.time()
+        results = {}
+        missing = []
+        for query in sorted(queries):
+            addresses = self.lookup(query, now)
+            if addresses is None:
+                missing.append(query)
+            else:
+                if not addresses:
+                    self.failures.append((query[0], "no address (cached negative response)"))
+                results[query] = addresses
+        if not missing:
+            return results
+
+        for query, response in asyncio.run(self.resolve_queries(missing)):
+            if isinstance(response, Exception):
+                self.failures.append((query[0], f"{type(response).__name__}: {response}"))
+                results[query] = None
+                continue
+            rcode, addresses, ttl = response
+            if rcode == self.NXDOMAIN or (rcode == self.NOERROR and not addresses):
+                # Negative response: cached for a fixed duration
+                self.store(query, [], self.negative_ttl, now)
+                self.failures.append((query[0], "no such domain name (NXDOMAIN)" if rcode == self.NXDOMAIN else "no address"))
+                results[query] = []
+            elif rcode == self.NOERROR:
+                self.store(query, addresses, ttl, now)
+                results[query] = addresses
+            else:
+                self.failures.append((query[0], f"DNS response code {rcode}"))
+                results[query] = None
+        return results
+
+
+    def annotate(self, policies: dict) -> None:
+        """
+        Resolve the domain names of single policies,
+        and add the resolved addresses next to them.
+        Domain names which could not be resolved, or have no address, are left as is.
+
+        :param policies: mapping between policy names and policies
+        """
+        # Collect domain names, per record type
+        matches = []
+        for policy in policies.values():
+            for protocol, record_type in self.record_types.items():
+                protocol_matches = policy["protocols"].get(protocol, None)
+                if protocol_matches is None:
+                    continue
+                for field in self.fields:
+                    value = protocol_matches.get(field, None)
+                    if value is not None and value != "local" and NetworkIndex.ip_network(str(value)) is None:
+                        matches.append((protocol_matches, field, (value, record_type)))
+
+        # Resolve all domain names at once
+        results = self.resolve({query for _, _, query in matches})
+        for protocol_matches, field, query in matches:
+            addresses = results[query]
+            if addresses:
+                # Own list per policy, to avoid YAML aliases
+                protocol_matches[self.fields[field]] = list(addresses)
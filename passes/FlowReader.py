@@ -0,0 +1,328 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import csv
+import struct
+import ipaddress
+import numpy as np
+
+
+class FlowReader:
+    """
+    Reader of captured traffic, as flow tuples in NumPy arrays, one row per packet (or CSV line):
+    network family, IP protocol, MAC and IP addresses, ports, and ICMP type.
+    Captures are read either from a pcap file (Ethernet, Linux cooked, or raw IP link types),
+    whose packet headers are decoded all at once with vectorized gathers,
+    or from a CSV file with a header row.
+    IP addresses are stored as pairs of 64-bit integers (high, low),
+    such that IPv4 and IPv6 addresses are compared the same way.
+    """
+
+    # Flow tuple fields, and their NumPy types
+    # (MAC addresses are 0 if unknown, ICMP type is -1 if not ICMP)
+    dtype = np.dtype([
+        ("family", "u1"),
+        ("proto", "u1"),
+        ("src_mac", "u8"),
+        ("dst_mac", "u8"),
+        ("src_hi", "u8"),
+        ("src_lo", "u8"),
+        ("dst_hi", "u8"),
+        ("dst_lo", "u8"),
+        ("sport", "u2"),
+        ("dport", "u2"),
+        ("type", "i2")
+    ])
+
+    # pcap magic numbers (microsecond and nanosecond timestamps), as read in little endian
+    pcap_magics = {
+        0xa1b2c3d4: "<",
+        0xa1b23c4d: "<",
+        0xd4c3b2a1: ">",
+        0x4d3cb2a1: ">"
+    }
+
+    # Supported pcap link types
+    LINKTYPE_ETHERNET = 1
+    LINKTYPE_RAW = 101
+    LINKTYPE_LINUX_SLL = 113
+    LINKTYPE_IPV4 = 228
+    LINKTYPE_IPV6 = 229
+
+    # EtherTypes
+    ETHERTYPE_IPV4 = 0x0800
+    ETHERTYPE_IPV6 = 0x86dd
+    ethertypes_vlan = [0x8100, 0x88a8]
+
+    # IP protocol numbers
+    protocol_numbers = {
+        "icmp": 1,
+        "tcp": 6,
+        "udp": 17,
+        "ipv6-icmp": 58,
+        "icmpv6": 58
+    }
+    PORT_PROTOCOLS = [6, 17, 132]  # TCP, UDP, SCTP
+    ICMP_PROTOCOLS = [1, 58]
+
+    # IPv6 extension headers skipped to reach the transport header (hop-by-hop, routing, fragment, destination options)
+    ipv6_extensions = [0, 43, 44, 60]
+    IPV6_FRAGMENT = 44
+    MAX_EXTENSIONS = 4
+
+    # CSV columns: mapping between flow fields and column names
+    csv_columns = {
+        "src": "src",
+        "dst": "dst",
+        "proto": "proto",
+        "sport": "sport",
+        "dport": "dport",
+        "type": "type",
+        "src_mac": "src-mac",
+        "dst_mac": "dst-mac",
+        "count": "packets"
+    }
+
+
+    @classmethod
+    def read(c, path: str) -> tuple:
+        """
+        Read a capture file, either pcap (detected from its magic number) or CSV.
+
+        :param path: capture file path
+        :return: tuple (flow tuples array, packet counts array, number of skipped packets)
+        :raises ValueError: invalid or unsupported capture file
+        """
+        with open(path, "rb") as capture_file:
+            magic = capture_file.read(4)
+        if len(magic) == 4 and struct.unpack("<I", magic)[0] in c.pcap_magics:
+            with open(path, "rb") as capture_file:
+                return c.read_pcap(capture_file.read())
+        if magic == b"\x0a\x0d\x0d\x0a":
+            raise ValueError(f"{path}: pcapng captures are not supported, convert them to pcap (e.g. with editcap -F pcap)")
+        return c.read_csv(path)
+
+
+    @staticmethod
+    def mac_value(mac: str) -> int:
+        """
+        Convert a MAC address to an integer.
+
+        :param mac: MAC address, with ":" or "-" separators
+        :return: 48-bit integer
+        """
+        return int(mac.replace(":", "").replace("-", ""), 16)
+
+
+    @staticmethod
+    def address_value(address: object) -> tuple:
+        """
+        Convert an IP address to its network family, and its pair of 64-bit integers.
+
+        :param address: IP address, as a string or ipaddress object
+        :return: tuple (family: 4 or 6, high 64 bits, low 64 bits)
+        :raises ValueError: invalid IP address
+        """
+        address = ipaddress.ip_address(address)
+        value = int(address)
+        return address.version, value >> 64, value & 0xffffffffffffffff
+
+
+    @staticmethod
+    def format_address(family: int, high: int, low: int) -> str:
+        """
+        Format an IP address stored as a pair of 64-bit integers.
+
+        :param family: network family (4 or 6)
+        :param high: high 64 bits
+        :param low: low 64 bits
+        :return: IP address
+        """
+        value = (int(high) << 64) | int(low)
+        return str(ipaddress.IPv4Address(value) if family == 4 else ipaddress.IPv6Address(value))
+
+
+    @classmethod
+    def read_csv(c, path: str) -> tuple:
+        """
+        Read flow tuples from a CSV file, with a header row.
+        Columns: src, dst (IP addresses), proto (protocol name or number),
+        and optionally sport, dport, type (ICMP type), src-mac, dst-mac, and packets (count, default 1).
+
+        :param path: CSV file path
+        :return: tuple (flow tuples array, packet counts array, number of skipped packets)
+        :raises ValueError: invalid CSV line
+        """
+        rows = []
+        counts = []
+        addresses = {}  # Converted IP addresses, as they repeat across flows
+        macs = {}
+        columns = c.csv_columns
+        with open(path, "r", newline="") as csv_file:
+            # Line 1 is the header row
+            for line, row in enumerate(csv.DictReader(csv_file), start=2):
+                try:
+                    values = []
+                    for field in ("src", "dst"):
+                        address = row[columns[field]].strip()
+                        value = addresses.get(address, None)
+                        if value is None:
+                            value = addresses[address] = c.address_value(address)
+                        values.append(value)
+                    (family, src_hi, src_lo), (dst_family, dst_hi, dst_lo) = values
+                    if family != dst_family:
+                        raise ValueError("source and destination addresses of different families")
+                    proto = row[columns["proto"]].strip().lower()
+                    proto = int(proto) if proto.isdigit() else c.protocol_numbers[proto]
+                    mac_values = []
+                    for field in ("src_mac", "dst_mac"):
+                        mac = (row.get(columns[field], None) or "").strip()
+                        if mac not in macs:
+                            macs[mac] = c.mac_value(mac) if mac else 0
+                        mac_values.append(macs[mac])
+                    sport = int(row.get(columns["sport"], None) or 0)
+                    dport = int(row.get(columns["dport"], None) or 0)
+                    icmp_type = row.get(columns["type"], None)
+                    icmp_type = int(icmp_type) if proto in c.ICMP_PROTOCOLS and icmp_type else -1
+                    count = int(row.get(columns["count"], None) or 1)
+                except (KeyError, ValueError) as e:
+                    raise ValueError(f"{path}, line {line}: invalid flow: {e}")
+                rows.append((family, proto, mac_values[0], mac_values[1], src_hi, src_lo, dst_hi, dst_lo, sport, dport, icmp_type))
+                counts.append(count)
+        return np.array(rows, dtype=c.dtype), np.array(counts, dtype="u8"), 0
+
+
+    @classmethod
+    def packet_offsets(c, data: bytes, endian: str) -> tuple:
+        """
+        Walk the pcap records, to find the offset and captured length of each packet.
+        This is the only per-packet loop, as records have variable lengths.
+
+        :param data: pcap file contents
+        :param endian: byte order of the pcap file ("<" or ">")
+        :return: tuple (offsets array, captured lengths array)
+        """
+        # Record header: timestamp (skipped), captured length, original length (skipped)
+        record = struct.Struct(endian + "8xI4x")
+        unpack = record.unpack_from
+        size = len(data)
+        records = []
+        append = records.append
+        position = 24
+        while position + record.size <= size:
+            append(position)
+            position += record.size + unpack(data, position)[0]
+        # Captured lengths follow from the next record's offset (the last packet may be truncated)
+        records = np.array(records, dtype="i8")
+        offsets = records + record.size
+        ends = np.minimum(np.append(records[1:], position), size)
+        return offsets, ends - offsets
+
+
+    @classmethod
+    def read_pcap(c, data: bytes) -> tuple:
+        """
+        Read flow tuples from a pcap file.
+        Non-IP packets, non-first fragments and packets truncated before their transport header are skipped.
+
+        :param data: pcap file contents
+        :return: tuple (flow tuples array, packet counts array, number of skipped packets)
+        :raises ValueError: unsupported link type
+        """
+        if len(data) < 24:
+            raise ValueError("truncated pcap header")
+        endian = c.pcap_magics[struct.unpack("<I", data[:4])[0]]
+        linktype = struct.unpack(endian + "I", data[20:24])[0] & 0x0fffffff
+        offsets, lengths = c.packet_offsets(data, endian)
+        buffer = np.frombuffer(data, dtype="u1")
+        last = len(buffer) - 1
+        ends = offsets + lengths
+
+        def uint(position: np.ndarray, size: int) -> np.ndarray:
+            # Big-endian unsigned integers of the given size (1, 2, 4, 6 or 8 bytes) at the given positions,
+            # gathered as rows of bytes viewed as integers (garbage past the captured length, masked out by the callers);
+            # 6-byte integers are read as 8-byte integers starting 2 bytes earlier, and masked
+            width = 8 if size == 6 else size
+            index = np.minimum(position[:, None] + np.arange(size - width, size), last)
+            value = buffer[index].view(f">u{width}").ravel().astype("u8")
+            if size == 6:
+                value &= np.uint64((1 << 48) - 1)
+            return value
+
+        flows = np.zeros(len(offsets), dtype=c.dtype)
+        flows["type"] = -1
+
+        # Link layer
+        if linktype == c.LINKTYPE_ETHERNET:
+            flows["dst_mac"] = uint(offsets, 6)
+            flows["src_mac"] = uint(offsets + 6, 6)
+            network = offsets + 14
+            ethertype = uint(offsets + 12, 2)
+            vlan = np.flatnonzero(np.isin(ethertype, c.ethertypes_vlan))
+            ethertype[vlan] = uint(offsets[vlan] + 16, 2)
+            network[vlan] += 4
+        elif linktype == c.LINKTYPE_LINUX_SLL:
+            # Link-layer address of the sender, if a MAC address
+            ethernet = uint(offsets + 4, 2) == 6
+            flows["src_mac"] = np.where(ethernet, uint(offsets + 6, 6), 0)
+            ethertype = uint(offsets + 14, 2)
+            network = offsets + 16
+        elif linktype in (c.LINKTYPE_RAW, c.LINKTYPE_IPV4, c.LINKTYPE_IPV6):
+            version = uint(offsets, 1) >> np.uint64(4)
+            ethertype = np.where(version == 6, c.ETHERTYPE_IPV6, np.where(version == 4, c.ETHERTYPE_IPV4, 0))
+            network = offsets
+        else:
+            raise ValueError(f"unsupported pcap link type {linktype}")
+
+        # Network layer: only IP packets are decoded further
+        ipv4 = (ethertype == c.ETHERTYPE_IPV4) & (network + 20 <= ends)
+        ipv6 = (ethertype == c.ETHERTYPE_IPV6) & (network + 40 <= ends)
+        ip = ipv4 | ipv6
+        packets = len(flows)
+        # (structured arrays are selected with compress and take, much faster than with indexing)
+        flows, network, ends, ipv6 = np.compress(ip, flows), network[ip], ends[ip], ipv6[ip]
+        v4 = np.flatnonzero(~ipv6)
+        v6 = np.flatnonzero(ipv6)
+        valid = np.ones(len(flows), dtype=bool)
+        proto = np.zeros(len(flows), dtype="u8")
+        transport = network + 40
+        flows["family"] = np.where(ipv6, 6, 4)
+        # IPv4: header length, protocol, fragment offset, addresses
+        network4 = network[v4]
+        transport[v4] = network4 + 4 * (uint(network4, 1) & np.uint64(0x0f)).astype("i8")
+        proto[v4] = uint(network4 + 9, 1)
+        valid[v4] = (uint(network4 + 6, 2) & np.uint64(0x1fff)) == 0
+        flows["src_lo"][v4] = uint(network4 + 12, 4)
+        flows["dst_lo"][v4] = uint(network4 + 16, 4)
+        # IPv6: next header, addresses, and extension headers
+        network6 = network[v6]
+        proto[v6] = uint(network6 + 6, 1)
+        flows["src_hi"][v6] = uint(network6 + 8, 8)
+        flows["src_lo"][v6] = uint(network6 + 16, 8)
+        flows["dst_hi"][v6] = uint(network6 + 24, 8)
+        flows["dst_lo"][v6] = uint(network6 + 32, 8)
+        extensions = v6
+        for _ in range(c.MAX_EXTENSIONS):
+            extensions = extensions[np.isin(proto[extensions], c.ipv6_extensions)]
+            if not len(extensions):
+                break
+            position = transport[extensions]
+            fragment = proto[extensions] == c.IPV6_FRAGMENT
+            valid[extensions[fragment]] &= (uint(position[fragment] + 2, 2) & np.uint64(0xfff8)) == 0
+            length = np.where(fragment, 8, (uint(position + 1, 1).astype("i8") + 1) * 8)
+            proto[extensions] = uint(position, 1)
+            transport[extensions] = position + length
+        valid[v6] &= ~np.isin(proto[v6], c.ipv6_extensions)
+        flows["proto"] = proto
+
+        # Transport layer
+        ports = np.flatnonzero(np.isin(proto, c.PORT_PROTOCOLS))
+        icmp = np.flatnonzero(np.isin(proto, c.ICMP_PROTOCOLS))
+        valid[ports] &= transport[ports] + 4 <= ends[ports]
+        valid[icmp] &= transport[icmp] + 1 <= ends[icmp]
+        flows["sport"][ports] = uint(transport[ports], 2)
+        flows["dport"][ports] = uint(transport[ports] + 2, 2)
+        flows["type"][icmp] = uint(transport[icmp], 1)
+
+        flows = np.compress(valid, flows)
+        return flows, np.ones(len(flows), dtype="u8"), packets - len(flows)
@@ -0,0 +1,259 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+from collections.abc import Iterator
+import ipaddress
+import functools
+
+
+class NetworkIndex:
+    """
+    Index of the network matches of a profile's single policies,
+    answering containment and overlap queries without comparing all pairs of policies:
+        - IP networks are stored in a binary prefix trie, one per IP version,
+        - domain names are stored in a trie of their reversed labels (domain-suffix index),
+        - other network matches (e.g. "local") are only matched exactly.
+    Indexed entries are tuples (policy name, protocol, field, network match).
+    """
+
+    # Network layer protocols, and their network fields
+    network_protocols = ["ipv4", "ipv6"]
+    network_fields = ["src", "dst"]
+
+
+    @staticmethod
+    @functools.lru_cache(maxsize=65536)
+    def ip_network(value: str) -> ipaddress.IPv4Network | ipaddress.IPv6Network:
+        """
+        Convert a network match to an IP network, if it is one.
+        Memoized, as the same network matches repeat across ACEs.
+
+        :param value: network match
+        :return: IP network, or None if the network match is not an IP network
+        """
+        try:
+            return ipaddress.ip_network(value, strict=False)
+        except ValueError:
+            return None
+
+
+    @staticmethod
+    def labels(domain_name: str) -> list:
+        """
+        Split a domain name into its labels, from the top-level domain.
+
+        :param domain_name: domain name
+        :return: list of labels, in reverse order
+        """
+        return domain_name.lower().rstrip(".").split(".")[::-1]
+
+
+    def __init__(self) -> None:
+        """
+        Constructor for the NetworkIndex class.
+        """
+        # Trie nodes are lists [child for bit 0, child for bit 1, entries]
+        self.tries = {4: [None, None, []], 6: [None, None, []]}
+        # Domain trie nodes are lists [mapping between labels and children, entries]
+        self.domains = [{}, []]
+        # Mapping between non-IP network matches and entries
+        self.exact = {}
+        self.size = 0
+
+
+    def __len__(self) -> int:
+        """
+        Number of indexed entries.
+        """
+        return self.size
+
+
+    def prefix_path(self, network: ipaddress.IPv4Network | ipaddress.IPv6Network, create: bool = False) -> Iterator[list]:
+        """
+        Walk the prefix trie along the bits of an IP network prefix.
+
+        :param network: IP network
+        :param create: create the missing trie nodes
+        :return: iterator over the trie nodes from the root to the network's node,
+                 stopping early at a missing node if not created
+        """
+        node = self.tries[network.version]
+        yield node
+        address = int(network.network_address)
+        shift = network.max_prefixlen - 1
+        for i in range(network.prefixlen):
+            bit = (address >> (shift - i)) & 1
+            if node[bit] is None:
+                if not create:
+                    return
+                node[bit] = [None, None, []]
+            node = node[bit]
+            yield node
+
+
+    def domain_path(self, domain_name: str, create: bool = False) -> Iterator[list]:
+        """
+        Walk the domain trie along the reversed labels of a domain name.
+
+        :param domain_name: domain name
+        :param create: create the missing trie nodes
+        :return: iterator over the trie nodes from the root to the domain name's node,
+                 stopping early at a missing node if not created
+        """
+        node = self.domains
+        yield node
+        for label in self.labels(domain_name):
+            child = node[0].get(label, None)
+            if child is None:
+                if not create:
+                    return
+                child = node[0][label] = [{}, []]
+            node = child
+            yield node
+
+
+    def add(self, name: str, protocol: str, field: str, value: str) -> None:
+        """
+        Index a network match.
+
+        :param name: policy name
+        :param protocol: network protocol ("ipv4" or "ipv6")
+        :param field: network field ("src" or "dst")
+        :param value: network match (CIDR, domain name, or "local")
+        """
+        entry = (name, protocol, field, value)
+        network = self.ip_network(value)
+        if network is not None:
+            for node in self.prefix_path(network, create=True):
+                pass
+            node[2].append(entry)
+        else:
+            self.exact.setdefault(value, []).append(entry)
+            if value != "local":
+                for node in self.domain_path(value, create=True):
+                    pass
+                node[1].append(entry)
+        self.size += 1
+
+
+    def add_policy(self, name: str, policy: dict) -> None:
+        """
+        Index the network matches of a single policy.
+
+        :param name: policy name
+        :param policy: policy dictionary
+        """
+        protocols = policy["protocols"]
+        for protocol in self.network_protocols:
+            protocol_matches = protocols.get(protocol, None)
+            if protocol_matches is None:
+                continue
+            for field in self.network_fields:
+                value = protocol_matches.get(field, None)
+                if value is not None:
+                    self.add(name, protocol, field, str(value))
+
+
+    def covering(self, value: str) -> list:
+        """
+        Get the indexed entries whose network match contains a given one, including equal ones.
+
+        :param value: network match
+        :return: list of entries
+        """
+        network = self.ip_network(value)
+        if network is None:
+            return list(self.exact.get(value, []))
+        # Entries of the nodes along the network's prefix, i.e. shorter or equal prefixes
+        return [entry for node in self.prefix_path(network) for entry in node[2]]
+
+
+    def covered(self, value: str) -> list:
+        """
+        Get the indexed entries whose network match is contained in a given one, including equal ones.
+
+        :param value: network match
+        :return: list of entries
+        """
+        network = self.ip_network(value)
+        if network is None:
+            return list(self.exact.get(value, []))
+        nodes = list(self.prefix_path(network))
+        if len(nodes) <= network.prefixlen:
+            # Network's node missing: no longer prefix indexed
+            return []
+        entries = []
+        stack = [nodes[-1]]
+        while stack:
+            node = stack.pop()
+            entries += node[2]
+            stack += [child for child in node[:2] if child is not None]
+        return entries
+
+
+    def overlapping(self, value: str) -> list:
+        """
+        Get the indexed entries whose network match overlaps a given one,
+        i.e. contains it, or is contained in it.
+
+        :param value: network match
+        :return: list of entries
+        """
+        covered = self.covered(value)
+        exact = {id(entry) for entry in covered}
+        return [entry for entry in self.covering(value) if id(entry) not in exact] + covered
+
+
+    def superdomains(self, domain_name: str) -> list:
+        """
+        Get the indexed entries whose domain name is a parent domain of a given one.
+
+        :param domain_name: domain name
+        :return: list of entries
+        """
+        nodes = list(self.domain_path(domain_name))
+        if len(nodes) > len(self.labels(domain_name)):
+            # Exclude the domain name itself
+            nodes.pop()
+        return [entry for node in nodes for entry in node[1]]
+
+
+    def subdomains(self, domain_name: str) -> list:
+        """
+        Get the indexed entries whose domain name is a subdomain of a given one.
+
+        :param domain_name: domain name
+        :return: list of entries
+        """
+        nodes = list(self.domain_path(domain_name))
+        if len(nodes) <= len(self.labels(domain_name)):
+            # Domain name's node missing: no subdomain indexed
+            return []
+        entries = []
+        stack = list(nodes[-1][0].values())
+        while stack:
+            node = stack.pop()
+            entries += node[1]
+            stack += node[0].values()
+        return entries
+
+
+    def containments(self) -> Iterator[tuple]:
+        """
+        Find the IP network matches strictly contained in another one,
+        for the same protocol and field.
+
+        :return: iterator over tuples (narrower entry, broader entry)
+        """
+        for root in self.tries.values():
+            # Depth-first traversal, keeping the entries of the ancestor nodes
+            stack = [(root, [])]
+            while stack:
+                node, ancestors = stack.pop()
+                for entry in node[2]:
+                    for broad_entry in ancestors:
+                        if broad_entry[1:3] == entry[1:3]:
+                            yield entry, broad_entry
+                if node[2]:
+                    ancestors = ancestors + node[2]
+                stack += [(child, ancestors) for child in node[:2] if child is not None]
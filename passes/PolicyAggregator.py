@@ -0,0 +1,346 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import json
+from parsers.ir.Record import Record
+from passes.NetworkIndex import NetworkIndex
+
+
+class PolicyAggregator:
+    """
+    Optimization pass over the translated single policies, of each direction separately:
+        - removes duplicate policies (identical protocol matches and metadata),
+        - merges policies differing only by a port match, coalescing their ports into ranges,
+        - removes policies shadowed by broader ones.
+    """
+
+    # Network layer protocols, and their network fields
+    network_protocols = ["ipv4", "ipv6"]
+    network_fields = ["src", "dst"]
+
+    # Transport layer protocols, and their port fields
+    transport_protocols = ["tcp", "udp"]
+    port_fields = ["src-port", "dst-port"]
+
+    # Port numbers range
+    MIN_PORT = 0
+    MAX_PORT = 65535
+
+
+    @classmethod
+    def port_intervals(c, port_match: int | str | list) -> list:
+        """
+        Convert a port match to a list of port intervals.
+
+        :param port_match: port match, as in the YAML profile
+                           (port number, "<= port", ">= port", "!= port", "low-high", or list of those)
+        :return: list of tuples (lowest port, highest port)
+        :raises ValueError: invalid port match
+        """
+        if isinstance(port_match, list):
+            return [interval for match in port_match for interval in c.port_intervals(match)]
+        if isinstance(port_match, int):
+            return [(port_match, port_match)]
+        port_match = str(port_match)
+        if port_match.startswith("<="):
+            return [(c.MIN_PORT, int(port_match[2:]))]
+        if port_match.startswith(">="):
+            return [(int(port_match[2:]), c.MAX_PORT)]
+        if port_match.startswith("!="):
+            port = int(port_match[2:])
+            return [interval for interval in [(c.MIN_PORT, port - 1), (port + 1, c.MAX_PORT)] if interval[0] <= interval[1]]
+        if "-" in port_match:
+            low, high = port_match.split("-", 1)
+            return [(int(low), int(high))]
+        return [(int(port_match), int(port_match))]
+
+
+    @classmethod
+    def coalesce(c, intervals: list) -> list:
+        """
+        Coalesce overlapping and adjacent port intervals.
+
+        :param intervals: list of tuples (lowest port, highest port)
+        :return: sorted list of disjoint, non-adjacent port intervals
+        """
+        coalesced = []
+        for low, high in sorted(intervals):
+            if coalesced and low <= coalesced[-1][1] + 1:
+                coalesced[-1] = (coalesced[-1][0], max(coalesced[-1][1], high))
+            else:
+                coalesced.append((low, high))
+        return coalesced
+
+
+    @classmethod
+    def port_match(c, intervals: list) -> int | str | list:
+        """
+        Convert a list of coalesced port intervals back to a port match.
+
+        :param intervals: sorted list of disjoint port intervals
+        :return: port match, as in the YAML profile, or None if all ports match
+        """
+        if intervals == [(c.MIN_PORT, c.MAX_PORT)]:
+            return None
+        if len(intervals) == 2 and intervals[0][0] == c.MIN_PORT and intervals[1][1] == c.MAX_PORT \
+                and intervals[1][0] == intervals[0][1] + 2:
+            return f"!= {intervals[0][1] + 1}"
+        matches = []
+        for low, high in intervals:
+            if low == high:
+                matches.append(low)
+            elif low == c.MIN_PORT:
+                matches.append(f"<= {high}")
+            elif high == c.MAX_PORT:
+                matches.append(f">= {low}")
+            else:
+                matches.append(f"{low}-{high}")
+        return matches[0] if len(matches) == 1 else matches
+
+
+    @staticmethod
+    def canonical(data: dict) -> str:
+        """
+        Get a canonical string representation of a (part of a) policy, to be used as key.
+
+        :param data: policy, or part of a policy
+        :return: canonical string representation
+        """
+        return json.dumps(data, sort_keys=True, default=Record.json_default)
+
+
+    def __init__(self) -> None:
+        """
+        Constructor for the PolicyAggregator class.
+        """
+        self.total = 0
+        self.duplicates = 0
+        self.merged = 0
+        self.shadowed = 0
+
+
+    @property
+    def removed(self) -> int:
+        """
+        Number of policies removed by the aggregation.
+        """
+        return self.duplicates + self.merged + self.shadowed
+
+
+    def report(self) -> str:
+        """
+        Get a report of the aggregation.
+
+        :return: human-readable aggregation report
+        """
+        return (f"aggregation removed {self.removed} of {self.total} single policies "
+                f"({self.duplicates} duplicate, {self.merged} merged, {self.shadowed} shadowed)")
+
+
+    def remove_duplicates(self, policies: dict) -> dict:
+        """
+        Remove policies identical to a previous one.
+        Policies without protocol matches (e.g. only unsupported matches) are not duplicates,
+        as they may differ by their unsupported matches.
+
+        :param policies: mapping between policy names and policies
+        :return: mapping between policy names and policies, without duplicates
+        """
+        seen = set()
+        unique = {}
+        for name, policy in policies.items():
+            if not policy["protocols"]:
+                unique[name] = policy
+                continue
+            key = self.canonical(policy)
+            if key in seen:
+                self.duplicates += 1
+                continue
+            seen.add(key)
+            unique[name] = policy
+        return unique
+
+
+    def merge_ports(self, policies: dict) -> dict:
+        """
+        Merge policies differing only by one port match,
+        coalescing their port matches into ranges.
+        The merged policy keeps the name of the first one.
+
+        :param policies: mapping between policy names and policies
+        :return: mapping between policy names and merged policies
+        """
+        for protocol in self.transport_protocols:
+            for field in self.port_fields:
+
+                # Group policies by everything but the port match
+                groups = {}
+                for name, policy in policies.items():
+                    protocol_matches = policy["protocols"].get(protocol, None)
+                    if protocol_matches is None or field not in protocol_matches:
+                        continue
+                    rest = dict(policy)
+                    rest["protocols"] = dict(policy["protocols"])
+                    rest["protocols"][protocol] = {k: v for k, v in protocol_matches.items() if k != field}
+                    groups.setdefault(self.canonical(rest), []).append(name)
+
+                # Merge groups
+                for names in groups.values():
+                    if len(names) < 2:
+                        continue
+                    protocol_matches = policies[names[0]]["protocols"][protocol]
+                    intervals = []
+                    for name in names:
+                        intervals += self.port_intervals(policies[name]["protocols"][protocol][field])
+                    port_match = self.port_match(self.coalesce(intervals))
+                    if port_match is None:
+                        del protocol_matches[field]
+                    else:
+                        protocol_matches[field] = port_match
+                    for name in names[1:]:
+                        del policies[name]
+                        self.merged += 1
+
+        return policies
+
+
+    def contains_network(self, broad: str, narrow: str) -> bool:
+        """
+        Check if a network match contains another one.
+
+        :param broad: broader network match (CIDR, domain name, or "local")
+        :param narrow: narrower network match (CIDR, domain name, or "local")
+        :return: True if the broader network match contains the narrower one
+        """
+        if broad == narrow:
+            return True
+        broad_network = NetworkIndex.ip_network(str(broad))
+        narrow_network = NetworkIndex.ip_network(str(narrow))
+        if broad_network is None or narrow_network is None:
+            return False
+        return broad_network.version == narrow_network.version and narrow_network.subnet_of(broad_network)
+
+
+    def contains(self, broad: dict, narrow: dict) -> bool:
+        """
+        Check if a policy matches all the traffic matched by another one,
+        i.e. if each of its matches is less specific.
+
+        :param broad: broader policy
+        :param narrow: narrower policy
+        :return: True if the broader policy shadows the narrower one
+        """
+        # Metadata must be identical
+        if {k: v for k, v in broad.items() if k != "protocols"} != {k: v for k, v in narrow.items() if k != "protocols"}:
+            return False
+
+        for protocol, broad_matches in broad["protocols"].items():
+            narrow_matches = narrow["protocols"].get(protocol, None)
+            if narrow_matches is None:
+                return False
+            for field, broad_value in broad_matches.items():
+                narrow_value = narrow_matches.get(field, None)
+                if narrow_value is None:
+                    return False
+                if protocol in self.network_protocols and field in self.network_fields:
+                    if not self.contains_network(broad_value, narrow_value):
+                        return False
+                elif protocol in self.transport_protocols and field in self.port_fields:
+                    broad_intervals = self.coalesce(self.port_intervals(broad_value))
+                    for low, high in self.port_intervals(narrow_value):
+                        if not any(b_low <= low and high <= b_high for b_low, b_high in broad_intervals):
+                            return False
+                elif broad_value != narrow_value:
+                    return False
+        return True
+
+
+    def candidates(self, policy: dict, index: NetworkIndex, unconstrained: list) -> list:
+        """
+        Get the names of the policies which may shadow a given policy,
+        i.e. policies without network matches,
+        or with a network match containing one of the policy's.
+
+        :param policy: policy
+        :param index: network index of the policies
+        :param unconstrained: names of the policies without network matches
+        :return: list of candidate policy names
+        """
+        candidates = list(unconstrained)
+        for protocol in self.network_protocols:
+            protocol_matches = policy["protocols"].get(protocol, {})
+            for field in self.network_fields:
+                value = protocol_matches.get(field, None)
+                if value is None:
+                    continue
+                candidates += [name for name, broad_protocol, broad_field, _ in index.covering(str(value))
+                               if broad_protocol == protocol and broad_field == field]
+        return candidates
+
+
+    def remove_shadowed(self, policies: dict, index: NetworkIndex = None) -> dict:
+        """
+        Remove policies shadowed by a broader policy.
+        Among equivalent policies, the first one is kept.
+
+        :param policies: mapping between policy names and policies
+        :param index: network index of the policies, built if not given
+                      (may contain policies removed by previous passes, as they do not change network matches)
+        :return: mapping between policy names and policies, without shadowed policies
+        """
+        if index is None:
+            index = NetworkIndex()
+            for name, policy in policies.items():
+                index.add_policy(name, policy)
+
+        # Policies without network matches may shadow any policy
+        order = {}
+        unconstrained = []
+        for position, (name, policy) in enumerate(policies.items()):
+            order[name] = position
+            if not any(protocol in policy["protocols"] for protocol in self.network_protocols):
+                unconstrained.append(name)
+
+        # Find shadowed policies.
+        # Policies without protocol matches (e.g. only unsupported matches) do not shadow others.
+        shadowed = set()
+        for name, policy in policies.items():
+            for candidate in self.candidates(policy, index, unconstrained):
+                if candidate == name or candidate in shadowed or candidate not in policies:
+                    continue
+                if not policies[candidate]["protocols"]:
+                    continue
+                if self.contains(policies[candidate], policy):
+                    # Equivalent policies: keep the first one
+                    if self.contains(policy, policies[candidate]) and order[candidate] > order[name]:
+                        continue
+                    shadowed.add(name)
+                    break
+
+        self.shadowed += len(shadowed)
+        return {name: policy for name, policy in policies.items() if name not in shadowed}
+
+
+    def aggregate(self, policies: dict, index: NetworkIndex = None, directions: dict = None) -> dict:
+        """
+        Aggregate single policies.
+        Policies are only aggregated with policies of the same direction,
+        as policies with the same matches in both directions match different traffic.
+
+        :param policies: mapping between policy names and policies
+        :param index: network index of the policies, built if not given
+        :param directions: mapping between policy names and their direction (see MudParser.policy_directions),
+                           policies not in the mapping are aggregated together
+        :return: mapping between policy names and aggregated policies, in the same order
+        """
+        self.total += len(policies)
+        groups = {}
+        for name, policy in policies.items():
+            direction = None if directions is None else directions.get(name, None)
+            groups.setdefault(direction, {})[name] = policy
+        aggregated = {}
+        for group in groups.values():
+            group = self.remove_duplicates(group)
+            group = self.merge_ports(group)
+            aggregated.update(self.remove_shadowed(group, index))
+        return {name: aggregated[name] for name in policies if name in aggregated}
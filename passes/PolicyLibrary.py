@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+from passes.ProfileDiff import ProfileDiff
+
+
+class PolicyLibrary:
+    """
+    Cross-profile pass over translated profiles: interns the single policies shared by several profiles
+    into a shared policy library, such that each shared policy is stored, and installed, once.
+        - single policies are identified by the stable hash of their normalized content
+          (protocol matches and metadata, with sorted keys, see ProfileDiff.policy_hash),
+        - policies found in at least two profiles are moved to the library,
+          and replaced in each profile by a reference to their library ID, e.g. {"library": "8f3c..."},
+        - the library is itself a translated profile, whose single policies are named by their ID,
+          such that it is written, and looked up (e.g. in a binary profile), like any other profile.
+    """
+
+    # Single policy field referencing a library policy
+    REFERENCE = ProfileDiff.REFERENCE
+
+    # Minimum number of profiles containing a policy for it to be shared
+    min_profiles = 2
+
+
+    @classmethod
+    def expand(c, profile: dict, library: dict) -> dict:
+        """
+        Replace the library references of a profile by the referenced library policies.
+
+        :param profile: dictionary containing a translated profile, with library references
+        :param library: dictionary containing the policy library
+        :return: dictionary containing the translated profile, with full single policies
+        :raises ValueError: a referenced policy is not in the library
+        """
+        policies = {}
+        for name, policy in profile["single-policies"].items():
+            if c.REFERENCE in policy:
+                try:
+                    policy = library["single-policies"][policy[c.REFERENCE]]
+                except KeyError:
+                    raise ValueError(f"Policy '{name}' references unknown library policy {policy[c.REFERENCE]}")
+            policies[name] = policy
+        return dict(profile, **{"single-policies": policies})
+
+
+    def __init__(self) -> None:
+        """
+        Constructor for the PolicyLibrary class.
+        """
+        # Mapping between policy IDs and policies, and number of profiles containing them
+        self.policies = {}
+        self.counts = {}
+        # Statistics
+        self.profiles = 0
+        self.total = 0
+        self.replaced = 0
+
+
+    def policy_id(self, policy: dict) -> str:
+        """
+        Get the ID of a single policy, i.e. the hash of its content,
+        and remember the policy, unless another content has the same ID.
+
+        :param policy: policy dictionary
+        :return: policy ID, or None on a hash collision
+        """
+        policy_id = ProfileDiff.policy_hash(policy)
+        if self.policies.setdefault(policy_id, policy) != policy:
+            # Hash collision: keep the policy in its profile
+            return None
+        return policy_id
+
+
+    def add_profile(self, profile: dict) -> None:
+        """
+        Count the single policies of a translated profile (first pass).
+
+        :param profile: dictionary containing the translated profile
+        """
+        self.profiles += 1
+        policy_ids = {self.policy_id(policy) for policy in profile["single-policies"].values()}
+        policy_ids.discard(None)
+        for policy_id in policy_ids:
+            self.counts[policy_id] = self.counts.get(policy_id, 0) + 1
+
+
+    def is_shared(self, policy_id: str) -> bool:
+        """
+        Check whether a single policy is shared by enough profiles to be moved to the library.
+
+        :param policy_id: policy ID
+        :return: True if the policy is in the library
+        """
+        return self.counts.get(policy_id, 0) >= self.min_profiles
+
+
+    def intern(self, profile: dict) -> dict:
+        """
+        Replace the shared single policies of a translated profile by library references (second pass).
+
+        :param profile: dictionary containing the translated profile, already counted
+        :return: dictionary containing the translated profile, with library references
+        """
+        policies = {}
+        for name, policy in profile["single-policies"].items():
+            self.total += 1
+            policy_id = self.policy_id(policy)
+            if policy_id is not None and self.is_shared(policy_id):
+                policy = {self.REFERENCE: policy_id}
+                self.replaced += 1
+            policies[name] = policy
+        return dict(profile, **{"single-policies": policies})
+
+
+    def library(self) -> dict:
+        """
+        Get the policy library, as a translated profile whose single policies are named by their ID.
+
+        :return: dictionary containing the policy library
+        """
+        return {
+            "device-info": {},
+            "single-policies": {policy_id: policy for policy_id, policy in self.policies.items() if self.is_shared(policy_id)}
+        }
+
+
+    def report(self) -> str:
+        """
+        Get a report of the interning.
+
+        :return: human-readable interning report
+        """
+        shared = sum(1 for policy_id in self.counts if self.is_shared(policy_id))
+        return (f"library interned {self.replaced} of {self.total} single policies of {self.profiles} profiles "
+                f"into {shared} shared policies: {self.total - self.replaced + shared} rules to install instead of {self.total}")
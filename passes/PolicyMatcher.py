@@ -0,0 +1,432 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import numpy as np
+from parsers.Direction import Direction
+from parsers.protocols.icmp import icmp
+from passes.FlowReader import FlowReader
+from passes.PolicyAggregator import PolicyAggregator
+from writers.NftablesWriter import NftablesWriter
+
+
+class PolicyMatcher:
+    """
+    Packet-to-policy matcher, to validate a translated profile against captured traffic:
+    the single policies are compiled into an array-backed rule table,
+    one rule per combination of IP range, port interval, protocol, ICMP type and direction,
+    and each rule is matched against all distinct flow tuples of the capture at once.
+    The result is the number of flows and packets matched by each single policy,
+    and the flows of the device matched by no policy.
+        - domain names are replaced by their resolved addresses (see DnsResolver),
+          policies with unresolved domain names, or without any supported match, are skipped,
+        - bidirectional policies also match the reply traffic,
+        - if the device is identified (MAC or IP address in the device information),
+          only the device's traffic is matched, and policies only match traffic in their direction.
+    """
+
+    # Number of unmatched flows listed in the result, by decreasing packet count
+    max_unmatched = 1000
+
+    # Directions of the flows and rules, relative to the device
+    ANY = 0      # Device not identified, or rule matching both directions
+    FROM = 1
+    TO = 2
+    FOREIGN = 3  # Traffic not from nor to the identified device
+    direction_codes = {
+        Direction.FROM: FROM,
+        Direction.TO: TO
+    }
+    direction_names = {
+        FROM: Direction.FROM.value,
+        TO: Direction.TO.value
+    }
+
+    # IP protocol numbers, per network family (0 for any), of the supported transport protocols
+    protocol_numbers = {
+        "tcp": {0: 6, 4: 6, 6: 6},
+        "udp": {0: 17, 4: 17, 6: 17},
+        "icmp": {4: 1, 6: 58}
+    }
+    families = {
+        "ipv4": 4,
+        "ipv6": 6
+    }
+
+    # ICMP type codes, per network family
+    icmp_types = {
+        4: {name: code for code, name in icmp.icmp_codes.items()},
+        6: {
+            "destination-unreachable": 1,
+            "time-exceeded": 3,
+            "parameter-problem": 4,
+            "echo-request": 128,
+            "echo-reply": 129
+        }
+    }
+
+    # Ranges matching any IP address, and any port
+    ANY_ADDRESS = (0, (1 << 128) - 1)
+    ANY_PORT = (PolicyAggregator.MIN_PORT, PolicyAggregator.MAX_PORT)
+    MASK_64 = (1 << 64) - 1
+
+    # Rule table fields
+    # (family 0 and protocol -1 match any, ICMP type -1 matches any, IP ranges as pairs of 64-bit integers)
+    dtype = np.dtype([
+        ("policy", "i4"),
+        ("family", "u1"),
+        ("proto", "i2"),
+        ("src_start_hi", "u8"),
+        ("src_start_lo", "u8"),
+        ("src_end_hi", "u8"),
+        ("src_end_lo", "u8"),
+        ("dst_start_hi", "u8"),
+        ("dst_start_lo", "u8"),
+        ("dst_end_hi", "u8"),
+        ("dst_end_lo", "u8"),
+        ("sport_low", "u2"),
+        ("sport_high", "u2"),
+        ("dport_low", "u2"),
+        ("dport_high", "u2"),
+        ("type", "i2"),
+        ("direction", "u1")
+    ])
+
+
+    def __init__(self, profile: dict, directions: dict = None) -> None:
+        """
+        Constructor for the PolicyMatcher class.
+        Compiles the single policies of the translated profile into the rule table.
+
+        :param profile: dictionary containing the translated profile
+        :param directions: mapping between policy names and their direction (see MudParser.policy_directions),
+                           policies not in the mapping match both directions
+        """
+        self.device_info = profile["device-info"]
+        self.names = list(profile["single-policies"])
+        # Skipped single policies: list of tuples (policy name, reason)
+        self.skipped = []
+        self.writer = NftablesWriter()
+        rules = []
+        for index, name in enumerate(self.names):
+            direction = self.ANY if directions is None else self.direction_codes.get(directions.get(name, None), self.ANY)
+            try:
+                rules += self.policy_rules(index, profile["single-policies"][name], direction)
+            except ValueError as e:
+                self.skipped.append((name, str(e)))
+        self.rules = np.array(rules, dtype=self.dtype)
+        self.result = None
+
+
+    def policy_rules(self, index: int, policy: dict, direction: int) -> list:
+        """
+        Compile a single policy into rules:
+        the cartesian product of its IP ranges, port intervals and ICMP types.
+
+        :param index: index of the policy
+        :param policy: policy dictionary
+        :param direction: direction of the policy (FROM, TO, or ANY)
+        :return: list of rules, as tuples of the rule table fields
+        :raises ValueError: policy which cannot be compiled
+        """
+        protocols = policy["protocols"]
+        unsupported = [protocol for protocol in protocols if protocol not in self.families and protocol not in self.protocol_numbers]
+        if unsupported:
+            raise ValueError(f"unsupported protocol {unsupported[0]}")
+        network_protocols = [protocol for protocol in self.families if protocol in protocols]
+        transport_protocols = [protocol for protocol in self.protocol_numbers if protocol in protocols]
+        if len(network_protocols) > 1 or len(transport_protocols) > 1:
+            raise ValueError("multiple network or transport protocols")
+        if not network_protocols and not transport_protocols:
+            raise ValueError("no supported match")
+        transport = transport_protocols[0] if transport_protocols else None
+        matches = protocols.get(transport, {})
+
+        # Network families: ICMP without network protocol matches both ICMP and ICMPv6
+        if network_protocols:
+            families = [self.families[network_protocols[0]]]
+        else:
+            families = [4, 6] if transport == "icmp" else [0]
+
+        rules = []
+        for family in families:
+            # IP ranges
+            ranges = {}
+            for field in ("src", "dst"):
+                ranges[field] = [self.ANY_ADDRESS]
+                if network_protocols and field in protocols[network_protocols[0]]:
+                    networks = self.writer.addresses(network_protocols[0], protocols[network_protocols[0]], field)
+                    ranges[field] = [(int(network.network_address), int(network.broadcast_address)) for network in networks]
+            # Port intervals
+            ports = {}
+            for field in ("src-port", "dst-port"):
+                ports[field] = [self.ANY_PORT]
+                if field in matches:
+                    ports[field] = PolicyAggregator.coalesce(PolicyAggregator.port_intervals(matches[field]))
+            # Protocol number and ICMP type
+            proto = -1 if transport is None else self.protocol_numbers[transport][family]
+            icmp_type = -1
+            if transport == "icmp" and "type" in matches:
+                icmp_type = self.icmp_types[family].get(matches["type"], None)
+                if icmp_type is None:
+                    raise ValueError(f"unsupported ICMP type {matches['type']} for IPv{family}")
+
+            for src in ranges["src"]:
+                for dst in ranges["dst"]:
+                    for sport in ports["src-port"]:
+                        for dport in ports["dst-port"]:
+                            rules.append(self.rule(index, family, proto, src, dst, sport, dport, icmp_type, direction))
+                            # Reply traffic of bidirectional policies
+                            if policy.get("bidirectional", False):
+                                reverse = {self.FROM: self.TO, self.TO: self.FROM}.get(direction, self.ANY)
+                                rules.append(self.rule(index, family, proto, dst, src, dport, sport, icmp_type, reverse))
+        return rules
+
+
+    @classmethod
+    def rule(c, index: int, family: int, proto: int, src: tuple, dst: tuple, sport: tuple, dport: tuple, icmp_type: int, direction: int) -> tuple:
+        """
+        Build a rule of the rule table.
+
+        :param index: index of the policy
+        :param family: network family (4, 6, or 0 for any)
+        :param proto: IP protocol number, or -1 for any
+        :param src: source IP range, as a tuple (first address, last address) of integers
+        :param dst: destination IP range
+        :param sport: source port interval, as a tuple (lowest port, highest port)
+        :param dport: destination port interval
+        :param icmp_type: ICMP type code, or -1 for any
+        :param direction: direction (FROM, TO, or ANY)
+        :return: tuple of the rule table fields
+        """
+        return (
+            index, family, proto,
+            src[0] >> 64, src[0] & c.MASK_64, src[1] >> 64, src[1] & c.MASK_64,
+            dst[0] >> 64, dst[0] & c.MASK_64, dst[1] >> 64, dst[1] & c.MASK_64,
+            sport[0], sport[1], dport[0], dport[1],
+            icmp_type, direction
+        )
+
+
+    @staticmethod
+    def in_range(high: np.ndarray, low: np.ndarray, start: tuple, end: tuple) -> np.ndarray:
+        """
+        Match IP addresses, stored as pairs of 64-bit integers, against an IP range.
+
+        :param high: high 64 bits of the addresses
+        :param low: low 64 bits of the addresses
+        :param start: first address of the range, as a tuple (high, low) of np.uint64
+        :param end: last address of the range, as a tuple (high, low) of np.uint64
+        :return: boolean array, True for addresses in the range
+        """
+        if start[0] == end[0]:
+            # IPv4 ranges, and IPv6 prefixes of at least 64 bits
+            return (high == start[0]) & (low >= start[1]) & (low <= end[1])
+        above = (high > start[0]) | ((high == start[0]) & (low >= start[1]))
+        below = (high < end[0]) | ((high == end[0]) & (low <= end[1]))
+        return above & below
+
+
+    def flow_directions(self, flows: np.ndarray | dict) -> np.ndarray:
+        """
+        Compute the direction of each flow, relative to the device,
+        from its MAC address, or its IP addresses, in the device information.
+
+        :param flows: flow tuples array (see FlowReader), or mapping between flow fields and columns
+        :return: array of directions (FROM, TO, FOREIGN, or ANY if the device is not identified)
+        """
+        count = len(flows["family"])
+        from_device = np.zeros(count, dtype=bool)
+        to_device = np.zeros(count, dtype=bool)
+        identified = False
+        if self.device_info.get("mac", None) is not None:
+            mac = np.uint64(FlowReader.mac_value(self.device_info["mac"]))
+            from_device |= flows["src_mac"] == mac
+            to_device |= flows["dst_mac"] == mac
+            identified = True
+        for protocol in self.families:
+            if self.device_info.get(protocol, None) is None:
+                continue
+            family, high, low = FlowReader.address_value(self.device_info[protocol])
+            is_family = flows["family"] == family
+            from_device |= is_family & (flows["src_hi"] == np.uint64(high)) & (flows["src_lo"] == np.uint64(low))
+            to_device |= is_family & (flows["dst_hi"] == np.uint64(high)) & (flows["dst_lo"] == np.uint64(low))
+            identified = True
+        if not identified:
+            return np.full(count, self.ANY, dtype="u1")
+        return np.where(from_device, self.FROM, np.where(to_device, self.TO, self.FOREIGN)).astype("u1")
+
+
+    def match_rule(self, rule: np.void, flows: dict, directions: np.ndarray) -> np.ndarray:
+        """
+        Match all flows against a rule.
+        Only the fields constrained by the rule are compared.
+
+        :param rule: rule of the rule table
+        :param flows: mapping between flow fields and columns
+        :param directions: flow directions array
+        :return: boolean array, True for matching flows
+        """
+        matched = np.ones(len(flows["family"]), dtype=bool)
+        if rule["family"]:
+            matched &= flows["family"] == rule["family"]
+        if rule["proto"] >= 0:
+            matched &= flows["proto"] == rule["proto"]
+        if rule["direction"] != self.ANY:
+            matched &= (directions == rule["direction"]) | (directions == self.ANY)
+        for field in ("src", "dst"):
+            start = (rule[f"{field}_start_hi"], rule[f"{field}_start_lo"])
+            end = (rule[f"{field}_end_hi"], rule[f"{field}_end_lo"])
+            if (int(start[0]), int(start[1]), int(end[0]), int(end[1])) != (0, 0, self.MASK_64, self.MASK_64):
+                matched &= self.in_range(flows[f"{field}_hi"], flows[f"{field}_lo"], start, end)
+        for field in ("sport", "dport"):
+            low, high = rule[f"{field}_low"], rule[f"{field}_high"]
+            if (low, high) != self.ANY_PORT:
+                matched &= (flows[field] >= low) & (flows[field] <= high)
+        if rule["type"] >= 0:
+            matched &= flows["type"] == rule["type"]
+        return matched
+
+
+    @staticmethod
+    def merge_flows(flows: np.ndarray, counts: np.ndarray) -> tuple:
+        """
+        Merge identical flow tuples, adding up their packet counts.
+        Flow tuples are grouped by a 64-bit hash of their fields, sorted at once,
+        instead of sorting whole structured records, or field by field;
+        hash collisions are detected, in which case flow tuples are sorted field by field.
+
+        :param flows: flow tuples array
+        :param counts: packet count of each flow tuple
+        :return: tuple (distinct flow tuples array, packet counts array)
+        """
+        if not len(flows):
+            return flows, counts
+        names = flows.dtype.names
+        key = np.zeros(len(flows), dtype="u8")
+        for field in names:
+            key = (key ^ flows[field].astype("u8")) * np.uint64(0x9e3779b97f4a7c15)
+            key ^= key >> np.uint64(29)
+        order = np.argsort(key)
+        key = key[order]
+        # (structured arrays are selected with take and compress, much faster than with indexing)
+        flows = np.take(flows, order)
+        first = np.ones(len(flows), dtype=bool)
+        first[1:] = key[1:] != key[:-1]
+        # Hash collisions: different flow tuples with the same hash
+        if any(((flows[field][1:] != flows[field][:-1]) & ~first[1:]).any() for field in names):
+            resort = np.lexsort([flows[field] for field in reversed(names)])
+            order = order[resort]
+            flows = np.take(flows, resort)
+            first[1:] = False
+            for field in names:
+                first[1:] |= flows[field][1:] != flows[field][:-1]
+        groups = np.cumsum(first) - 1
+        return np.compress(first, flows), np.bincount(groups, weights=counts[order]).astype("u8")
+
+
+    def match(self, flows: np.ndarray, counts: np.ndarray, skipped: int = 0) -> dict:
+        """
+        Match captured flow tuples against the single policies.
+        Identical flow tuples are merged first, such that each distinct flow is matched once.
+
+        :param flows: flow tuples array (see FlowReader)
+        :param counts: packet count of each flow tuple
+        :param skipped: number of packets skipped when reading the capture
+        :return: dictionary containing the matching result
+        """
+        packets = int(counts.sum())
+        directions = self.flow_directions(flows)
+        foreign = directions == self.FOREIGN
+        foreign_packets = int(counts[foreign].sum())
+        flows, counts = self.merge_flows(np.compress(~foreign, flows), counts[~foreign])
+        # Contiguous columns are faster to compare than structured array fields
+        columns = {field: np.ascontiguousarray(flows[field]) for field in flows.dtype.names}
+        directions = self.flow_directions(columns)
+
+        # Match each policy's rules (the rule table is sorted by policy)
+        matched = np.zeros(len(flows), dtype=bool)
+        hits = {}
+        boundaries = np.flatnonzero(np.diff(self.rules["policy"])) + 1
+        for policy_rules in np.split(self.rules, boundaries) if len(self.rules) else []:
+            policy_matched = np.zeros(len(flows), dtype=bool)
+            for rule in policy_rules:
+                policy_matched |= self.match_rule(rule, columns, directions)
+            matched |= policy_matched
+            hits[self.names[policy_rules[0]["policy"]]] = {
+                "flows": int(policy_matched.sum()),
+                "packets": int(counts[policy_matched].sum())
+            }
+
+        # Unmatched flows, by decreasing packet count
+        unmatched = np.flatnonzero(~matched)
+        unmatched = unmatched[np.argsort(counts[unmatched], kind="stable")[::-1]]
+        matched_packets = int(counts[matched].sum())
+        device_packets = packets - foreign_packets
+        skipped_policies = dict(self.skipped)
+        self.result = {
+            "packets": packets,
+            "skipped-packets": skipped,
+            "foreign-packets": foreign_packets,
+            "flows": len(flows),
+            "matched-flows": int(matched.sum()),
+            "matched-packets": matched_packets,
+            "coverage": round(matched_packets / device_packets, 4) if device_packets else 0.0,
+            "single-policies": {name: hits.get(name, {"flows": 0, "packets": 0}) for name in self.names if name not in skipped_policies},
+            "skipped-policies": skipped_policies,
+            "unmatched-flows": [self.format_flow(flows[i], directions[i], counts[i]) for i in unmatched[:self.max_unmatched]]
+        }
+        return self.result
+
+
+    def match_capture(self, path: str) -> dict:
+        """
+        Read a capture file (pcap or CSV), and match its flows against the single policies.
+
+        :param path: capture file path
+        :return: dictionary containing the matching result
+        :raises ValueError: invalid or unsupported capture file
+        """
+        flows, counts, skipped = FlowReader.read(path)
+        result = {"capture": path}
+        result.update(self.match(flows, counts, skipped))
+        self.result = result
+        return result
+
+
+    def format_flow(self, flow: np.void, direction: int, count: int) -> dict:
+        """
+        Format a flow tuple for the matching result.
+
+        :param flow: flow tuple
+        :param direction: flow direction
+        :param count: packet count
+        :return: flow dictionary
+        """
+        family = int(flow["family"])
+        formatted = {}
+        if direction in self.direction_names:
+            formatted["direction"] = self.direction_names[direction]
+        formatted["protocol"] = int(flow["proto"])
+        formatted["src"] = FlowReader.format_address(family, flow["src_hi"], flow["src_lo"])
+        formatted["dst"] = FlowReader.format_address(family, flow["dst_hi"], flow["dst_lo"])
+        if int(flow["proto"]) in FlowReader.PORT_PROTOCOLS:
+            formatted["src-port"] = int(flow["sport"])
+            formatted["dst-port"] = int(flow["dport"])
+        if flow["type"] >= 0:
+            formatted["type"] = int(flow["type"])
+        formatted["packets"] = int(count)
+        return formatted
+
+
+    def report(self) -> str:
+        """
+        Get a report of the matching result.
+
+        :return: human-readable matching report
+        """
+        result = self.result
+        device_packets = result["packets"] - result["foreign-packets"]
+        hit = sum(1 for hits in result["single-policies"].values() if hits["flows"])
+        return (f"{result['matched-packets']} of {device_packets} packets ({100 * result['coverage']:.1f}%) "
+                f"matched by {hit} of {len(result['single-policies'])} single policies, "
+                f"{result['flows'] - result['matched-flows']} unmatched flows")
@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import json
+import hashlib
+from parsers.ir.Record import Record
+
+
+class ProfileDiff:
+    """
+    Differential output: compare a translated profile with a previous translation,
+    and build a compact change set, to apply incremental rule updates:
+        - single policies added, removed and modified, keyed by ACE name,
+        - device information changes,
+        - stable content hash of each current single policy.
+    A policy's hash only depends on its content (not on its name, nor on the key order),
+    and is the same across runs and translator processes.
+    A reference to a shared library policy (see PolicyLibrary) has the hash of the referenced policy,
+    i.e. its library ID, such that interning a policy does not modify it.
+    """
+
+    # Number of hexadecimal digits of the policy hashes (64 bits)
+    HASH_LENGTH = 16
+
+    # Single policy field referencing a library policy, by its hash
+    REFERENCE = "library"
+
+
+    @staticmethod
+    def policy_hash(policy: dict) -> str:
+        """
+        Compute the stable content hash of a single policy.
+
+        :param policy: policy dictionary
+        :return: hexadecimal hash
+        """
+        canonical = json.dumps(policy, sort_keys=True, separators=(",", ":"), default=Record.json_default)
+        return hashlib.sha256(canonical.encode()).hexdigest()[:ProfileDiff.HASH_LENGTH]
+
+
+    @classmethod
+    def content_hash(c, policy: dict) -> str:
+        """
+        Get the content hash of a single policy, or of the library policy it references.
+
+        :param policy: policy dictionary, or library reference
+        :return: hexadecimal hash
+        """
+        if c.REFERENCE in policy:
+            return str(policy[c.REFERENCE])
+        return c.policy_hash(policy)
+
+
+    @staticmethod
+    def load(path: str) -> dict:
+        """
+        Load a translated profile from a file,
+        in any of the translated profile formats: YAML, compact JSON, or binary.
+
+        :param path: translated profile file path
+        :return: dictionary containing the translated profile
+        :raises ValueError: the file is not a translated profile
+        """
+        from writers.BinaryWriter import BinaryWriter
+        with open(path, "rb") as profile_file:
+            document = profile_file.read()
+        if document.startswith(BinaryWriter.MAGIC):
+            from writers.BinaryProfile import BinaryProfile
+            profile = BinaryProfile(document).to_dict()
+        elif document.startswith(b"{"):
+            profile = json.loads(document)
+        else:
+            import yaml
+            Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+            profile = yaml.load(document, Loader=Loader)
+        if not isinstance(profile, dict) or not isinstance(profile.get("single-policies", None), dict):
+            raise ValueError(f"Not a translated profile: {path}")
+        return profile
+
+
+    def __init__(self, previous: dict) -> None:
+        """
+        Constructor for the ProfileDiff class.
+
+        :param previous: dictionary containing the previous translated profile
+        """
+        self.previous = previous
+        self.previous_hashes = {name: self.content_hash(policy) for name, policy in previous["single-policies"].items()}
+        self.changes = None
+
+
+    def diff(self, current: dict) -> dict:
+        """
+        Build the change set from the previous translated profile to the current one.
+
+        :param current: dictionary containing the current translated profile
+        :return: change set, as a dict
+        """
+        changes = {
+            "added": {},
+            "removed": {},
+            "modified": {},
+            "hashes": {}
+        }
+        previous_policies = self.previous["single-policies"]
+        current_policies = current["single-policies"]
+        unchanged = 0
+        for name, policy in current_policies.items():
+            hash = self.content_hash(policy)
+            changes["hashes"][name] = hash
+            previous_hash = self.previous_hashes.get(name, None)
+            if previous_hash is None:
+                changes["added"][name] = {"hash": hash, "policy": policy}
+            elif previous_hash != hash:
+                changes["modified"][name] = {"previous-hash": previous_hash, "hash": hash, "policy": policy}
+            else:
+                unchanged += 1
+        for name in previous_policies:
+            if name not in current_policies:
+                changes["removed"][name] = {"hash": self.previous_hashes[name]}
+
+        # Device information changes
+        previous_info = self.previous.get("device-info", {})
+        current_info = current.get("device-info", {})
+        if previous_info != current_info:
+            changes["device-info"] = {"previous": previous_info, "current": current_info}
+
+        changes["summary"] = {
+            "added": len(changes["added"]),
+            "removed": len(changes["removed"]),
+            "modified": len(changes["modified"]),
+            "unchanged": unchanged,
+            "device-info": "device-info" in changes
+        }
+        self.changes = changes
+        return changes
+
+
+    def report(self) -> str:
+        """
+        Get a report of the change set.
+
+        :return: human-readable change set report
+        """
+        summary = self.changes["summary"]
+        report = (f"{summary['added']} added, {summary['removed']} removed, "
+                  f"{summary['modified']} modified, {summary['unchanged']} unchanged single policies")
+        if summary["device-info"]:
+            report += ", device information changed"
+        return report
@@ -0,0 +1,302 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import os
+import glob
+import time
+from argparse import Namespace
+from parsers.mud.MudParser import MudParser
+from translator.MudFetcher import MudFetcher
+from translator.TranslationCache import TranslationCache
+
+
+class BatchTranslator:
+    """
+    Translate a batch of MUD files (files, directories, glob patterns or URLs),
+    spreading the work over a pool of processes.
+    """
+
+    # Supported MUD file extensions
+    extensions = (".json", ".xml")
+
+    # Translated profile extensions, ending with a MUD file extension, not to be translated again
+    excluded_extensions = (".profile.json",)
+
+    # Characters denoting a glob pattern
+    glob_chars = "*?["
+
+
+    @classmethod
+    def is_batch(c, inputs: list) -> bool:
+        """
+        Check if the given inputs require the batch mode,
+        i.e. if there are multiple inputs, or if the single input is a directory, a glob pattern or a URL.
+
+        :param inputs: list of input paths given on the command line
+        :return: True if the batch mode must be used, False otherwise
+        """
+        if len(inputs) != 1:
+            return True
+        input = inputs[0]
+        return os.path.isdir(input) or any(char in input for char in c.glob_chars) or MudFetcher.is_url(input)
+
+
+    @staticmethod
+    def translate_file(args: Namespace) -> tuple:
+        """
+        Translate a single MUD file.
+        Runs in a worker process, any error is caught and returned,
+        such that a faulty file does not interrupt the batch.
+
+        :param args: arguments for the MUD file parser
+        :return: tuple (input file, output file, error message or None, elapsed time in seconds)
+        """
+        start = time.perf_counter()
+        error = None
+        try:
+            mud_parser = MudParser.init_parser(args)
+            mud_parser.parse()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        return (args.input, args.output, error, time.perf_counter() - start)
+
+
+    def __init__(self, args: Namespace) -> None:
+        """
+        Constructor for the BatchTranslator class.
+
+        :param args: command line arguments
+        """
+        self.inputs = [input for input in args.input if not MudFetcher.is_url(input)]
+        # The same URL is fetched once
+        self.urls = list(dict.fromkeys(input for input in args.input if MudFetcher.is_url(input)))
+        self.output_dir = args.output
+        self.jobs = args.jobs if args.jobs is not None else os.cpu_count()
+        self.args = args
+
+
+    @classmethod
+    def glob_root(c, pattern: str) -> str:
+        """
+        Get the root directory of a glob pattern,
+        i.e. its leading path components without wildcards.
+
+        :param pattern: glob pattern
+        :return: root directory of the glob pattern
+        """
+        components = []
+        for component in pattern.split(os.sep)[:-1]:
+            if any(char in component for char in c.glob_chars):
+                break
+            components.append(component)
+        if not components:
+            return "."
+        return os.sep.join(components) or os.sep
+
+
+    def expand_inputs(self) -> list:
+        """
+        Expand the input paths into the list of MUD files to translate.
+        Directories are walked recursively, and glob patterns are expanded.
+        Files are sorted, to ensure a deterministic order.
+
+        :return: list of tuples (input file path, path relative to the given input)
+        """
+        files = []
+        for input in self.inputs:
+            if os.path.isdir(input):
+                # Directory: walk recursively
+                for dirpath, dirnames, filenames in os.walk(input):
+                    dirnames.sort()
+                    for filename in sorted(filenames):
+                        if filename.endswith(self.extensions) and not filename.endswith(self.excluded_extensions):
+                            path = os.path.join(dirpath, filename)
+                            files.append((path, os.path.relpath(path, input)))
+            elif any(char in input for char in self.glob_chars):
+                # Glob pattern: paths relative to the pattern's leading directories without wildcards
+                root = self.glob_root(input)
+                for path in sorted(glob.glob(input, recursive=True)):
+                    if os.path.isfile(path) and path.endswith(self.extensions) and not path.endswith(self.excluded_extensions):
+                        files.append((path, os.path.relpath(path, root)))
+            else:
+                # Single file
+                files.append((input, os.path.basename(input)))
+
+        # Remove duplicates, while keeping the order
+        unique_files = []
+        seen = set()
+        for path, relative_path in files:
+            if path not in seen:
+                seen.add(path)
+                unique_files.append((path, relative_path))
+        return unique_files
+
+
+    def fetch_urls(self) -> tuple:
+        """
+        Fetch the MUD files given by URL.
+
+        :return: tuple (list of tuples (fetched MUD file path, MUD file name), list of failed fetch results)
+        """
+        if not self.urls:
+            return [], []
+        cache_dir = self.args.cache_dir if self.args.cache_dir is not None else TranslationCache.default_dir
+        fetcher = MudFetcher(os.path.join(cache_dir, "profiles"), self.args.jobs)
+        fetched = []
+        failures = []
+        for url, path, error in fetcher.fetch_all(self.urls):
+            if error is None:
+                fetched.append((path, fetcher.output_name(url, path)))
+            else:
+                failures.append((url, None, error, 0.0))
+        return fetched, failures
+
+
+    def output_path(self, input: str, relative_path: str, fetched: bool = False) -> str:
+        """
+        Compute the output file path for a given input MUD file.
+        Uses the same naming rule as the single file mode,
+        relative to the output directory if one was given.
+        Fetched MUD files are translated in the output directory, or the current directory.
+
+        :param input: input MUD file path
+        :param relative_path: input MUD file path, relative to the given input
+        :param fetched: whether the MUD file was fetched by URL
+        :return: output file path
+        """
+        format = getattr(self.args, "format", None) or "yaml"
+        if self.output_dir is None and not fetched:
+            return MudParser.default_output(input, format)
+        return os.path.join(self.output_dir or ".", MudParser.default_output(relative_path, format))
+
+
+    def build_task(self, input: str, relative_path: str, fetched: bool = False) -> Namespace:
+        """
+        Build the arguments to translate a MUD file.
+
+        :param input: input MUD file path
+        :param relative_path: input MUD file path, relative to the given input
+        :param fetched: whether the MUD file was fetched by URL
+        :return: argument namespace
+        """
+        task = Namespace(**vars(self.args))
+        task.input = input
+        task.output = self.output_path(input, relative_path, fetched)
+        return task
+
+
+    def build_tasks(self, fetched: list) -> list:
+        """
+        Build the arguments for each MUD file to translate.
+
+        :param fetched: list of tuples (fetched MUD file path, MUD file name)
+        :return: list of argument namespaces, one per MUD file
+        """
+        files = [(input, relative_path, False) for input, relative_path in self.expand_inputs()]
+        files += [(input, relative_path, True) for input, relative_path in fetched]
+        return [self.build_task(input, relative_path, is_fetched) for input, relative_path, is_fetched in files]
+
+
+    def check_collisions(self, tasks: list) -> tuple:
+        """
+        Check that no two MUD files are translated to the same output file,
+        as they would overwrite each other.
+
+        :param tasks: list of argument namespaces, one per MUD file
+        :return: tuple (list of argument namespaces without colliding output files,
+                 list of failed results of the MUD files with colliding output files)
+        """
+        inputs = {}
+        for task in tasks:
+            inputs.setdefault(os.path.abspath(task.output), []).append(task.input)
+        valid_tasks = []
+        failures = []
+        for task in tasks:
+            colliding = inputs[os.path.abspath(task.output)]
+            if len(colliding) == 1:
+                valid_tasks.append(task)
+            else:
+                others = ", ".join(input for input in colliding if input != task.input)
+                failures.append((task.input, task.output, f"Output file {task.output} collides with the output of {others}", 0.0))
+        return valid_tasks, failures
+
+
+    def translate_tasks(self, tasks: list) -> list:
+        """
+        Translate MUD files, spreading them over a pool of processes if there are several.
+
+        :param tasks: list of argument namespaces, one per MUD file
+        :return: list of tuples (input file, output file, error message or None, elapsed time in seconds)
+        """
+        # Create output directories
+        for task in tasks:
+            output_dir = os.path.dirname(task.output)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+
+        if self.jobs <= 1 or len(tasks) <= 1:
+            # Single process: no need for a pool
+            return [self.translate_file(task) for task in tasks]
+        # Spread files over a pool of processes
+        from concurrent.futures import ProcessPoolExecutor
+        chunksize = max(1, len(tasks) // (self.jobs * 4))
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            return list(executor.map(self.translate_file, tasks, chunksize=chunksize))
+
+
+    def run(self) -> list:
+        """
+        Translate all MUD files, and print a summary report.
+
+        :return: list of tuples (input file, output file, error message or None, elapsed time in seconds)
+        """
+        start = time.perf_counter()
+        fetched, failures = self.fetch_urls()
+        tasks, collisions = self.check_collisions(self.build_tasks(fetched))
+        failures += collisions
+        results = self.translate_tasks(tasks)
+        if getattr(self.args, "library", None) is not None:
+            self.write_library([output for _, output, error, _ in results if error is None])
+        results += failures
+
+        self.report(results, time.perf_counter() - start)
+        return results
+
+
+    def write_library(self, outputs: list) -> None:
+        """
+        Intern the single policies shared by the translated profiles into the policy library file,
+        and rewrite the translated profiles with references to the library.
+
+        :param outputs: output files of the translated profiles
+        """
+        from passes.ProfileDiff import ProfileDiff
+        from passes.PolicyLibrary import PolicyLibrary
+        library = PolicyLibrary()
+        profiles = [ProfileDiff.load(output) for output in outputs]
+        for profile in profiles:
+            library.add_profile(profile)
+        size = sum(os.path.getsize(output) for output in outputs)
+        writer = MudParser(Namespace(input=None, output=None, mac=None, ipv4=None, ipv6=None, network=None, format=self.args.format))
+        for output, profile in zip(outputs, profiles):
+            writer.output = output
+            writer.write_output(library.intern(profile))
+        writer.output = self.args.library
+        writer.write_output(library.library())
+        interned_size = sum(os.path.getsize(output) for output in outputs + [self.args.library])
+        print(f"{self.args.library}: {library.report()}, {size} to {interned_size} bytes")
+
+
+    def report(self, results: list, elapsed: float) -> None:
+        """
+        Print a summary report of the batch translation.
+
+        :param results: list of tuples (input file, output file, error message or None, elapsed time in seconds)
+        :param elapsed: total elapsed time in seconds
+        """
+        failures = [(input, error) for input, _, error, _ in results if error is not None]
+        rate = len(results) / elapsed if elapsed > 0 else 0.0
+        print(f"Translated {len(results) - len(failures)}/{len(results)} MUD files "
+              f"in {elapsed:.2f} s ({rate:.1f} files/s), {len(failures)} failed")
+        for input, error in failures:
+            print(f"  {input}: {error}")
@@ -0,0 +1,170 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import os
+import re
+import csv
+import sys
+import json
+import time
+import ipaddress
+from argparse import Namespace
+from parsers.mud.MudParser import MudParser
+
+
+class FleetTranslator:
+    """
+    Translate a MUD file once for a fleet of identical devices, listed in a device inventory.
+    The single policies are translated and serialized once,
+    and only the device information is stamped for each device,
+    such that the cost scales with the number of devices, not with devices × ACEs.
+    The profiles are written either to one file per device, in an output directory,
+    or to a single multi-document YAML stream, if the output is a YAML file.
+    """
+
+    # Inventory fields describing a device
+    fields = ["name", "mac", "ipv4", "ipv6", "network"]
+
+    # YAML file extensions, denoting a multi-document output
+    yaml_extensions = (".yaml", ".yml")
+
+    # YAML document separator, in a multi-document stream
+    SEPARATOR = "---\n"
+
+    # Characters replaced in output file names
+    unsafe_chars = re.compile(r"[^A-Za-z0-9._-]")
+
+
+    @classmethod
+    def read_inventory(c, path: str) -> list:
+        """
+        Read a device inventory, either CSV with a header row,
+        or JSON lines (one JSON object per line, if the file name ends with ".jsonl").
+        Fields other than name, mac, ipv4, ipv6 and network are ignored, empty fields are unset.
+
+        :param path: inventory file path
+        :return: list of device dicts
+        :raises ValueError: invalid device in the inventory
+        """
+        devices = []
+        with open(path, "r", newline="") as inventory_file:
+            if path.endswith(".jsonl"):
+                rows = ((i, json.loads(line)) for i, line in enumerate(inventory_file, start=1) if line.strip())
+            else:
+                # Line 1 is the header row
+                rows = enumerate(csv.DictReader(inventory_file), start=2)
+            for line, row in rows:
+                device = {}
+                for field in c.fields:
+                    value = row.get(field, None)
+                    device[field] = None if value is None else str(value).strip() or None
+                try:
+                    MudParser.check_device(device["mac"], device["ipv4"], device["ipv6"], device["network"])
+                except ValueError as e:
+                    raise ValueError(f"{path}, line {line}: {e}")
+                devices.append(device)
+        return devices
+
+
+    def __init__(self, args: Namespace) -> None:
+        """
+        Constructor for the FleetTranslator class.
+
+        :param args: command line arguments
+        """
+        self.input = args.input
+        self.inventory = args.inventory
+        self.output = args.output if args.output is not None else MudParser.default_output(args.input)
+        self.multi_document = self.output.endswith(self.yaml_extensions)
+        self.args = args
+
+
+    def output_name(self, index: int, device: dict) -> str:
+        """
+        Compute the output YAML file name of a device:
+        its name if given in the inventory, otherwise its MAC address, or else its index.
+
+        :param index: index of the device in the inventory
+        :param device: device dict
+        :return: output YAML file name
+        """
+        name = device["name"] or device["mac"] or f"device-{index}"
+        return self.unsafe_chars.sub("_", name) + ".yaml"
+
+
+    def run(self) -> int:
+        """
+        Translate the MUD file, and write the profiles of all devices of the inventory.
+
+        :return: number of written profiles
+        :raises ValueError: invalid inventory, or duplicate output file names
+        """
+        start = time.perf_counter()
+        devices = self.read_inventory(self.inventory)
+        if not self.multi_document:
+            names = [self.output_name(i, device) for i, device in enumerate(devices)]
+            if len(set(names)) < len(names):
+                raise ValueError(f"{self.inventory}: duplicate device names")
+
+        # Translate and serialize the single policies once, without device information
+        args = Namespace(**vars(self.args))
+        args.output = None
+        args.mac = args.ipv4 = args.ipv6 = args.network = None
+        mud_parser = MudParser.init_parser(args)
+        profile = mud_parser.translate()
+        # Device information only depends on the MUD container's systeminfo
+        mud_data = {"systeminfo": profile["device-info"]["name"]}
+
+        with mud_parser.stage("write"):
+            policies = MudParser.dump({"single-policies": profile["single-policies"]})
+            del profile
+            # Stamp the device information of each device
+            if self.multi_document:
+                output_dir = os.path.dirname(self.output)
+                if output_dir:
+                    os.makedirs(output_dir, exist_ok=True)
+                with open(self.output, "w") as yaml_file:
+                    for i, device in enumerate(devices):
+                        if i > 0:
+                            yaml_file.write(self.SEPARATOR)
+                        self.write_profile(yaml_file, mud_parser, mud_data, device, policies)
+            else:
+                os.makedirs(self.output, exist_ok=True)
+                for name, device in zip(names, devices):
+                    with open(os.path.join(self.output, name), "w") as yaml_file:
+                        self.write_profile(yaml_file, mud_parser, mud_data, device, policies)
+        mud_parser.finish_stats()
+
+        # Report aggregation, unresolved domain names, and overlapping network matches
+        if mud_parser.aggregator is not None:
+            print(f"{self.input}: {mud_parser.aggregator.report()}", file=sys.stderr)
+        if mud_parser.resolver is not None:
+            for domain_name, error in mud_parser.resolver.failures:
+                print(f"{self.input}: could not resolve {domain_name}: {error}", file=sys.stderr)
+        if mud_parser.report_overlaps:
+            mud_parser.print_overlaps()
+
+        elapsed = time.perf_counter() - start
+        print(f"Translated {self.input} for {len(devices)} devices in {elapsed:.2f} s")
+        return len(devices)
+
+
+    @staticmethod
+    def write_profile(yaml_file: object, mud_parser: MudParser, mud_data: dict, device: dict, policies: str) -> None:
+        """
+        Write the profile of a device,
+        byte-for-byte identical to the profile translated with the device's options.
+
+        :param yaml_file: text stream to write the profile to
+        :param mud_parser: parser which translated the single policies
+        :param mud_data: dict containing the MUD container's systeminfo
+        :param device: device dict
+        :param policies: serialized single policies
+        """
+        # IP addresses are written normalized, as given by the command line options
+        mud_parser.mac = device["mac"]
+        mud_parser.ipv4 = None if device["ipv4"] is None else ipaddress.ip_address(device["ipv4"])
+        mud_parser.ipv6 = None if device["ipv6"] is None else ipaddress.ip_address(device["ipv6"])
+        mud_parser.network = device["network"]
+        MudParser.dump({"device-info": mud_parser.device_info(mud_data)}, yaml_file)
+        yaml_file.write(policies)
@@ -0,0 +1,321 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import os
+import json
+import time
+import hashlib
+import threading
+import http.client
+from argparse import Namespace
+from parsers.mud.MudParser import MudParser
+
+
+class MudFetcher:
+    """
+    MUD file fetcher.
+    Fetches MUD files by URL over a pool of keep-alive connections,
+    and caches them on disk.
+    A cached MUD file is not fetched again until its cache-validity period expires,
+    after which a conditional request is used.
+    """
+
+    # Default cache validity, in hours (RFC 8520)
+    default_cache_validity = 48
+    # Bounds of the cache validity, in hours (RFC 8520)
+    min_cache_validity = 1
+    max_cache_validity = 168
+
+    # Default number of concurrent fetches
+    default_jobs = 8
+
+    # Connection timeout, in seconds
+    timeout = 30
+
+    # Maximum number of redirections to follow
+    max_redirects = 5
+
+    # MUD file extensions, per format
+    extensions = {
+        MudParser.Format.JSON: ".json",
+        MudParser.Format.XML: ".xml"
+    }
+
+
+    class ConnectionPool:
+        """
+        Thread-safe pool of keep-alive HTTP(S) connections, per host.
+        """
+
+        def __init__(self, timeout: float) -> None:
+            """
+            Constructor for the ConnectionPool class.
+
+            :param timeout: connection timeout, in seconds
+            """
+            self.timeout = timeout
+            self.lock = threading.Lock()
+            self.idle = {}  # Mapping between (scheme, host, port) and idle connections
+
+
+        def get(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+            """
+            Get a connection to a host, reusing an idle one if possible.
+
+            :param scheme: URL scheme ("http" or "https")
+            :param netloc: URL network location ("host[:port]")
+            :return: HTTP(S) connection
+            """
+            with self.lock:
+                connections = self.idle.get((scheme, netloc), [])
+                if connections:
+                    return connections.pop()
+            if scheme == "https":
+                return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+            return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+
+        def put(self, scheme: str, netloc: str, connection: http.client.HTTPConnection) -> None:
+            """
+            Give back a connection to the pool, for later reuse.
+
+            :param scheme: URL scheme ("http" or "https")
+            :param netloc: URL network location ("host[:port]")
+            :param connection: HTTP(S) connection
+            """
+            with self.lock:
+                self.idle.setdefault((scheme, netloc), []).append(connection)
+
+
+        def close(self) -> None:
+            """
+            Close all idle connections.
+            """
+            with self.lock:
+                for connections in self.idle.values():
+                    for connection in connections:
+                        connection.close()
+                self.idle = {}
+
+
+    @staticmethod
+    def is_url(input: str) -> bool:
+        """
+        Check if an input is a MUD URL.
+
+        :param input: input given on the command line
+        :return: True if the input is an HTTP(S) URL, False otherwise
+        """
+        return input.startswith(("http://", "https://"))
+
+
+    def __init__(self, directory: str, jobs: int = None) -> None:
+        """
+        Constructor for the MudFetcher class.
+
+        :param directory: directory of the fetched MUD files cache
+        :param jobs: maximum number of concurrent fetches
+        """
+        self.directory = directory
+        self.jobs = jobs if jobs is not None else self.default_jobs
+        self.pool = self.ConnectionPool(self.timeout)
+
+
+    def cache_paths(self, url: str) -> tuple:
+        """
+        Get the paths of the cache files of a MUD URL.
+
+        :param url: MUD URL
+        :return: tuple (path prefix of the cached MUD file, path of its metadata file)
+        """
+        prefix = os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest())
+        return prefix, f"{prefix}.meta"
+
+
+    def read_metadata(self, url: str) -> dict:
+        """
+        Read the cache metadata of a MUD URL.
+
+        :param url: MUD URL
+        :return: dict containing the cache metadata, or None if the MUD file is not cached
+        """
+        _, meta_path = self.cache_paths(url)
+        try:
+            with open(meta_path, "r") as meta_file:
+                metadata = json.load(meta_file)
+        except (FileNotFoundError, ValueError):
+            return None
+        if not os.path.exists(metadata["path"]):
+            return None
+        return metadata
+
+
+    def write_metadata(self, url: str, metadata: dict) -> None:
+        """
+        Write the cache metadata of a MUD URL, atomically.
+
+        :param url: MUD URL
+        :param metadata: dict containing the cache metadata
+        """
+        _, meta_path = self.cache_paths(url)
+        tmp_path = f"{meta_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as meta_file:
+            json.dump(metadata, meta_file)
+        os.replace(tmp_path, meta_path)
+
+
+    def cache_validity(self, path: str, format: MudParser.Format) -> int:
+        """
+        Read the cache validity of a fetched MUD file, from its MUD container.
+
+        :param path: path of the fetched MUD file
+        :param format: format of the fetched MUD file
+        :return: cache validity, in hours
+        """
+        args = Namespace(input=path, output=None, mac=None, ipv4=None, ipv6=None, network=None)
+        try:
+            mud_data = MudParser.init_parser(args, format).read_mud()
+            cache_validity = int(mud_data.get("cache-validity", self.default_cache_validity))
+        except (KeyError, ValueError, TypeError):
+            cache_validity = self.default_cache_validity
+        return min(max(cache_validity, self.min_cache_validity), self.max_cache_validity)
+
+
+    def request(self, url: str, headers: dict) -> tuple:
+        """
+        Send a GET request, over a pooled connection, following redirections.
+
+        :param url: URL to request
+        :param headers: request headers
+        :return: tuple (response status, response headers, response body)
+        :raises ValueError: too many redirections
+        """
+        from urllib.parse import urlsplit, urljoin
+        for _ in range(self.max_redirects + 1):
+            split_url = urlsplit(url)
+            path = split_url.path or "/"
+            if split_url.query:
+                path = f"{path}?{split_url.query}"
+
+            # Try an idle connection first, then a fresh one if it was closed by the server
+            for attempt in range(2):
+                connection = self.pool.get(split_url.scheme, split_url.netloc)
+                try:
+                    connection.request("GET", path, headers=headers)
+                    response = connection.getresponse()
+                    body = response.read()
+                    break
+                except (http.client.HTTPException, ConnectionError):
+                    connection.close()
+                    if attempt == 1:
+                        raise
+            if response.will_close:
+                connection.close()
+            else:
+                self.pool.put(split_url.scheme, split_url.netloc, connection)
+
+            if response.status in (301, 302, 303, 307, 308):
+                url = urljoin(url, response.getheader("Location"))
+                continue
+            return response.status, response, body
+
+        raise ValueError(f"Too many redirections for {url}")
+
+
+    def fetch(self, url: str) -> str:
+        """
+        Fetch a MUD file, unless its cached copy is still valid.
+
+        :param url: MUD URL
+        :return: path of the fetched MUD file
+        :raises ValueError: fetch failed, or unrecognized MUD file format
+        """
+        metadata = self.read_metadata(url)
+
+        # Cached MUD file still valid: no request
+        now = time.time()
+        if metadata is not None and now < metadata["fetched"] + metadata["cache-validity"] * 3600:
+            return metadata["path"]
+
+        # Conditional request if the MUD file is cached
+        headers = {"Accept": "application/mud+json, application/json, application/xml;q=0.9"}
+        if metadata is not None:
+            if metadata.get("etag"):
+                headers["If-None-Match"] = metadata["etag"]
+            if metadata.get("last-modified"):
+                headers["If-Modified-Since"] = metadata["last-modified"]
+        status, response, body = self.request(url, headers)
+
+        # MUD file not modified: extend its validity
+        if status == 304 and metadata is not None:
+            metadata["fetched"] = now
+            self.write_metadata(url, metadata)
+            return metadata["path"]
+        if status != 200:
+            raise ValueError(f"Fetching {url} failed with HTTP status {status}")
+
+        # Store fetched MUD file
+        format = MudParser.sniff_format(body)
+        prefix, _ = self.cache_paths(url)
+        path = f"{prefix}{self.extensions[format]}"
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as mud_file:
+            mud_file.write(body)
+        os.replace(tmp_path, path)
+        metadata = {
+            "url": url,
+            "path": path,
+            "etag": response.getheader("ETag"),
+            "last-modified": response.getheader("Last-Modified"),
+            "fetched": now,
+            "cache-validity": self.cache_validity(path, format)
+        }
+        self.write_metadata(url, metadata)
+        return path
+
+
+    def fetch_all(self, urls: list) -> list:
+        """
+        Fetch MUD files concurrently.
+        Errors are caught, such that a failed fetch does not interrupt the others.
+
+        :param urls: list of MUD URLs
+        :return: list of tuples (MUD URL, path of the fetched MUD file or None, error message or None)
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        os.makedirs(self.directory, exist_ok=True)
+
+        def fetch_url(url: str) -> tuple:
+            try:
+                return url, self.fetch(url), None
+            except Exception as e:
+                return url, None, f"{type(e).__name__}: {e}"
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                return list(executor.map(fetch_url, urls))
+        finally:
+            self.pool.close()
+
+
+    def output_name(self, url: str, path: str) -> str:
+        """
+        Get the name of a fetched MUD file, used to name the output file, unique per URL:
+        host (and port) followed by the URL path segments, as a relative path,
+        with a short hash of the URL if it has a query, and the fetched MUD file extension.
+
+        :param url: MUD URL
+        :param path: path of the fetched MUD file
+        :return: name of the fetched MUD file, as a relative path
+        """
+        from urllib.parse import urlsplit, unquote
+        split_url = urlsplit(url)
+        # Segments which could escape the output directory are dropped
+        segments = [split_url.netloc.replace(":", "_")]
+        segments += [segment for segment in unquote(split_url.path).split("/") if segment not in ("", ".", "..")]
+        name = os.path.join(*segments)
+        if len(segments) > 1:
+            name = os.path.splitext(name)[0]
+        if split_url.query:
+            name = f"{name}-{hashlib.sha256(url.encode()).hexdigest()[:8]}"
+        return f"{name}{os.path.splitext(path)[1]}"
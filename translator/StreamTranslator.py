@@ -0,0 +1,235 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import io
+import os
+import sys
+import time
+from argparse import Namespace
+from collections.abc import Iterator
+from xml.parsers import expat
+from parsers.mud.MudParser import MudParser
+
+
+class StreamTranslator:
+    """
+    Pipeline mode: translate a stream of MUD documents read from the standard input,
+    each one as soon as it is complete, and write the translated profiles to the standard output
+    (or an output file), flushed after each document:
+        - the input stream is a sequence of JSON MUD documents, one per line (NDJSON),
+          and/or of concatenated XML MUD documents, the format of each document being sniffed from its first character,
+        - the translated profiles are written as YAML documents, separated by "---",
+          or as JSON lines with the json output format.
+    Only the current document is held in memory, such that memory use does not grow with the stream.
+    A document which fails to translate is reported, and skipped.
+    """
+
+    # Input name, and standard output name, on the command line
+    STDIN = "-"
+    STDOUT = "-"
+
+    # Supported output formats
+    output_formats = ("yaml", "json")
+
+    # Size of the chunks read from the input stream, in bytes
+    chunk_size = 64 * 1024
+
+    # Whitespace skipped between documents, including UTF-8 byte order marks
+    whitespace = b"\xef\xbb\xbf \t\r\n"
+
+
+    class DocumentEnd(Exception):
+        """
+        Raised by the XML splitter when the root element of an XML document is closed.
+        """
+        pass
+
+
+    def __init__(self, args: Namespace, input: object = None, output: object = None) -> None:
+        """
+        Constructor for the StreamTranslator class.
+
+        :param args: command line arguments
+        :param input: binary input stream (default: standard input)
+        :param output: binary output stream (default: standard output, or the output file given by the arguments)
+        """
+        self.args = args
+        self.format = getattr(args, "format", None) or "yaml"
+        self.input = input if input is not None else sys.stdin.buffer
+        self.output = output
+        # Input buffer, holding the current document, and whether the input stream is exhausted
+        self.buffer = bytearray()
+        self.eof = False
+
+
+    def fill(self) -> bool:
+        """
+        Read the next chunk of the input stream into the input buffer.
+
+        :return: False if the input stream is exhausted, True otherwise
+        """
+        if self.eof:
+            return False
+        read = getattr(self.input, "read1", self.input.read)
+        chunk = read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer += chunk
+        return True
+
+
+    def json_document(self) -> bytes:
+        """
+        Split the JSON document at the start of the input buffer, i.e. the current line.
+
+        :return: JSON document
+        """
+        end = self.buffer.find(b"\n")
+        while end < 0:
+            # Only search the newly read chunk
+            scanned = len(self.buffer)
+            if not self.fill():
+                break
+            end = self.buffer.find(b"\n", scanned)
+        if end < 0:
+            end = len(self.buffer)
+        document = bytes(self.buffer[:end])
+        del self.buffer[:end + 1]
+        return document
+
+
+    def xml_document(self) -> bytes:
+        """
+        Split the XML document at the start of the input buffer,
+        i.e. until its root element is closed, as found by an XML parser fed as the document arrives.
+
+        :return: XML document
+        :raises ValueError: the XML document is malformed or truncated
+        """
+        parser = expat.ParserCreate()
+        depth = 0
+        end = None
+        def start_element(name: str, attributes: dict) -> None:
+            nonlocal depth
+            depth += 1
+        def end_element(name: str) -> None:
+            nonlocal depth, end
+            depth -= 1
+            if depth == 0:
+                # The root element's end tag starts at the parser's current position
+                end = parser.CurrentByteIndex
+                raise self.DocumentEnd()
+        parser.StartElementHandler = start_element
+        parser.EndElementHandler = end_element
+
+        fed = 0
+        try:
+            while True:
+                parser.Parse(bytes(self.buffer[fed:]), False)
+                fed = len(self.buffer)
+                if not self.fill():
+                    parser.Parse(b"", True)
+                    raise ValueError("Truncated XML document")
+        except self.DocumentEnd:
+            end = self.buffer.index(b">", end) + 1
+        except expat.ExpatError as e:
+            raise ValueError(f"Malformed XML document: {e}")
+        document = bytes(self.buffer[:end])
+        del self.buffer[:end]
+        return document
+
+
+    def documents(self) -> Iterator[tuple]:
+        """
+        Split the input stream into MUD documents, as they arrive.
+        Undecodable input is reported as an error, in place of a document:
+        an unrecognized line is skipped, but the stream cannot be split after a malformed XML document.
+
+        :return: iterator over tuples (MUD document or None, error message or None)
+        """
+        while True:
+            # Skip whitespace between documents
+            start = len(self.buffer) - len(self.buffer.lstrip(self.whitespace))
+            del self.buffer[:start]
+            if not self.buffer:
+                if not self.fill():
+                    return
+                continue
+            if self.buffer[0] == ord("{"):
+                yield self.json_document(), None
+            elif self.buffer[0] == ord("<"):
+                try:
+                    yield self.xml_document(), None
+                except ValueError as e:
+                    yield None, str(e)
+                    return
+            else:
+                self.json_document()
+                yield None, "Unrecognized MUD document format"
+
+
+    def translate_document(self, document: bytes) -> bytes:
+        """
+        Translate a MUD document, its format being sniffed, and serialize the translated profile.
+
+        :param document: MUD document
+        :return: serialized translated profile, as a YAML document or a JSON line
+        :raises ValueError: unrecognized MUD document format, or invalid MUD document
+        """
+        args = Namespace(**vars(self.args))
+        args.input = io.BytesIO(document)
+        args.output = None
+        args.cache = None
+        mud_parser = MudParser.init_parser(args, MudParser.sniff_format(document))
+        profile = mud_parser.translate()
+        mud_parser.finish_stats()
+        if self.format == "json":
+            from writers.JsonWriter import JsonWriter
+            return JsonWriter.dumps(profile) + b"\n"
+        return b"---\n" + MudParser.dump(profile).encode()
+
+
+    def run(self) -> tuple:
+        """
+        Translate the MUD documents of the input stream, until it is exhausted,
+        and print a summary report on the standard error.
+        Only counters are kept, such that memory use does not grow with the stream.
+
+        :return: tuple (number of documents, number of failed documents)
+        """
+        start = time.perf_counter()
+        output = self.output
+        if output is None:
+            output_file = getattr(self.args, "output", None)
+            output = sys.stdout.buffer if output_file in (None, self.STDOUT) else open(output_file, "wb")
+        count = 0
+        failures = 0
+        try:
+            for number, (document, error) in enumerate(self.documents(), start=1):
+                count = number
+                if error is None:
+                    try:
+                        output.write(self.translate_document(document))
+                        output.flush()
+                    except (BrokenPipeError, KeyboardInterrupt):
+                        raise
+                    except Exception as e:
+                        error = f"{type(e).__name__}: {e}"
+                if error is not None:
+                    failures += 1
+                    print(f"<stdin>:{number}: {error}", file=sys.stderr)
+        except BrokenPipeError:
+            # Output consumer gone: stop, without failing again when flushing the standard output at exit
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if output is not sys.stdout.buffer and self.output is None:
+                output.close()
+
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed > 0 else 0.0
+        print(f"Translated {count - failures}/{count} MUD documents "
+              f"in {elapsed:.2f} s ({rate:.1f} documents/s), {failures} failed", file=sys.stderr)
+        return count, failures
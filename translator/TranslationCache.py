@@ -0,0 +1,210 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import os
+import json
+import time
+import hashlib
+
+
+class TranslationCache:
+    """
+    On-disk content-addressed cache of translated profiles.
+    Entries are keyed by a hash of the input MUD file contents,
+    the device options, the translator version, and the translator's sources,
+    such that any change to the translator invalidates the entries it translated,
+    and are evicted when unused for too long, or when the cache grows too large.
+    """
+
+    # Default cache directory
+    default_dir = os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+        "mud-translator"
+    )
+
+    # Default eviction thresholds
+    default_max_size = 256 * 1024 * 1024  # Maximum total size of the entries, in bytes
+    default_max_age = 30 * 24 * 3600      # Maximum time since last use of an entry, in seconds
+
+    # Minimum interval between two evictions, in seconds
+    eviction_interval = 60
+
+    # Name of the file marking the last eviction
+    EVICTION_STAMP = ".last-eviction"
+
+    # Translator's sources, relative to the repository root (or the zipapp's root): entry point and packages
+    sources = ["mud_translator.py", "parsers", "passes", "translator", "writers"]
+
+    # Repository root, or zipapp
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    # Hash of the translator's sources, computed once
+    _sources_digest = None
+
+
+    def __init__(self, directory: str = None, max_size: int = None, max_age: float = None) -> None:
+        """
+        Constructor for the TranslationCache class.
+
+        :param directory: cache directory (default: ~/.cache/mud-translator)
+        :param max_size: maximum total size of the entries, in bytes
+        :param max_age: maximum time since last use of an entry, in seconds
+        """
+        self.directory = directory if directory is not None else self.default_dir
+        self.max_size = max_size if max_size is not None else self.default_max_size
+        self.max_age = max_age if max_age is not None else self.default_max_age
+
+
+    @classmethod
+    def sources_digest(c) -> str:
+        """
+        Compute the hash of the translator's sources, read from the repository or from the zipapp,
+        such that the cache keys do not depend on a version number being bumped by hand.
+
+        :return: hash of the sources, as a hexadecimal string
+        """
+        if c._sources_digest is not None:
+            return c._sources_digest
+        digest = hashlib.sha256()
+        if os.path.isdir(c.root):
+            paths = []
+            for source in c.sources:
+                if source.endswith(".py"):
+                    paths.append(source)
+                    continue
+                for directory, directories, files in os.walk(os.path.join(c.root, source)):
+                    directories[:] = [name for name in directories if name != "__pycache__"]
+                    paths += [os.path.relpath(os.path.join(directory, name), c.root) for name in files if name.endswith(".py")]
+            for path in sorted(path.replace(os.sep, "/") for path in paths):
+                with open(os.path.join(c.root, path), "rb") as source_file:
+                    digest.update(path.encode() + b"\0" + source_file.read())
+        else:
+            import zipfile
+            with zipfile.ZipFile(c.root) as zipapp:
+                for path in sorted(zipapp.namelist()):
+                    if path.endswith(".py") and (path in c.sources or path.split("/", 1)[0] in c.sources):
+                        digest.update(path.encode() + b"\0" + zipapp.read(path))
+        c._sources_digest = digest.hexdigest()
+        return c._sources_digest
+
+
+    def key(self, mud_parser: object, version: str) -> str:
+        """
+        Compute the cache key of a translation.
+
+        :param mud_parser: MUD parser object, holding the input MUD file, the device options and the translation options
+        :param version: translator version
+        :return: cache key, as a hexadecimal string
+        """
+        digest = hashlib.sha256()
+        options = [
+            version,
+            self.sources_digest(),
+            mud_parser.mac,
+            None if mud_parser.ipv4 is None else str(mud_parser.ipv4),
+            None if mud_parser.ipv6 is None else str(mud_parser.ipv6),
+            mud_parser.network,
+            mud_parser.aggregator is not None,
+            getattr(mud_parser, "format", "yaml")
+        ]
+        digest.update(json.dumps(options).encode())
+        with open(mud_parser.input, "rb") as input_file:
+            for chunk in iter(lambda: input_file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+
+    def entry_path(self, key: str) -> str:
+        """
+        Get the path of a cache entry.
+
+        :param key: cache key
+        :return: path of the cache entry
+        """
+        return os.path.join(self.directory, key)
+
+
+    def get(self, key: str, output: str) -> bool:
+        """
+        Restore a translated profile from the cache, if present.
+
+        :param key: cache key
+        :param output: output file to restore the translated profile to
+        :return: True if the translated profile was restored, False otherwise
+        """
+        import shutil
+        entry = self.entry_path(key)
+        try:
+            if time.time() - os.path.getmtime(entry) > self.max_age:
+                # Entry expired
+                os.remove(entry)
+                return False
+            shutil.copyfile(entry, output)
+            # Mark entry as recently used
+            os.utime(entry)
+        except FileNotFoundError:
+            return False
+        return True
+
+
+    def put(self, key: str, output: str) -> None:
+        """
+        Store a translated profile in the cache.
+
+        :param key: cache key
+        :param output: output file containing the translated profile
+        """
+        import shutil
+        os.makedirs(self.directory, exist_ok=True)
+        entry = self.entry_path(key)
+        # Write to a temporary file first, such that concurrent readers never see a partial entry
+        tmp_entry = f"{entry}.{os.getpid()}.tmp"
+        shutil.copyfile(output, tmp_entry)
+        os.replace(tmp_entry, entry)
+        self.evict()
+
+
+    def evict(self, force: bool = False) -> int:
+        """
+        Evict the cache entries unused for too long,
+        then the least recently used entries until the cache is small enough.
+        Unless forced, eviction runs at most once per eviction interval.
+
+        :param force: run eviction regardless of the last eviction time
+        :return: number of evicted entries
+        """
+        stamp = os.path.join(self.directory, self.EVICTION_STAMP)
+        now = time.time()
+        try:
+            if not force and now - os.path.getmtime(stamp) < self.eviction_interval:
+                return 0
+        except FileNotFoundError:
+            pass
+        with open(stamp, "w"):
+            pass
+
+        # List entries
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(".") or entry.name.endswith(".tmp") or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        # Evict expired entries, then least recently used entries
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        evicted = 0
+        for mtime, size, path in entries:
+            if now - mtime <= self.max_age and total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                evicted += 1
+            except FileNotFoundError:
+                pass
+            total_size -= size
+        return evicted
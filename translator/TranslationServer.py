@@ -0,0 +1,392 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import os
+import sys
+import json
+import stat
+import time
+import errno
+import signal
+import socket
+import bisect
+import threading
+import socketserver
+from argparse import Namespace
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ProcessPoolExecutor
+from parsers.mud.MudParser import MudParser
+from parsers.protocols.Protocol import Protocol
+
+
+class TranslationServer:
+    """
+    Long-running translation server,
+    keeping the parsers loaded between translations.
+    Accepts translation requests over HTTP, on a Unix domain socket or on a localhost TCP port:
+        POST /translate?mac=...&ipv4=...&ipv6=...&network=...&format=yaml|json|bin|nft
+            with the MUD document (JSON or XML) as request body
+        GET /stats
+            request counters and latency histogram, as JSON
+    """
+
+    # Default maximum number of requests being processed at the same time,
+    # additional requests are rejected with status 503
+    default_max_pending = 64
+
+    # Maximum request body size, in bytes
+    max_body_size = 64 * 1024 * 1024
+
+    # Supported device options, as query parameters
+    device_options = ["mac", "ipv4", "ipv6", "network"]
+
+    # Supported output formats, and corresponding content types
+    content_types = {
+        "yaml": "application/yaml",
+        "json": "application/json",
+        "bin": "application/octet-stream",
+        "nft": "text/plain"
+    }
+
+
+    class LatencyHistogram:
+        """
+        Thread-safe histogram of request latencies.
+        """
+
+        # Upper bounds of the histogram buckets, in milliseconds
+        buckets = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+
+        def __init__(self) -> None:
+            """
+            Constructor for the LatencyHistogram class.
+            """
+            self.lock = threading.Lock()
+            self.counts = [0] * (len(self.buckets) + 1)  # Last bucket: above the highest bound
+            self.count = 0
+            self.total = 0.0
+
+
+        def observe(self, latency: float) -> None:
+            """
+            Record a request latency.
+
+            :param latency: request latency, in milliseconds
+            """
+            index = bisect.bisect_left(self.buckets, latency)
+            with self.lock:
+                self.counts[index] += 1
+                self.count += 1
+                self.total += latency
+
+
+        def to_dict(self) -> dict:
+            """
+            Get the histogram as a dict.
+
+            :return: dict containing the number of requests per latency bucket, and the mean latency
+            """
+            with self.lock:
+                buckets = {f"<={bound}ms": count for bound, count in zip(self.buckets, self.counts)}
+                buckets[f">{self.buckets[-1]}ms"] = self.counts[-1]
+                return {
+                    "count": self.count,
+                    "mean-ms": self.total / self.count if self.count else 0.0,
+                    "buckets": buckets
+                }
+
+
+    class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        """
+        Multi-threaded HTTP server listening on a Unix domain socket.
+        """
+        daemon_threads = True
+
+
+    class Handler(BaseHTTPRequestHandler):
+        """
+        HTTP translation request handler.
+        """
+
+        def address_string(self) -> str:
+            """
+            Get the client address, for logging.
+            Unix domain socket clients have no address.
+
+            :return: client address
+            """
+            if isinstance(self.client_address, tuple):
+                return self.client_address[0]
+            return "unix"
+
+
+        def send(self, status: int, body: bytes, content_type: str = "text/plain", headers: dict = {}) -> None:
+            """
+            Send an HTTP response.
+
+            :param status: HTTP status code
+            :param body: response body
+            :param content_type: response content type
+            :param headers: additional response headers
+            """
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+
+        def do_GET(self) -> None:
+            """
+            Handle a GET request: server statistics.
+            """
+            if urlsplit(self.path).path != "/stats":
+                self.send(404, b"Not found\n")
+                return
+            stats = json.dumps(self.server.translation_server.stats(), indent=2).encode()
+            self.send(200, stats, "application/json")
+
+
+        def do_POST(self) -> None:
+            """
+            Handle a POST request: MUD document translation.
+            """
+            url = urlsplit(self.path)
+            if url.path != "/translate":
+                self.send(404, b"Not found\n")
+                return
+            self.server.translation_server.handle_translation(self, parse_qs(url.query))
+
+
+    @staticmethod
+    def warm_up() -> None:
+        """
+        Load the MUD parsers and protocol parsers, such that translations do not pay for it.
+        """
+        for format in MudParser.Format:
+            MudParser.init_parser(Namespace(input=None, output=None, mac=None, ipv4=None, ipv6=None, network=None), format)
+        for protocol_name in Protocol.protocols:
+            Protocol.init_protocol(protocol_name)
+
+
+    @staticmethod
+    def translate_document(document: bytes, options: dict, format: str) -> bytes:
+        """
+        Translate a MUD document, and serialize the translated profile.
+        Runs in the handler thread, or in a worker process.
+
+        :param document: MUD document (JSON or XML)
+        :param options: device options
+        :param format: output format ("yaml", "json", "bin" or "nft")
+        :return: serialized translated profile
+        """
+        mud_parser = MudParser.init_memory_parser(document, **options)
+        profile = mud_parser.translate()
+        mud_parser.finish_stats()
+        if format == "json":
+            from writers.JsonWriter import JsonWriter
+            return JsonWriter.dumps(profile)
+        if format == "bin":
+            from writers.BinaryWriter import BinaryWriter
+            return BinaryWriter.dumps(profile)
+        if format == "nft":
+            from writers.NftablesWriter import NftablesWriter
+            return NftablesWriter().compile(profile, mud_parser.policy_directions()).encode()
+        return MudParser.dump(profile).encode()
+
+
+    def __init__(self, args: Namespace) -> None:
+        """
+        Constructor for the TranslationServer class.
+
+        :param args: command line arguments
+        """
+        self.address = args.serve
+        self.jobs = args.jobs if args.jobs is not None else 1
+        self.max_pending = args.max_pending if args.max_pending is not None else self.default_max_pending
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        self.executor = None
+        self.http_server = None
+
+        # Statistics
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "translated": 0, "failed": 0, "rejected": 0, "pending": 0}
+        self.latency = self.LatencyHistogram()
+
+
+    def count(self, counter: str, value: int = 1) -> None:
+        """
+        Increment a statistics counter.
+
+        :param counter: counter name
+        :param value: increment
+        """
+        with self.lock:
+            self.counters[counter] += value
+
+
+    def stats(self) -> dict:
+        """
+        Get the server statistics.
+
+        :return: dict containing the request counters and the latency histogram
+        """
+        with self.lock:
+            stats = dict(self.counters)
+        stats["latency"] = self.latency.to_dict()
+        return stats
+
+
+    def handle_translation(self, handler: TranslationServer.Handler, query: dict) -> None:
+        """
+        Handle a translation request.
+        Requests beyond the maximum number of pending requests are rejected,
+        to apply backpressure on clients.
+
+        :param handler: HTTP request handler
+        :param query: parsed query parameters
+        """
+        start = time.perf_counter()
+        self.count("requests")
+
+        # Backpressure: reject request if too many requests are pending
+        if not self.slots.acquire(blocking=False):
+            self.count("rejected")
+            handler.send(503, b"Too many pending requests\n", headers={"Retry-After": "1"})
+            return
+
+        self.count("pending")
+        try:
+            # Read request
+            if "Content-Length" not in handler.headers:
+                self.count("failed")
+                handler.send(411, b"Content-Length required\n")
+                return
+            try:
+                length = int(handler.headers["Content-Length"])
+            except ValueError:
+                length = -1
+            if length < 0:
+                self.count("failed")
+                handler.send(400, b"Invalid Content-Length\n")
+                return
+            if length > self.max_body_size:
+                self.count("failed")
+                handler.send(413, b"MUD document too large\n")
+                return
+            document = handler.rfile.read(length)
+            options = {option: query[option][0] for option in self.device_options if option in query}
+            format = query.get("format", ["yaml"])[0]
+            if format not in self.content_types:
+                self.count("failed")
+                handler.send(400, f"Unsupported format '{format}'\n".encode())
+                return
+
+            # Translate MUD document
+            try:
+                if self.executor is not None:
+                    body = self.executor.submit(self.translate_document, document, options, format).result()
+                else:
+                    body = self.translate_document(document, options, format)
+            except Exception as e:
+                self.count("failed")
+                handler.send(400, f"{type(e).__name__}: {e}\n".encode())
+                return
+
+            self.count("translated")
+            handler.send(200, body, self.content_types[format])
+        finally:
+            self.count("pending", -1)
+            self.slots.release()
+            self.latency.observe((time.perf_counter() - start) * 1000)
+
+
+    @staticmethod
+    def remove_socket(path: str) -> None:
+        """
+        Remove a stale Unix domain socket file, e.g. left over by a previous server, if present.
+        Files other than sockets, and sockets a live server is listening on, are never removed.
+
+        :param path: Unix domain socket path
+        :raises FileExistsError: the path exists, and is not a socket
+        :raises OSError: a server is listening on the socket (EADDRINUSE), or the socket cannot be probed
+        """
+        try:
+            mode = os.lstat(path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(errno.EEXIST, "Not a socket, refusing to replace it", path)
+        # Only a socket nobody is listening on anymore is stale
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(path)
+            except ConnectionRefusedError:
+                os.remove(path)
+                return
+        raise OSError(errno.EADDRINUSE, "A server is listening on the socket, refusing to replace it", path)
+
+
+    def bind(self) -> None:
+        """
+        Bind the HTTP server to its address:
+        "unix:PATH" for a Unix domain socket, "[HOST:]PORT" for a TCP port (default host: localhost).
+
+        :raises OSError: the address cannot be bound, e.g. the Unix domain socket path exists and is not a socket
+        """
+        if self.address.startswith("unix:"):
+            path = self.address[len("unix:"):]
+            self.remove_socket(path)
+            self.http_server = self.UnixHTTPServer(path, self.Handler)
+        else:
+            host, _, port = self.address.rpartition(":")
+            self.http_server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), self.Handler)
+            self.http_server.daemon_threads = True
+        self.http_server.translation_server = self
+
+
+    @staticmethod
+    def terminate(signum: int, frame: object) -> None:
+        """
+        SIGTERM handler: stop the translation server like an interrupt, such that it is shut down cleanly.
+
+        :param signum: signal number
+        :param frame: interrupted stack frame
+        :raises KeyboardInterrupt: always
+        """
+        raise KeyboardInterrupt()
+
+
+    def run(self) -> None:
+        """
+        Run the translation server, until interrupted (SIGINT) or terminated (SIGTERM).
+        On shutdown, the server's socket is closed, and its Unix domain socket file removed.
+
+        :raises OSError: the address cannot be bound
+        """
+        self.warm_up()
+        self.bind()
+        if self.jobs > 1:
+            self.executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=self.warm_up)
+        # Signal handlers can only be set in the main thread
+        previous_handler = None
+        if threading.current_thread() is threading.main_thread():
+            previous_handler = signal.signal(signal.SIGTERM, self.terminate)
+        print(f"Serving translations on {self.address} "
+              f"({self.jobs} worker(s), at most {self.max_pending} pending requests)", file=sys.stderr)
+        try:
+            self.http_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if previous_handler is not None:
+                signal.signal(signal.SIGTERM, previous_handler)
+            self.http_server.server_close()
+            if self.executor is not None:
+                self.executor.shutdown()
+            if self.address.startswith("unix:"):
+                self.remove_socket(self.address[len("unix:"):])
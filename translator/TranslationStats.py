@@ -0,0 +1,194 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+from collections.abc import Callable, Iterator
+import time
+from contextlib import contextmanager
+
+
+class TranslationStats:
+    """
+    Instrumentation of a translation:
+        - wall-clock time of each stage (read, compile, translate, aggregate, resolve-dns, write),
+          and peak memory allocated by each stage, if memory tracing is enabled,
+        - cumulative time spent in each protocol parser, and in streaming the ACEs from the input MUD file,
+        - counters: ACEs processed, single policies produced, ACLs skipped,
+          and single policies matching each protocol (before aggregation).
+    Library callers can subscribe to the statistics of every translation.
+    Translations without statistics requested and without subscribers are not instrumented.
+    """
+
+    # Callbacks called with the statistics of each translation, as a dict
+    subscribers = []
+
+
+    @classmethod
+    def subscribe(c, callback: Callable[[dict], None]) -> None:
+        """
+        Subscribe to the statistics of all subsequent translations.
+
+        :param callback: function called with the statistics of each translation, as a dict
+        """
+        c.subscribers.append(callback)
+
+
+    @classmethod
+    def unsubscribe(c, callback: Callable[[dict], None]) -> None:
+        """
+        Unsubscribe from the translation statistics.
+
+        :param callback: previously subscribed function
+        """
+        if callback in c.subscribers:
+            c.subscribers.remove(callback)
+
+
+    def __init__(self, input: object = None, trace_memory: bool = False) -> None:
+        """
+        Constructor for the TranslationStats class.
+
+        :param input: input MUD file path, or None for an in-memory MUD profile
+        :param trace_memory: measure the peak memory allocated by each stage (slows down the translation)
+        """
+        self.input = input if isinstance(input, str) else None
+        self.trace_memory = trace_memory
+        self.started_tracing = False
+        if trace_memory:
+            # Imported only if memory is traced, as it is slow to import
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+        self.start = time.perf_counter()
+        self.end = None
+        self.stages = {}     # Mapping between stage names and dicts {"seconds", "peak-bytes"}
+        self.timers = {}     # Mapping between timer names and cumulative seconds
+        self.counters = {"aces": 0, "policies": 0, "skipped-acls": 0}
+        self.protocols = {}  # Mapping between protocol names and numbers of single policies matching them
+
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Measure a translation stage.
+
+        :param name: stage name
+        """
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stage = self.stages.setdefault(name, {"seconds": 0.0, "peak-bytes": None})
+            stage["seconds"] += time.perf_counter() - start
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+                stage["peak-bytes"] = max(peak, stage["peak-bytes"] or 0)
+
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """
+        Add time to a cumulative timer.
+
+        :param name: timer name
+        :param seconds: time to add, in seconds
+        """
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+
+    def timed_iter(self, name: str, iterator: Iterator) -> Iterator:
+        """
+        Wrap an iterator, adding the time spent producing each item to a cumulative timer.
+
+        :param name: timer name
+        :param iterator: iterator to wrap
+        :return: iterator over the same items
+        """
+        iterator = iter(iterator)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(name, time.perf_counter() - start)
+                return
+            self.add_time(name, time.perf_counter() - start)
+            yield item
+
+
+    def count(self, counter: str, value: int = 1) -> None:
+        """
+        Increment a counter.
+
+        :param counter: counter name
+        :param value: increment
+        """
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+
+    def count_ace(self, policy: dict) -> None:
+        """
+        Count a translated ACE, and the protocols matched by its single policy.
+
+        :param policy: single policy translated from the ACE
+        """
+        self.counters["aces"] += 1
+        for protocol in policy["protocols"]:
+            self.protocols[protocol] = self.protocols.get(protocol, 0) + 1
+
+
+    def finish(self) -> dict:
+        """
+        End the instrumentation, and publish the statistics to the subscribers.
+
+        :return: statistics, as a dict
+        """
+        self.end = time.perf_counter()
+        if self.started_tracing:
+            import tracemalloc
+            tracemalloc.stop()
+            self.started_tracing = False
+        stats = self.to_dict()
+        for callback in list(self.subscribers):
+            callback(stats)
+        return stats
+
+
+    def to_dict(self) -> dict:
+        """
+        Get the statistics as a dict.
+
+        :return: dict containing the stages, timers, counters and policies per protocol
+        """
+        return {
+            "input": self.input,
+            "seconds": (self.end if self.end is not None else time.perf_counter()) - self.start,
+            "stages": {name: dict(stage) for name, stage in self.stages.items()},
+            "timers": dict(self.timers),
+            "counters": dict(self.counters),
+            "protocols": dict(sorted(self.protocols.items()))
+        }
+
+
+    def report(self) -> str:
+        """
+        Get a human-readable report of the statistics.
+
+        :return: multi-line report
+        """
+        stats = self.to_dict()
+        lines = [f"{self.input or '<memory>'}: translated in {stats['seconds'] * 1000:.1f} ms"]
+        for name, stage in stats["stages"].items():
+            line = f"  {name:<16} {stage['seconds'] * 1000:>10.1f} ms"
+            if stage["peak-bytes"] is not None:
+                line += f" {stage['peak-bytes'] / (1024 * 1024):>10.2f} MiB peak"
+            lines.append(line)
+        for name, seconds in sorted(stats["timers"].items()):
+            lines.append(f"  {name:<16} {seconds * 1000:>10.1f} ms (cumulative)")
+        lines.append("  " + ", ".join(f"{value} {name}" for name, value in stats["counters"].items()))
+        if stats["protocols"]:
+            lines.append("  policies per protocol: " + ", ".join(f"{name} {count}" for name, count in stats["protocols"].items()))
+        return "\n".join(lines)
@@ -0,0 +1,359 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import os
+import sys
+import time
+import struct
+import select
+from argparse import Namespace
+from translator.BatchTranslator import BatchTranslator
+
+
+class WatchTranslator(BatchTranslator):
+    """
+    Watch mode: translate the MUD files of directories (or single MUD files),
+    then watch them, and retranslate the MUD files which changed, until interrupted.
+        - changes are detected with inotify on Linux, or by polling the MUD files' modification times otherwise
+          (or if requested, e.g. on network file systems, which do not report remote changes to inotify),
+        - bursts of changes to a MUD file are debounced: the file is translated once it has not changed for a while,
+        - output files are written atomically, to a temporary file renamed over the output file,
+          such that consumers never read a partially written profile,
+        - the translation of each changed MUD file, and each burst of changes, is logged with its latency and throughput.
+    """
+
+    # Default debounce delay, and polling interval, in seconds
+    default_debounce = 0.5
+    default_poll_interval = 1.0
+
+
+    class Inotify:
+        """
+        Directory watcher using the Linux inotify API, through ctypes.
+        Directories are watched recursively, including directories created after the watcher.
+        """
+
+        # inotify event masks and flags (see inotify(7))
+        IN_MODIFY      = 0x00000002
+        IN_CLOSE_WRITE = 0x00000008
+        IN_MOVED_TO    = 0x00000080
+        IN_CREATE      = 0x00000100
+        IN_Q_OVERFLOW  = 0x00004000
+        IN_IGNORED     = 0x00008000
+        IN_ISDIR       = 0x40000000
+        IN_NONBLOCK    = 0o4000
+        IN_CLOEXEC     = 0o2000000
+
+        # Watched events: file written, file moved in, and directory created
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+        # inotify event header: watch descriptor, mask, cookie, name length
+        event = struct.Struct("iIII")
+
+
+        def __init__(self, directories: list) -> None:
+            """
+            Constructor for the Inotify class.
+
+            :param directories: directories to watch, recursively
+            :raises OSError: inotify is not available, or a directory cannot be watched
+            """
+            import ctypes
+            import ctypes.util
+            self.ctypes = ctypes
+            self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            if not hasattr(self.libc, "inotify_init1"):
+                raise OSError("inotify is not available")
+            self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+            if self.fd < 0:
+                errno = ctypes.get_errno()
+                raise OSError(errno, os.strerror(errno))
+            # Mapping between watch descriptors and watched directories
+            self.directories = {}
+            self.roots = directories
+            try:
+                for directory in directories:
+                    self.add_tree(directory)
+            except OSError:
+                self.close()
+                raise
+
+
+        def add_watch(self, directory: str) -> None:
+            """
+            Watch a directory.
+
+            :param directory: directory path
+            :raises OSError: the directory cannot be watched (e.g. watch limit reached)
+            """
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.mask)
+            if wd < 0:
+                errno = self.ctypes.get_errno()
+                raise OSError(errno, os.strerror(errno), directory)
+            self.directories[wd] = directory
+
+
+        def add_tree(self, directory: str) -> list:
+            """
+            Watch a directory and its subdirectories.
+
+            :param directory: directory path
+            :return: list of the files already in the directory tree
+            """
+            files = []
+            for dirpath, dirnames, filenames in os.walk(directory):
+                self.add_watch(dirpath)
+                files += [os.path.join(dirpath, filename) for filename in filenames]
+            return files
+
+
+        def wait(self, timeout: float) -> list:
+            """
+            Wait for changes in the watched directories.
+
+            :param timeout: maximum waiting time, in seconds, or None to wait indefinitely
+            :return: list of the paths of the changed files, empty on timeout
+            """
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+            if not ready:
+                return []
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return []
+            paths = []
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self.event.unpack_from(data, offset)
+                offset += self.event.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                if mask & self.IN_Q_OVERFLOW:
+                    # Events were lost: consider all watched files changed
+                    for directory in self.roots:
+                        for dirpath, _, filenames in os.walk(directory):
+                            paths += [os.path.join(dirpath, filename) for filename in filenames]
+                    continue
+                if mask & self.IN_IGNORED:
+                    # Watched directory removed
+                    self.directories.pop(wd, None)
+                    continue
+                directory = self.directories.get(wd, None)
+                if directory is None:
+                    continue
+                path = os.path.join(directory, name)
+                if mask & self.IN_ISDIR:
+                    # Directory created or moved in: watch it, and consider its files changed
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        paths += self.add_tree(path)
+                elif not mask & self.IN_CREATE:
+                    paths.append(path)
+            return paths
+
+
+        def close(self) -> None:
+            """
+            Stop watching, and release the inotify file descriptor.
+            """
+            os.close(self.fd)
+
+
+    class Poller:
+        """
+        Directory watcher polling the modification time and size of the MUD files.
+        """
+
+
+        def __init__(self, scan: callable, interval: float) -> None:
+            """
+            Constructor for the Poller class.
+
+            :param scan: function listing the watched MUD files, as tuples (path, relative path)
+            :param interval: polling interval, in seconds
+            """
+            self.scan = scan
+            self.interval = interval
+            self.snapshot = self.stat_files()
+
+
+        def stat_files(self) -> dict:
+            """
+            Get the modification time and size of the watched MUD files.
+
+            :return: mapping between MUD file paths and tuples (modification time in nanoseconds, size)
+            """
+            snapshot = {}
+            for path, _ in self.scan():
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+            return snapshot
+
+
+        def wait(self, timeout: float) -> list:
+            """
+            Wait for the next poll, and compare the watched MUD files with the previous poll.
+
+            :param timeout: maximum waiting time, in seconds, or None to wait for the polling interval
+            :return: list of the paths of the changed (or new) MUD files
+            """
+            time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+            snapshot = self.stat_files()
+            paths = [path for path, stat in snapshot.items() if self.snapshot.get(path, None) != stat]
+            self.snapshot = snapshot
+            return paths
+
+
+        def close(self) -> None:
+            """
+            Stop polling.
+            """
+            pass
+
+
+    @staticmethod
+    def translate_file(args: Namespace) -> tuple:
+        """
+        Translate a single MUD file, writing the output file atomically:
+        the MUD file is translated to a temporary file, next to the output file,
+        which is then renamed over the output file.
+        Runs in a worker process, any error is caught and returned.
+
+        :param args: arguments for the MUD file parser
+        :return: tuple (input file, output file, error message or None, elapsed time in seconds)
+        """
+        output = args.output
+        args.output = f"{output}.{os.getpid()}.tmp"
+        input, tmp_output, error, elapsed = BatchTranslator.translate_file(args)
+        args.output = output
+        try:
+            if error is None:
+                os.replace(tmp_output, output)
+            else:
+                os.remove(tmp_output)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            error = f"{type(e).__name__}: {e}"
+        return (input, output, error, elapsed)
+
+
+    def __init__(self, args: Namespace) -> None:
+        """
+        Constructor for the WatchTranslator class.
+
+        :param args: command line arguments
+        """
+        super().__init__(args)
+        self.debounce = args.debounce if getattr(args, "debounce", None) is not None else self.default_debounce
+        self.poll_interval = getattr(args, "poll_interval", None)
+        # Mapping between changed MUD files and the time of their last change, waiting for the debounce delay
+        self.pending = {}
+
+
+    def locate(self, path: str) -> str:
+        """
+        Check whether a changed file is a watched MUD file,
+        and get its path relative to the watched input.
+
+        :param path: changed file path
+        :return: path relative to the watched input, or None if the file is not a watched MUD file
+        """
+        absolute_path = os.path.abspath(path)
+        for input in self.inputs:
+            absolute_input = os.path.abspath(input)
+            if os.path.isdir(input):
+                if not path.endswith(self.extensions) or path.endswith(self.excluded_extensions):
+                    continue
+                if os.path.commonpath([absolute_input, absolute_path]) == absolute_input:
+                    return os.path.relpath(absolute_path, absolute_input)
+            elif absolute_path == absolute_input:
+                return os.path.basename(input)
+        return None
+
+
+    def open_watcher(self) -> Inotify | Poller:
+        """
+        Start watching the inputs, with inotify if available, unless polling is requested.
+
+        :return: directory watcher
+        """
+        if self.poll_interval is None and sys.platform.startswith("linux"):
+            # Single files are watched through their directory
+            directories = sorted({input if os.path.isdir(input) else (os.path.dirname(input) or ".") for input in self.inputs})
+            try:
+                return self.Inotify(directories)
+            except OSError as e:
+                print(f"watch: inotify unavailable ({e}), polling instead", file=sys.stderr)
+        return self.Poller(self.expand_inputs, self.poll_interval or self.default_poll_interval)
+
+
+    def translate_changes(self, paths: list) -> list:
+        """
+        Retranslate changed MUD files, and log the latency and throughput of each translation.
+
+        :param paths: paths of the changed MUD files, whose debounce delay elapsed
+        :return: list of tuples (input file, output file, error message or None, elapsed time in seconds)
+        """
+        start = time.perf_counter()
+        tasks = []
+        size = 0
+        for path in paths:
+            relative_path = self.locate(path)
+            # Files removed since their change are skipped
+            if relative_path is None or not os.path.isfile(path):
+                continue
+            tasks.append(self.build_task(path, relative_path))
+            size += os.path.getsize(path)
+        results = self.translate_tasks(tasks)
+        end = time.perf_counter()
+        for input, output, error, elapsed in results:
+            # Latency: time between the last change to the MUD file and its output file being written
+            latency = end - self.pending.get(input, start)
+            if error is None:
+                print(f"watch: {input} -> {output}: translated in {elapsed * 1000:.1f} ms, "
+                      f"{latency * 1000:.1f} ms after last change", file=sys.stderr)
+            else:
+                print(f"watch: {input}: {error}", file=sys.stderr)
+        if results:
+            elapsed = end - start
+            failures = sum(1 for _, _, error, _ in results if error is not None)
+            print(f"watch: translated {len(results) - failures}/{len(results)} changed MUD files in {elapsed * 1000:.1f} ms "
+                  f"({len(results) / elapsed:.1f} files/s, {size / elapsed / 2 ** 20:.2f} MiB/s), {failures} failed", file=sys.stderr)
+        return results
+
+
+    def run(self) -> list:
+        """
+        Translate all MUD files, then retranslate the MUD files which change, until interrupted.
+
+        :return: list of tuples (input file, output file, error message or None, elapsed time in seconds),
+                 of the initial translation
+        """
+        results = super().run()
+        watcher = self.open_watcher()
+        print(f"watch: watching {', '.join(self.inputs)} with {type(watcher).__name__.lower()} "
+              f"(debounce {self.debounce * 1000:.0f} ms)", file=sys.stderr)
+        try:
+            while True:
+                # Wait for changes, or until the earliest pending MUD file is due
+                timeout = None
+                if self.pending:
+                    timeout = max(0.0, min(self.pending.values()) + self.debounce - time.perf_counter())
+                for path in watcher.wait(timeout):
+                    if self.locate(path) is not None:
+                        self.pending[path] = time.perf_counter()
+                # Retranslate MUD files which have not changed during the debounce delay
+                now = time.perf_counter()
+                due = [path for path, changed in self.pending.items() if now - changed >= self.debounce]
+                if due:
+                    self.translate_changes(due)
+                    for path in due:
+                        del self.pending[path]
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+        return results
@@ -0,0 +1,189 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import json
+import mmap
+from collections.abc import Iterator, Mapping
+from writers.BinaryWriter import BinaryWriter
+
+
+class BinaryProfile(Mapping):
+    """
+    Reader of binary profiles (see BinaryWriter for the format),
+    for consumers of translated profiles.
+    The binary profile is a read-only mapping between single policy names and single policies,
+    in the same order as in the YAML profile.
+    Single policies are looked up by binary search in the index, and decoded on access,
+    such that loading a memory-mapped profile does not decode it.
+    """
+
+
+    @classmethod
+    def open(c, path: str) -> BinaryProfile:
+        """
+        Open a binary profile file, memory-mapped.
+
+        :param path: binary profile file path
+        :return: binary profile
+        :raises ValueError: the file is not a binary profile, or has an unsupported format version
+        """
+        with open(path, "rb") as binary_file:
+            buffer = mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return c(buffer)
+        except ValueError:
+            buffer.close()
+            raise
+
+
+    def __init__(self, buffer: bytes | mmap.mmap) -> None:
+        """
+        Constructor for the BinaryProfile class.
+
+        :param buffer: binary profile, in memory or memory-mapped
+        :raises ValueError: the buffer is not a binary profile, or has an unsupported format version
+        """
+        if len(buffer) < BinaryWriter.header.size or buffer[:len(BinaryWriter.MAGIC)] != BinaryWriter.MAGIC:
+            raise ValueError("Not a binary profile")
+        _, version, _, self.count, self.device_info_length, self.device_info_offset = BinaryWriter.header.unpack_from(buffer)
+        if version != BinaryWriter.VERSION:
+            raise ValueError(f"Unsupported binary profile format version: {version}")
+        if BinaryWriter.header.size + BinaryWriter.entry.size * self.count > len(buffer):
+            raise ValueError("Truncated binary profile")
+        self.buffer = buffer
+
+
+    def close(self) -> None:
+        """
+        Close the binary profile, unmapping it if memory-mapped.
+        """
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+
+    def __enter__(self) -> BinaryProfile:
+        """
+        Use the binary profile as a context manager, closing it on exit.
+
+        :return: binary profile
+        """
+        return self
+
+
+    def __exit__(self, *exc_info) -> None:
+        """
+        Close the binary profile.
+
+        :param exc_info: exception information, if any
+        """
+        self.close()
+
+
+    def entry(self, i: int) -> tuple:
+        """
+        Read an index entry.
+
+        :param i: entry number
+        :return: tuple (name offset, policy offset, name length, policy length)
+        """
+        return BinaryWriter.entry.unpack_from(self.buffer, BinaryWriter.header.size + BinaryWriter.entry.size * i)
+
+
+    def name(self, i: int) -> bytes:
+        """
+        Read the UTF-8 encoded name of a single policy.
+
+        :param i: entry number
+        :return: single policy name
+        """
+        name_offset, _, name_length, _ = self.entry(i)
+        return self.buffer[name_offset:name_offset + name_length]
+
+
+    def find(self, name: str) -> int:
+        """
+        Find a single policy by name, by binary search in the index.
+
+        :param name: single policy name
+        :return: entry number, or -1 if not found
+        """
+        key = name.encode()
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.name(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self.name(low) == key:
+            return low
+        return -1
+
+
+    def __getitem__(self, name: str) -> dict:
+        """
+        Look a single policy up by name, and decode it.
+
+        :param name: single policy name
+        :return: single policy
+        :raises KeyError: no single policy has this name
+        """
+        i = self.find(name) if isinstance(name, str) else -1
+        if i < 0:
+            raise KeyError(name)
+        _, policy_offset, _, policy_length = self.entry(i)
+        return json.loads(self.buffer[policy_offset:policy_offset + policy_length])
+
+
+    def __contains__(self, name: object) -> bool:
+        """
+        Check whether a single policy has a given name, without decoding it.
+
+        :param name: single policy name
+        :return: True if a single policy has this name
+        """
+        return isinstance(name, str) and self.find(name) >= 0
+
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Iterate over the single policy names, in the same order as in the YAML profile.
+
+        :return: iterator over single policy names
+        """
+        return (self.name(i).decode() for i in range(self.count))
+
+
+    def __len__(self) -> int:
+        """
+        Count the single policies.
+
+        :return: number of single policies
+        """
+        return self.count
+
+
+    def device_info(self) -> dict:
+        """
+        Decode the device information.
+
+        :return: device information
+        """
+        return json.loads(self.buffer[self.device_info_offset:self.device_info_offset + self.device_info_length])
+
+
+    def to_dict(self) -> dict:
+        """
+        Decode the whole profile, as loaded from the YAML profile.
+
+        :return: dictionary containing the translated profile
+        """
+        policies = {}
+        for i in range(self.count):
+            name_offset, policy_offset, name_length, policy_length = self.entry(i)
+            name = self.buffer[name_offset:name_offset + name_length].decode()
+            policies[name] = json.loads(self.buffer[policy_offset:policy_offset + policy_length])
+        return {
+            "device-info": self.device_info(),
+            "single-policies": policies
+        }
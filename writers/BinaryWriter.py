@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import struct
+from writers.JsonWriter import JsonWriter
+
+
+class BinaryWriter:
+    """
+    Binary profile writer.
+    The binary profile format is designed to be memory-mapped by consumers,
+    which look single policies up by name without decoding the whole profile (see BinaryProfile).
+    All integers are little-endian, and all offsets are absolute, from the start of the file:
+        - header: magic "MUDB", format version (u16), flags (u16, reserved, 0),
+          number of single policies (u32), device information length (u32) and offset (u64),
+        - index: one entry per single policy, sorted by UTF-8 encoded name
+          (i.e. in the same order as in the YAML profile):
+          name offset (u64), policy offset (u64), name length (u32), policy length (u32),
+        - data: policy names, and single policies and device information as length-prefixed records,
+          i.e. canonical JSON documents (see JsonWriter), located by the header and index.
+    Readers must reject files with an unknown format version.
+    """
+
+    # File magic number, and current format version
+    MAGIC = b"MUDB"
+    VERSION = 1
+
+    # Header: magic, version, flags, number of single policies, device information length and offset
+    header = struct.Struct("<4sHHIIQ")
+
+    # Index entry: name offset, policy offset, name length, policy length
+    entry = struct.Struct("<QQII")
+
+
+    @classmethod
+    def dumps(c, yaml_data: dict) -> bytes:
+        """
+        Serialize a translated profile to the binary profile format.
+
+        :param yaml_data: dictionary containing the translated profile
+        :return: binary profile
+        """
+        policies = sorted((name.encode(), JsonWriter.dumps(policy)) for name, policy in yaml_data["single-policies"].items())
+        device_info = JsonWriter.dumps(yaml_data["device-info"])
+
+        # Lay data out after the header and index
+        index = bytearray()
+        data = bytearray()
+        offset = c.header.size + c.entry.size * len(policies)
+        for name, policy in policies:
+            index += c.entry.pack(offset + len(data), offset + len(data) + len(name), len(name), len(policy))
+            data += name
+            data += policy
+        header = c.header.pack(c.MAGIC, c.VERSION, 0, len(policies), len(device_info), offset + len(data))
+        return b"".join((header, index, data, device_info))
+
+
+    @classmethod
+    def dump(c, yaml_data: dict, stream: object) -> None:
+        """
+        Write a translated profile to a binary stream, in the binary profile format.
+
+        :param yaml_data: dictionary containing the translated profile
+        :param stream: binary stream to write the binary profile to
+        """
+        stream.write(c.dumps(yaml_data))
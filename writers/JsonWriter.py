@@ -0,0 +1,40 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import json
+from parsers.ir.Record import Record
+
+
+class JsonWriter:
+    """
+    Compact JSON profile writer.
+    Translated profiles are serialized in a canonical form:
+    keys sorted (as in the YAML profile), no whitespace, UTF-8 without escaping,
+    such that the same profile always gives the same bytes,
+    and consumers load it with a JSON parser, much faster than a YAML parser.
+    """
+
+    # Canonical JSON encoder, serializing IR records as their mappings
+    encoder = json.JSONEncoder(sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=Record.json_default)
+
+
+    @classmethod
+    def dumps(c, value: object) -> bytes:
+        """
+        Serialize a translated profile, or part of it, to canonical JSON.
+
+        :param value: translated profile, single policy, or device information
+        :return: UTF-8 encoded canonical JSON document
+        """
+        return c.encoder.encode(value).encode()
+
+
+    @classmethod
+    def dump(c, yaml_data: dict, stream: object) -> None:
+        """
+        Write a translated profile to a binary stream, as canonical JSON.
+
+        :param yaml_data: dictionary containing the translated profile
+        :param stream: binary stream to write the JSON document to
+        """
+        stream.write(c.dumps(yaml_data))
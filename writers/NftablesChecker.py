@@ -0,0 +1,488 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import re
+import shutil
+import ipaddress
+import subprocess
+from writers.NftablesWriter import NftablesWriter
+
+
+class NftablesChecker:
+    """
+    Offline syntax validation of nftables rulesets.
+    Uses "nft --check" if the nft tool is available (which may require privileges),
+    otherwise a pure-Python parser of the subset of the nftables syntax emitted by NftablesWriter:
+    tables, named sets and verdict maps (types, flags and elements), chains and their rules.
+    The parser also checks that set elements are valid for the set's type, that elements of interval sets
+    do not overlap, that rules match sets of the right type, and that referenced sets and chains are declared beforehand.
+    """
+
+    # Tokens: comments, strings, punctuation, and words
+    token_regex = re.compile(r'#[^\n]*|"[^"]*"|\n|[{};,]|[^\s{};,]+')
+
+    # nftables expressions matching a field, and their types
+    selectors = {
+        "ip saddr": "ipv4_addr",
+        "ip daddr": "ipv4_addr",
+        "ip6 saddr": "ipv6_addr",
+        "ip6 daddr": "ipv6_addr",
+        "ether saddr": "ether_addr",
+        "ether daddr": "ether_addr",
+        "tcp sport": "inet_service",
+        "tcp dport": "inet_service",
+        "udp sport": "inet_service",
+        "udp dport": "inet_service",
+        "icmp type": "icmp_type",
+        "icmpv6 type": "icmpv6_type",
+        "meta l4proto": "inet_proto",
+        "meta nfproto": "nf_proto",
+        "ct state": "ct_state"
+    }
+
+    # Values of the enumerated types
+    enumerations = {
+        "icmp_type": set(NftablesWriter.icmp_types.values()),
+        "icmpv6_type": set(NftablesWriter.icmpv6_types.values()),
+        "inet_proto": set(NftablesWriter.l4proto_names.values()),
+        "nf_proto": {"ipv4", "ipv6"},
+        "ct_state": {"new", "established", "related", "invalid", "untracked"}
+    }
+
+    # Base chain types, hooks and policies
+    chain_types = {"filter", "nat", "route"}
+    hooks = {"prerouting", "input", "forward", "output", "postrouting"}
+    policies = {"accept", "drop"}
+
+    # Families of the tables
+    families = {"ip", "ip6", "inet", "arp", "bridge", "netdev"}
+
+    # Regex for MAC address validation
+    mac_regex = re.compile(r"^([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}$")
+
+
+    @classmethod
+    def check(c, ruleset: str) -> list:
+        """
+        Check the syntax of an nftables ruleset,
+        with "nft --check" if available, otherwise with the pure-Python parser.
+
+        :param ruleset: nftables ruleset
+        :return: list of error messages, empty if the ruleset is valid
+        """
+        nft = shutil.which("nft")
+        if nft is not None:
+            result = subprocess.run([nft, "--check", "-f", "-"], input=ruleset, capture_output=True, text=True)
+            if result.returncode == 0:
+                return []
+            if "Operation not permitted" not in result.stderr:
+                return [line for line in result.stderr.splitlines() if line.strip()]
+            # Not enough privileges to check with nft: use the pure-Python parser
+        return c(ruleset).parse()
+
+
+    def __init__(self, ruleset: str) -> None:
+        """
+        Constructor for the NftablesChecker class.
+
+        :param ruleset: nftables ruleset
+        """
+        self.tokens = []  # List of tuples (token, line number)
+        line = 1
+        for match in self.token_regex.finditer(ruleset):
+            token = match.group()
+            if not token.startswith("#"):
+                self.tokens.append((token, line))
+            line += token.count("\n")
+        self.pos = 0
+        self.errors = []
+        self.sets = {}    # Mapping between set names and their key types
+        self.maps = {}    # Mapping between map names and their key types
+        self.chains = set()
+
+
+    def peek(self) -> str:
+        """
+        Get the next token, skipping newlines.
+
+        :return: next token, or "" at the end of the ruleset
+        """
+        while self.pos < len(self.tokens) and self.tokens[self.pos][0] == "\n":
+            self.pos += 1
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else ""
+
+
+    def next(self) -> str:
+        """
+        Consume the next token, skipping newlines.
+
+        :return: consumed token
+        :raises ValueError: unexpected end of the ruleset
+        """
+        token = self.peek()
+        if not token:
+            raise ValueError("unexpected end of ruleset")
+        self.pos += 1
+        return token
+
+
+    def expect(self, *tokens: str) -> str:
+        """
+        Consume the next token, which must be one of the given ones.
+
+        :param tokens: allowed tokens
+        :return: consumed token
+        :raises ValueError: unexpected token
+        """
+        token = self.next()
+        if token not in tokens:
+            raise ValueError(f"expected {' or '.join(repr(allowed) for allowed in tokens)}, got {token!r}")
+        return token
+
+
+    def line(self) -> int:
+        """
+        Get the line number of the current token.
+
+        :return: line number
+        """
+        return self.tokens[min(self.pos, len(self.tokens) - 1)][1] if self.tokens else 1
+
+
+    def statement(self) -> list:
+        """
+        Consume the tokens until the end of the statement (newline, ";" or "}"), excluding the latter.
+
+        :return: list of tokens of the statement
+        """
+        while self.pos < len(self.tokens) and self.tokens[self.pos][0] in ("\n", ";"):
+            self.pos += 1
+        tokens = []
+        while self.pos < len(self.tokens) and self.tokens[self.pos][0] not in ("\n", ";", "}"):
+            tokens.append(self.tokens[self.pos][0])
+            self.pos += 1
+        return tokens
+
+
+    @staticmethod
+    def identifier(name: str) -> str:
+        """
+        Check an identifier (table, set, map or chain name).
+
+        :param name: identifier
+        :return: identifier
+        :raises ValueError: invalid identifier
+        """
+        if not re.match(r"^[A-Za-z][A-Za-z0-9_]*$", name):
+            raise ValueError(f"invalid identifier {name!r}")
+        return name
+
+
+    def check_value(self, value: str, type: str) -> None:
+        """
+        Check a value of a given type, or a range of values.
+
+        :param value: value
+        :param type: nftables type
+        :raises ValueError: invalid value
+        """
+        if type in self.enumerations:
+            for item in value.split(",") if type == "ct_state" else [value]:
+                if item not in self.enumerations[type]:
+                    raise ValueError(f"invalid {type} value {item!r}")
+        elif type == "inet_service":
+            low, _, high = value.partition("-")
+            if not low.isdigit() or (high and not high.isdigit()) or not 0 <= int(low) <= int(high or low) <= 65535:
+                raise ValueError(f"invalid {type} value {value!r}")
+        elif type in ("ipv4_addr", "ipv6_addr"):
+            version = 4 if type == "ipv4_addr" else 6
+            try:
+                # Network, or range of addresses
+                networks = [ipaddress.ip_network(item) for item in value.split("-", 1)]
+            except ValueError:
+                raise ValueError(f"invalid {type} value {value!r}")
+            if any(network.version != version for network in networks):
+                raise ValueError(f"invalid {type} value {value!r}")
+        elif type == "ether_addr":
+            if not self.mac_regex.match(value):
+                raise ValueError(f"invalid {type} value {value!r}")
+        else:
+            raise ValueError(f"unsupported type {type!r}")
+
+
+    @staticmethod
+    def bounds(value: str, type: str) -> tuple:
+        """
+        Get the bounds of a valid value of a given type, or range of values.
+
+        :param value: value, checked with check_value
+        :param type: nftables type
+        :return: tuple (low, high): addresses and ports as integers, other values as is
+        """
+        if type == "inet_service":
+            low, _, high = value.partition("-")
+            return int(low), int(high or low)
+        if type in ("ipv4_addr", "ipv6_addr"):
+            networks = [ipaddress.ip_network(item) for item in value.split("-", 1)]
+            return int(networks[0].network_address), int(networks[-1].broadcast_address)
+        return value, value
+
+
+    def check_overlaps(self, name: str, elements: list, types: list) -> None:
+        """
+        Check that the elements of an interval set do not overlap, as nftables requires,
+        i.e. that no two elements overlap in all their fields.
+        Overlapping elements are reported as errors.
+
+        :param name: set name
+        :param elements: list of tuples (line number, element tokens), of valid elements
+        :param types: key types of the set
+        """
+        boxes = sorted(([self.bounds(value, type) for value, type in zip(element[::2], types)], line, " ".join(element))
+                       for line, element in elements)
+        for i, (box, line, element) in enumerate(boxes):
+            # Elements sorted by their lower bound in the first field: only the following ones starting within it may overlap
+            for other_box, other_line, other_element in boxes[i + 1:]:
+                if other_box[0][0] > box[0][1]:
+                    break
+                if all(low <= other_high and other_low <= high for (low, high), (other_low, other_high) in zip(box, other_box)):
+                    self.errors.append(f"line {max(line, other_line)}: {name}: element {other_element!r} overlaps {element!r}")
+
+
+    def check_element(self, tokens: list, types: list) -> None:
+        """
+        Check a (concatenated) set element, or map key.
+
+        :param tokens: element tokens, values separated by "."
+        :param types: key types of the set
+        :raises ValueError: invalid element
+        """
+        values = tokens[::2]
+        if tokens[1::2] != ["."] * (len(values) - 1) or len(values) != len(types):
+            raise ValueError(f"element {' '.join(tokens)!r} does not match type {' . '.join(types)}")
+        for value, type in zip(values, types):
+            self.check_value(value, type)
+
+
+    def elements(self) -> list:
+        """
+        Consume the elements of a set or map: "= { element, ... }".
+
+        :return: list of elements, as lists of tokens
+        :raises ValueError: invalid elements
+        """
+        self.expect("=")
+        self.expect("{")
+        elements = []
+        while True:
+            element = []
+            while self.peek() not in (",", "}", ""):
+                element.append(self.next())
+            if not element:
+                raise ValueError("empty element")
+            elements.append(element)
+            if self.expect(",", "}") == "}":
+                return elements
+
+
+    def set_body(self, name: str, is_map: bool) -> None:
+        """
+        Consume the body of a set or map declaration, until its closing brace.
+
+        :param name: set or map name
+        :param is_map: whether the declaration is a verdict map
+        :raises ValueError: invalid declaration
+        """
+        types = None
+        flags = []
+        elements = []
+        while self.peek() != "}":
+            line = self.line()
+            keyword = self.next()
+            if keyword == "type":
+                tokens = self.statement()
+                if is_map:
+                    if tokens[-2:] != [":", "verdict"]:
+                        raise ValueError(f"map {name}: only verdict maps are supported")
+                    tokens = tokens[:-2]
+                types = tokens[::2]
+                if tokens[1::2] != ["."] * (len(types) - 1) or not types:
+                    raise ValueError(f"set {name}: invalid type")
+            elif keyword == "flags":
+                flags = "".join(self.statement()).split(",")
+                for flag in flags:
+                    if flag not in ("interval", "constant", "timeout", "dynamic"):
+                        raise ValueError(f"set {name}: invalid flag {flag!r}")
+            elif keyword == "auto-merge":
+                pass
+            elif keyword == "elements":
+                elements = [(line, element) for element in self.elements()]
+            else:
+                raise ValueError(f"set {name}: unexpected {keyword!r}")
+        self.expect("}")
+        if types is None:
+            raise ValueError(f"set {name}: missing type")
+
+        valid = []
+        for line, element in elements:
+            try:
+                if is_map:
+                    separator = element.index(":")
+                    self.check_element(element[:separator], types)
+                    self.check_verdict(element[separator + 1:])
+                else:
+                    self.check_element(element, types)
+                    valid.append((line, element))
+            except ValueError as e:
+                self.errors.append(f"line {line}: {name}: {e}")
+        if "interval" in flags:
+            self.check_overlaps(name, valid, types)
+        (self.maps if is_map else self.sets)[name] = types
+
+
+    def check_verdict(self, tokens: list) -> None:
+        """
+        Check a verdict.
+
+        :param tokens: verdict tokens
+        :raises ValueError: invalid verdict
+        """
+        if tokens in (["accept"], ["drop"], ["return"]):
+            return
+        if len(tokens) == 2 and tokens[0] in ("jump", "goto"):
+            if tokens[1] not in self.chains:
+                raise ValueError(f"undeclared chain {tokens[1]!r}")
+            return
+        raise ValueError(f"invalid verdict {' '.join(tokens)!r}")
+
+
+    def check_rule(self, tokens: list) -> None:
+        """
+        Check a rule: matches, followed by a verdict or a verdict map lookup.
+
+        :param tokens: rule tokens
+        :raises ValueError: invalid rule
+        """
+        # Rejoin comma-separated values, e.g. "established,related"
+        joined = []
+        for token in tokens:
+            if token == "," or (joined and joined[-1].endswith(",")):
+                joined[-1] += token
+            else:
+                joined.append(token)
+        tokens = joined
+        i = 0
+        while i < len(tokens):
+            # Verdict: end of rule
+            if tokens[i] in ("accept", "drop", "return", "jump", "goto"):
+                self.check_verdict(tokens[i:])
+                return
+
+            # Match: (concatenated) expressions, then a value, a set, or a verdict map
+            types = []
+            while True:
+                expression = " ".join(tokens[i:i + 2])
+                if expression not in self.selectors:
+                    raise ValueError(f"unsupported expression {expression!r}")
+                types.append(self.selectors[expression])
+                i += 2
+                if i < len(tokens) and tokens[i] == ".":
+                    i += 1
+                    continue
+                break
+            if i >= len(tokens):
+                raise ValueError("missing value")
+            if tokens[i] == "vmap":
+                name = tokens[i + 1][1:] if i + 1 < len(tokens) and tokens[i + 1].startswith("@") else None
+                if name not in self.maps:
+                    raise ValueError(f"undeclared map {name!r}")
+                if self.maps[name] != types:
+                    raise ValueError(f"map {name} does not match {' . '.join(types)}")
+                if i + 2 != len(tokens):
+                    raise ValueError("unexpected tokens after verdict map")
+                return
+            if tokens[i].startswith("@"):
+                name = tokens[i][1:]
+                if name not in self.sets:
+                    raise ValueError(f"undeclared set {name!r}")
+                if self.sets[name] != types:
+                    raise ValueError(f"set {name} does not match {' . '.join(types)}")
+                i += 1
+            else:
+                if len(types) != 1:
+                    raise ValueError("concatenations must be matched against a set")
+                self.check_value(tokens[i], types[0])
+                i += 1
+        raise ValueError("missing verdict")
+
+
+    def chain_body(self, name: str) -> None:
+        """
+        Consume the body of a chain declaration, until its closing brace.
+
+        :param name: chain name
+        :raises ValueError: invalid base chain declaration
+        """
+        # Chains can jump to themselves
+        self.chains.add(name)
+        while self.peek() != "}":
+            line = self.line()
+            tokens = self.statement()
+            if not tokens:
+                continue
+            try:
+                if tokens[0] == "type":
+                    if len(tokens) != 6 or tokens[2] != "hook" or tokens[4] != "priority":
+                        raise ValueError("invalid base chain declaration")
+                    if tokens[1] not in self.chain_types or tokens[3] not in self.hooks:
+                        raise ValueError("invalid base chain type or hook")
+                    int(tokens[5])
+                elif tokens[0] == "policy":
+                    if len(tokens) != 2 or tokens[1] not in self.policies:
+                        raise ValueError("invalid chain policy")
+                else:
+                    self.check_rule(tokens)
+            except ValueError as e:
+                self.errors.append(f"line {line}: chain {name}: {e}")
+        self.expect("}")
+
+
+    def table_body(self) -> None:
+        """
+        Consume the body of a table declaration, until its closing brace.
+
+        :raises ValueError: invalid declaration
+        """
+        while self.peek() != "}":
+            keyword = self.expect("set", "map", "chain")
+            name = self.identifier(self.next())
+            if name in self.sets or name in self.maps or (keyword == "chain" and name in self.chains):
+                raise ValueError(f"duplicate declaration of {name!r}")
+            self.expect("{")
+            if keyword == "chain":
+                self.chain_body(name)
+            else:
+                self.set_body(name, keyword == "map")
+        self.expect("}")
+
+
+    def parse(self) -> list:
+        """
+        Parse the ruleset.
+
+        :return: list of error messages, empty if the ruleset is valid
+        """
+        try:
+            while self.peek():
+                command = self.expect("table", "delete", "flush")
+                if command != "table":
+                    self.expect("table")
+                if self.next() not in self.families:
+                    raise ValueError("invalid table family")
+                self.identifier(self.next())
+                if command == "table" and self.peek() == "{":
+                    self.next()
+                    self.table_body()
+        except ValueError as e:
+            self.errors.append(f"line {self.line()}: {e}")
+        return self.errors
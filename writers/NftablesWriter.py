@@ -0,0 +1,470 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import ipaddress
+from parsers.Direction import Direction
+from passes.PolicyAggregator import PolicyAggregator
+
+
+class NftablesWriter:
+    """
+    nftables backend: compiles the translated single policies into an nftables ruleset,
+    such that packet classification is a set lookup, instead of a linear scan of one rule per policy.
+        - policies are grouped by shape, i.e. by network family, transport protocol and matched fields,
+        - each shape is compiled into a named set, of (concatenated) intervals if needed,
+          containing the networks, port ranges and ICMP types of all policies of this shape,
+          and matched by a single rule (or a few, as interval set elements must not overlap),
+        - transport protocols are dispatched to their own chain by a verdict map.
+    Domain names are replaced by their resolved addresses (see DnsResolver);
+    policies with unresolved domain names, or without any supported match, are skipped,
+    and listed in the ruleset's header comment.
+    Traffic from and to the device is classified by separate chains, with the policies of each direction.
+    Traffic of the device not matching any policy is dropped.
+    """
+
+    # Name of the nftables table, of the "inet" family
+    TABLE = "mud"
+
+    # Networks matched by "local", per network protocol
+    local_networks = {
+        "ipv4": ["10.0.0.0/8", "172.16.0.0/12", "192.168.0.0/16", "169.254.0.0/16"],
+        "ipv6": ["fc00::/7", "fe80::/10"]
+    }
+
+    # nftables payload expression and address type, per network protocol
+    families = {
+        "ipv4": ("ip", "ipv4_addr"),
+        "ipv6": ("ip6", "ipv6_addr")
+    }
+
+    # Transport protocols: nftables payload expression and protocol name, per network protocol
+    transports = {
+        "tcp": {None: "tcp", "ipv4": "tcp", "ipv6": "tcp"},
+        "udp": {None: "udp", "ipv4": "udp", "ipv6": "udp"},
+        "icmp": {None: "icmp", "ipv4": "icmp", "ipv6": "icmpv6"}
+    }
+
+    # Protocol numbers names, as used by "meta l4proto"
+    l4proto_names = {
+        "tcp": "tcp",
+        "udp": "udp",
+        "icmp": "icmp",
+        "icmpv6": "ipv6-icmp"
+    }
+
+    # ICMP type names in the YAML profile, and corresponding nftables ICMP and ICMPv6 type names
+    icmp_types = {
+        "echo-reply": "echo-reply",
+        "destination-unreachable": "destination-unreachable",
+        "source-quench": "source-quench",
+        "redirect": "redirect",
+        "echo-request": "echo-request",
+        "time-exceeded": "time-exceeded",
+        "parameter-problem": "parameter-problem",
+        "timestamp-request": "timestamp-request",
+        "timestamp-reply": "timestamp-reply",
+        "information-request": "info-request",
+        "information-reply": "info-reply",
+        "address-mask-request": "address-mask-request",
+        "address-mask-reply": "address-mask-reply"
+    }
+    icmpv6_types = {
+        "echo-reply": "echo-reply",
+        "destination-unreachable": "destination-unreachable",
+        "echo-request": "echo-request",
+        "time-exceeded": "time-exceeded",
+        "parameter-problem": "parameter-problem"
+    }
+
+    # Policy directions (see MudParser.policy_directions), and the corresponding chain name suffixes
+    chain_directions = {
+        Direction.FROM: "from",
+        Direction.TO: "to"
+    }
+
+    # Matched fields, in the order of the concatenations:
+    # mapping between field names and their YAML protocol and field
+    fields = {
+        "saddr": ("network", "src"),
+        "daddr": ("network", "dst"),
+        "sport": ("transport", "src-port"),
+        "dport": ("transport", "dst-port"),
+        "type": ("transport", "type")
+    }
+
+    # Matched fields swapped to match replies
+    reversed_fields = {
+        "saddr": "daddr",
+        "daddr": "saddr",
+        "sport": "dport",
+        "dport": "sport"
+    }
+
+
+    def __init__(self) -> None:
+        """
+        Constructor for the NftablesWriter class.
+        """
+        # Skipped single policies: list of tuples (policy name, reason)
+        self.skipped = []
+
+
+    def addresses(self, protocol: str, protocol_matches: dict, field: str) -> list:
+        """
+        Get the IP networks matched by a network field.
+
+        :param protocol: network protocol ("ipv4" or "ipv6")
+        :param protocol_matches: network protocol matches of the policy
+        :param field: network field ("src" or "dst")
+        :return: list of IP networks
+        :raises ValueError: domain name not resolved, or network of another protocol
+        """
+        value = str(protocol_matches[field])
+        if value == "local":
+            values = self.local_networks[protocol]
+        elif protocol_matches.get(f"{field}-resolved", None):
+            values = protocol_matches[f"{field}-resolved"]
+        else:
+            values = [value]
+        networks = []
+        for value in values:
+            try:
+                network = ipaddress.ip_network(value, strict=False)
+            except ValueError:
+                raise ValueError(f"domain name {value} not resolved")
+            if f"ipv{network.version}" != protocol:
+                raise ValueError(f"{value} is not an {protocol} network")
+            networks.append(network)
+        return networks
+
+
+    def policy_elements(self, policy: dict) -> tuple:
+        """
+        Compile a single policy into its shape, and its set elements.
+
+        :param policy: policy dictionary
+        :return: tuple (shape, list of elements), where the shape is a tuple
+                 (network protocol or None, transport protocol or None, tuple of matched fields),
+                 and the elements are tuples of values, one per matched field
+        :raises ValueError: policy which cannot be compiled
+        """
+        protocols = policy["protocols"]
+        unsupported = [protocol for protocol in protocols if protocol not in self.families and protocol not in self.transports]
+        if unsupported:
+            raise ValueError(f"unsupported protocol {unsupported[0]}")
+        network_protocols = [protocol for protocol in self.families if protocol in protocols]
+        transport_protocols = [protocol for protocol in self.transports if protocol in protocols]
+        if len(network_protocols) > 1 or len(transport_protocols) > 1:
+            raise ValueError("multiple network or transport protocols")
+        network = network_protocols[0] if network_protocols else None
+        transport = transport_protocols[0] if transport_protocols else None
+        if network is None and transport is None:
+            raise ValueError("no supported match")
+        l4 = self.transports[transport][network] if transport is not None else None
+
+        # Values of each matched field
+        values = {}
+        for field, (layer, yaml_field) in self.fields.items():
+            protocol = network if layer == "network" else transport
+            if protocol is None or yaml_field not in protocols[protocol]:
+                continue
+            value = protocols[protocol][yaml_field]
+            if layer == "network":
+                values[field] = self.addresses(protocol, protocols[protocol], yaml_field)
+            elif field == "type":
+                types = self.icmpv6_types if l4 == "icmpv6" else self.icmp_types
+                if value not in types:
+                    raise ValueError(f"unsupported {l4} type {value}")
+                values[field] = [types[value]]
+            else:
+                values[field] = PolicyAggregator.coalesce(PolicyAggregator.port_intervals(value))
+
+        # Elements: cartesian product of the values of the matched fields
+        elements = [()]
+        for field_values in values.values():
+            elements = [element + (value,) for element in elements for value in field_values]
+        return (network, l4, tuple(values)), elements
+
+
+    @staticmethod
+    def format_value(value: object) -> str:
+        """
+        Format a set element value.
+
+        :param value: IP network, port interval (tuple), or ICMP type name
+        :return: nftables value
+        """
+        if isinstance(value, tuple):
+            low, high = value
+            return str(low) if low == high else f"{low}-{high}"
+        if isinstance(value, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+            if value.prefixlen == value.max_prefixlen:
+                return str(value.network_address)
+            return str(value)
+        return value
+
+
+    @staticmethod
+    def sort_key(element: tuple) -> tuple:
+        """
+        Get the sort key of a set element, such that rulesets are deterministic.
+
+        :param element: tuple of values
+        :return: sort key
+        """
+        return tuple(
+            (int(value.network_address), value.prefixlen) if isinstance(value, (ipaddress.IPv4Network, ipaddress.IPv6Network))
+            else value if isinstance(value, tuple) else (value,)
+            for value in element
+        )
+
+
+    @staticmethod
+    def bounds(element: tuple) -> list:
+        """
+        Get the bounds of a set element, in each of its fields.
+
+        :param element: tuple of values
+        :return: list of tuples (low, high), one per value: addresses as integers, ports, or ICMP type names
+        """
+        return [
+            (int(value.network_address), int(value.broadcast_address)) if isinstance(value, (ipaddress.IPv4Network, ipaddress.IPv6Network))
+            else value if isinstance(value, tuple) else (value, value)
+            for value in element
+        ]
+
+
+    def merge_elements(self, fields: tuple, elements: set) -> list:
+        """
+        Merge the elements of a set, such that interval elements do not overlap, as nftables requires.
+        Single-field interval sets are merged into disjoint intervals.
+        Concatenated elements contained in another element are removed (all elements have the same verdict),
+        and the remaining elements are split into groups of non-overlapping elements, one set each.
+
+        :param fields: matched fields of the set
+        :param elements: set of elements
+        :return: list of groups of elements, as sorted lists of elements
+        """
+        if len(fields) == 1 and fields[0] in ("saddr", "daddr"):
+            return [[(network,) for network in ipaddress.collapse_addresses(element[0] for element in elements)]]
+        if len(fields) == 1 and fields[0] in ("sport", "dport"):
+            return [[(interval,) for interval in PolicyAggregator.coalesce([element[0] for element in elements])]]
+        if len(fields) == 1:
+            return [sorted(elements, key=self.sort_key)]
+
+        # Largest elements first, such that contained elements are found after their container
+        def size(element: tuple) -> int:
+            product = 1
+            for low, high in self.bounds(element):
+                product *= high - low + 1 if isinstance(low, int) else 1
+            return product
+        kept = []
+        for element in sorted(elements, key=lambda element: (-size(element), self.sort_key(element))):
+            if not any(all(low <= other_low and other_high <= high
+                           for (low, high), (other_low, other_high) in zip(self.bounds(other), self.bounds(element)))
+                       for other in kept):
+                kept.append(element)
+
+        # Each element goes into the first group it does not overlap
+        groups = []
+        for element in sorted(kept, key=self.sort_key):
+            for group in groups:
+                if not any(all(low <= other_high and other_low <= high
+                               for (low, high), (other_low, other_high) in zip(self.bounds(other), self.bounds(element)))
+                           for other in group):
+                    group.append(element)
+                    break
+            else:
+                groups.append([element])
+        return groups
+
+
+    def selector(self, network: str, l4: str, field: str) -> tuple:
+        """
+        Get the nftables expression matching a field, and its type.
+
+        :param network: network protocol, or None
+        :param l4: nftables transport protocol, or None
+        :param field: matched field
+        :return: tuple (expression, nftables type)
+        """
+        if field in ("saddr", "daddr"):
+            family, address_type = self.families[network]
+            return f"{family} {field}", address_type
+        if field == "type":
+            return f"{l4} type", f"{l4}_type"
+        return f"{l4} {field}", "inet_service"
+
+
+    def reverse(self, shape: tuple, elements: list) -> tuple:
+        """
+        Reverse the shape and elements of a single policy, to match the replies of its connections:
+        source and destination fields are swapped.
+
+        :param shape: tuple (network protocol or None, transport protocol or None, tuple of matched fields)
+        :param elements: list of elements, tuples of values, one per matched field
+        :return: tuple (reversed shape, list of reversed elements)
+        """
+        network, l4, fields = shape
+        reversed_fields = [self.reversed_fields.get(field, field) for field in fields]
+        # Reversed fields, in the order of the concatenations, and their position in the elements
+        order = sorted(range(len(fields)), key=lambda i: list(self.fields).index(reversed_fields[i]))
+        return ((network, l4, tuple(reversed_fields[i] for i in order)),
+                [tuple(element[i] for i in order) for element in elements])
+
+
+    def compile(self, profile: dict, directions: dict = None) -> str:
+        """
+        Compile a translated profile into an nftables ruleset.
+        Single policies are compiled into the chain of their direction:
+        "mud_from" for the traffic from the device, "mud_to" for the traffic to the device.
+        Bidirectional policies are also compiled, reversed, into the chain of the other direction,
+        matching the replies of established connections only.
+
+        :param profile: dictionary containing the translated profile
+        :param directions: mapping between policy names and their direction (see MudParser.policy_directions),
+                           policies not in the mapping are compiled into both chains
+        :return: nftables ruleset, to be loaded with "nft -f"
+        """
+        self.skipped = []
+        shapes = {}  # Mapping between tuples (direction, reply, shape) and sets of elements
+        for name in sorted(profile["single-policies"]):
+            policy = profile["single-policies"][name]
+            try:
+                shape, elements = self.policy_elements(policy)
+            except ValueError as e:
+                self.skipped.append((name, str(e)))
+                continue
+            direction = self.chain_directions.get(directions.get(name, None), None) if directions is not None else None
+            for chain_direction in (self.chain_directions.values() if direction is None else [direction]):
+                shapes.setdefault((chain_direction, False, shape), set()).update(elements)
+            if direction is not None and policy.get("bidirectional", False):
+                reply_shape, reply_elements = self.reverse(shape, elements)
+                reply_direction = "to" if direction == "from" else "from"
+                shapes.setdefault((reply_direction, True, reply_shape), set()).update(reply_elements)
+
+        sets = []
+        chains = {f"mud_{direction}": [] for direction in self.chain_directions.values()}  # Mapping between chain names and their rules
+        for key in sorted(shapes, key=lambda key: (key[0], key[1]) + tuple(str(item) for item in key[2])):
+            direction, reply, (network, l4, fields) = key
+            chain = f"mud_{direction}" if l4 is None else f"mud_{direction}_{l4}"
+            rules = chains.setdefault(chain, [])
+            conditions = ["ct state established,related"] if reply else []
+            if network is not None and not fields:
+                conditions.append(f"meta nfproto {network}")
+            if not fields:
+                rules.append(" ".join(conditions + ["accept"]))
+                continue
+            base_name = "_".join([direction] + [self.families[network][0] if network is not None else "inet"]
+                                 + ([l4] if l4 else []) + list(fields) + (["reply"] if reply else []))
+            selectors = [self.selector(network, l4, field) for field in fields]
+            types = " . ".join(set_type for _, set_type in selectors)
+            # One set and rule per group of non-overlapping elements
+            for i, group in enumerate(self.merge_elements(fields, shapes[key])):
+                set_name = base_name if i == 0 else f"{base_name}_{i + 1}"
+                lines = [f"\tset {set_name} {{", f"\t\ttype {types}"]
+                if any(set_type != f"{l4}_type" for _, set_type in selectors):
+                    lines.append("\t\tflags interval")
+                elements = [" . ".join(self.format_value(value) for value in element) for element in group]
+                lines.append("\t\telements = { " + ",\n\t\t\t     ".join(elements) + " }")
+                lines.append("\t}")
+                sets.append("\n".join(lines))
+                rules.append(" ".join(conditions + [" . ".join(expression for expression, _ in selectors) + f" @{set_name}", "accept"]))
+
+        # Dispatch transport protocols to their chain, per direction
+        maps = []
+        for direction in self.chain_directions.values():
+            prefix = f"mud_{direction}_"
+            transport_chains = {self.l4proto_names[chain[len(prefix):]]: chain for chain in chains if chain.startswith(prefix)}
+            if transport_chains:
+                elements = ",\n\t\t\t     ".join(f"{l4proto} : jump {chain}" for l4proto, chain in sorted(transport_chains.items()))
+                maps.append("\n".join([
+                    f"\tmap {direction}_l4proto_chains {{",
+                    "\t\ttype inet_proto : verdict",
+                    "\t\telements = { " + elements + " }",
+                    "\t}"
+                ]))
+                chains[f"mud_{direction}"].append(f"meta l4proto vmap @{direction}_l4proto_chains")
+            chains[f"mud_{direction}"].append("drop")
+
+        return self.format_ruleset(profile["device-info"], sets, maps, chains)
+
+
+    def device_rules(self, device_info: dict) -> list:
+        """
+        Get the rules sending the device's traffic to the profile's chains,
+        matching the device's MAC address, or else its IP addresses:
+        traffic from the device to the "mud_from" chain, and traffic to the device to the "mud_to" chain.
+
+        :param device_info: dictionary containing the device information
+        :return: list of rules, empty if the device is not identified
+        """
+        if device_info.get("mac", None) is not None:
+            selectors = [("ether", device_info["mac"])]
+        else:
+            selectors = [(family, device_info[protocol]) for protocol, (family, _) in self.families.items()
+                         if device_info.get(protocol, None) is not None]
+        return [f"{family} {field} {address} jump mud_{direction}" for family, address in selectors
+                for field, direction in (("saddr", "from"), ("daddr", "to"))]
+
+
+    @staticmethod
+    def format_chain(chain: str, rules: list) -> str:
+        """
+        Format an nftables chain.
+
+        :param chain: chain name
+        :param rules: chain rules
+        :return: formatted chain
+        """
+        return "\n".join([f"\tchain {chain} {{"] + [f"\t\t{rule}" for rule in rules] + ["\t}"])
+
+
+    def format_ruleset(self, device_info: dict, sets: list, maps: list, chains: dict) -> str:
+        """
+        Format the nftables ruleset.
+        The table is deleted and recreated, such that the ruleset can be reloaded atomically.
+        Chains are declared before being referenced: transport chains, verdict maps, direction chains, base chain.
+
+        :param device_info: dictionary containing the device information
+        :param sets: formatted sets
+        :param maps: formatted verdict maps
+        :param chains: mapping between chain names and their rules, starting with the direction chains
+        :return: nftables ruleset
+        """
+        device_name = " ".join(str(device_info.get("name", "")).split())
+        lines = ["#!/usr/sbin/nft -f", f"# MUD profile: {device_name}"]
+        if self.skipped:
+            lines.append("# Skipped single policies:")
+            lines += [f"#   {name}: {reason}" for name, reason in self.skipped]
+        lines += ["", f"table inet {self.TABLE}", f"delete table inet {self.TABLE}", "", f"table inet {self.TABLE} {{"]
+        direction_chains = [f"mud_{direction}" for direction in self.chain_directions.values()]
+        transport_chains = [chain for chain in chains if chain not in direction_chains]
+        blocks = sets + [self.format_chain(chain, chains[chain]) for chain in transport_chains]
+        blocks += maps + [self.format_chain(chain, chains[chain]) for chain in direction_chains]
+        device_rules = self.device_rules(device_info)
+        if device_rules:
+            blocks.append(self.format_chain("forward", ["type filter hook forward priority 0; policy accept;"] + device_rules))
+        lines.append("\n\n".join(blocks))
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+
+    def write(self, profile: dict, stream: object, directions: dict = None) -> None:
+        """
+        Compile a translated profile, and write the nftables ruleset.
+
+        :param profile: dictionary containing the translated profile
+        :param stream: text stream to write the ruleset to
+        :param directions: mapping between policy names and their direction (see MudParser.policy_directions)
+        """
+        stream.write(self.compile(profile, directions))
+
+
+    def report(self) -> str:
+        """
+        Get a report of the compilation.
+
+        :return: human-readable compilation report
+        """
+        return f"nftables ruleset skipped {len(self.skipped)} single policies"
@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+import os
+import yaml
+from parsers.ir.Record import Record
+
+
+class YamlWriter:
+    """
+    YAML extended profile writer.
+    Uses the libyaml C emitter when available,
+    and falls back to the pure-Python emitter otherwise.
+    In streaming mode, single policies are serialized as soon as they are produced,
+    such that the whole profile is never held in memory.
+    """
+
+    # YAML emitter: libyaml C emitter if available,
+    # unless the pure-Python emitter is explicitly requested
+    if hasattr(yaml, "CDumper") and not os.environ.get("MUD_TRANSLATOR_PURE_YAML"):
+        Dumper = yaml.CDumper
+    else:
+        Dumper = yaml.Dumper
+
+
+    class _Dumper(Dumper):
+        """
+        YAML emitter of translated profiles, such that representers are not registered on the PyYAML emitters,
+        shared with other users of the YAML library.
+        """
+        pass
+
+    # IR records are represented as mappings of their set fields, like dicts
+    _Dumper.add_multi_representer(Record, lambda dumper, record: dumper.represent_mapping("tag:yaml.org,2002:map", record))
+
+    # Top-level YAML field containing the single policies
+    POLICIES = "single-policies"
+
+
+    @classmethod
+    def dump(c, yaml_data: dict, stream: object = None) -> str:
+        """
+        Serialize a translated profile to YAML.
+
+        :param yaml_data: dictionary containing the translated profile
+        :param stream: stream to write the YAML document to, if any
+        :return: YAML document if no stream was given, None otherwise
+        """
+        return yaml.dump(yaml_data, stream, Dumper=c._Dumper, default_flow_style=False)
+
+
+    def __init__(self, output: str) -> None:
+        """
+        Constructor for the YamlWriter class, in streaming mode.
+
+        :param output: output YAML file
+        """
+        self.output = output
+        # Serialized single policies are spooled to a temporary file,
+        # and indexed by name, to be written in the same (sorted) order as a full dump
+        import tempfile
+        self.spool = tempfile.TemporaryFile()
+        self.index = {}
+
+
+    def write_policy(self, name: str, policy: dict) -> None:
+        """
+        Serialize a single policy, as soon as it is produced.
+        A policy with the same name as a previous one replaces it, as in the full profile.
+
+        :param name: policy name
+        :param policy: policy
+        """
+        # Serialize the policy nested in the single policies field,
+        # to get the same indentation and line wrapping as in a full dump,
+        # then strip the single policies field line
+        fragment = self.dump({self.POLICIES: {name: policy}})
+        fragment = fragment[fragment.index("\n") + 1:].encode()
+        self.index[name] = (self.spool.tell(), len(fragment))
+        self.spool.write(fragment)
+
+
+    def close(self, device_info: dict) -> None:
+        """
+        Write the output YAML file,
+        byte-for-byte identical to the full dump of the translated profile.
+
+        :param device_info: device information
+        """
+        with open(self.output, "w") as yaml_file:
+            if not self.index:
+                # No single policies: nothing was streamed
+                self.dump({"device-info": device_info, self.POLICIES: {}}, yaml_file)
+            else:
+                self.dump({"device-info": device_info}, yaml_file)
+                yaml_file.write(f"{self.POLICIES}:\n")
+                for name in sorted(self.index):
+                    offset, length = self.index[name]
+                    self.spool.seek(offset)
+                    yaml_file.write(self.spool.read(length).decode())
+        self.spool.close()